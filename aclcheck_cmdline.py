@@ -16,8 +16,10 @@
 """Command line interface to aclcheck library."""
 
 from optparse import OptionParser
+import sys
 
 from capirca.lib import aclcheck
+from capirca.lib import flowreplay
 from capirca.lib import naming
 from capirca.lib import policy
 
@@ -40,8 +42,29 @@ def main():
                      help='destination port', default='80')
   _parser.add_option('--sport', '--source-port', dest='sport',
                      help='source port', default='1025')
+  _parser.add_option('--flows', dest='flows',
+                     help='replay the flows of a CSV or JSON lines file, or '
+                     'of stdin with -, instead of checking a single flow')
+  _parser.add_option('--flow-format', dest='flow_format',
+                     choices=['csv', 'jsonl'],
+                     help='format of the flows (default: detected)')
+  _parser.add_option('--verdicts', dest='verdicts', default='-',
+                     help='file the JSON line verdicts of the flows are '
+                     'written to, - for stdout (default: -)')
+  _parser.add_option('--hit-counts', dest='hit_counts',
+                     help='CSV file the hit counts per term are written to '
+                     '(default: stderr)')
+  _parser.add_option('--processes', dest='processes', type='int', default=1,
+                     help='number of processes checking the flows')
+  _parser.add_option('--chunk-size', dest='chunk_size', type='int',
+                     default=flowreplay.DEFAULT_CHUNK_SIZE,
+                     help='number of flows checked per task')
   (FLAGS, unused_args) = _parser.parse_args()
 
+  if FLAGS.flows:
+    ReplayFlows(FLAGS)
+    return
+
   defs = naming.Naming(FLAGS.definitions)
   policy_obj = policy.ParsePolicy(open(FLAGS.pol).read(), defs)
   check = aclcheck.AclCheck(policy_obj, src=FLAGS.src, dst=FLAGS.dst,
@@ -49,5 +72,42 @@ def main():
                             proto=FLAGS.proto)
   print(str(check))
 
+
+def _Open(path, mode):
+  if path == '-':
+    return sys.stdin if 'r' in mode else sys.stdout
+  return open(path, mode, newline='')
+
+
+def ReplayFlows(flags):
+  """Writes the verdict of every flow and the hit counts of every term."""
+  with open(flags.pol) as f:
+    policy_text = f.read()
+  hits = flowreplay.HitCounts()
+  flows_file = _Open(flags.flows, 'r')
+  verdicts_file = _Open(flags.verdicts, 'w')
+  try:
+    flows = flowreplay.ReadFlows(flows_file, flags.flow_format)
+    for lines, chunk_hits in flowreplay.Replay(
+        flags.definitions, policy_text, flows, processes=flags.processes,
+        chunk_size=flags.chunk_size):
+      verdicts_file.writelines(lines)
+      hits.Merge(chunk_hits)
+  finally:
+    if flows_file is not sys.stdin:
+      flows_file.close()
+    if verdicts_file is sys.stdout:
+      verdicts_file.flush()
+    else:
+      verdicts_file.close()
+
+  if flags.hit_counts:
+    with open(flags.hit_counts, 'w', newline='') as f:
+      hits.Save(f)
+  else:
+    hits.Save(sys.stderr)
+  sys.stderr.write('checked %d flows, %d could not be checked\n' %
+                   (hits.flows, hits.errors))
+
 if __name__ == '__main__':
   main()
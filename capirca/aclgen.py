@@ -13,54 +13,92 @@
 # limitations under the License.
 #
 """Renders policy source files into actual Access Control Lists."""
-import copy
+import collections
+import contextlib
+import itertools
 import multiprocessing
+import os
 import pathlib
 import sys
-from typing import Iterator, List, Tuple, cast
+import tempfile
+import time
+from typing import (Collection, Iterator, List, NamedTuple, Optional, Tuple,
+                    Union)
 
 from absl import app
 from absl import flags
 from absl import logging
 from capirca.lib import aclgenerator
-from capirca.lib import arista
-from capirca.lib import arista_tp
-from capirca.lib import aruba
-from capirca.lib import brocade
-from capirca.lib import cisco
-from capirca.lib import ciscoasa
-from capirca.lib import cisconx
-from capirca.lib import ciscoxr
-from capirca.lib import cloudarmor
-from capirca.lib import gce
-from capirca.lib import gce_vpc_tf
-from capirca.lib import gcp_hf
-from capirca.lib import fortigate
-from capirca.lib import fortigatelocalin
-from capirca.lib import ipset
-from capirca.lib import iptables
-from capirca.lib import juniper
-from capirca.lib import juniperevo
-from capirca.lib import junipermsmpc
-from capirca.lib import junipersrx
-from capirca.lib import k8s
+from capirca.lib import generators
 from capirca.lib import naming
-from capirca.lib import nftables
-from capirca.lib import nsxv
-from capirca.lib import nsxt
-from capirca.lib import openconfig
-from capirca.lib import packetfilter
-from capirca.lib import paloaltofw
-from capirca.lib import pcap
+from capirca.lib import namingsnapshot
+from capirca.lib import outputmanifest
 from capirca.lib import policy
-from capirca.lib import sonic
-from capirca.lib import speedway
-from capirca.lib import srxlo
-from capirca.lib import windows_advfirewall
+from capirca.lib import rendercache
+from capirca.lib import renderprofile
+from capirca.lib import renderscheduler
 from capirca.utils import config
 
 FLAGS = flags.FLAGS
-WriteList = List[Tuple[pathlib.Path, str]]
+
+
+class StagedOutput(NamedTuple):
+  """A rendered ACL streamed to a file on the filesystem of its output file.
+
+  Attributes:
+    path: pathlib.Path of the staged file.
+    digest: the outputmanifest.Digest of the ACL, or None without a manifest.
+  """
+  path: pathlib.Path
+  digest: Optional[str] = None
+
+
+WriteList = List[Tuple[pathlib.Path, Union[str, StagedOutput]]]
+
+# Numbers the staged files of a process.
+_STAGED_COUNTER = itertools.count()
+
+# The modules whose errors are reported as ACLGeneratorError, besides
+# aclgenerator and generators.
+_GENERATOR_ERROR_MODULES = (
+    'capirca.lib.juniper',
+    'capirca.lib.junipermsmpc',
+    'capirca.lib.junipersrx',
+    'capirca.lib.cisco',
+    'capirca.lib.ipset',
+    'capirca.lib.iptables',
+    'capirca.lib.speedway',
+    'capirca.lib.pcap',
+    'capirca.lib.sonic',
+    'capirca.lib.aruba',
+    'capirca.lib.nftables',
+    'capirca.lib.gce',
+    'capirca.lib.gce_vpc_tf',
+    'capirca.lib.cloudarmor',
+    'capirca.lib.k8s',
+    'capirca.lib.fortigate',
+    'capirca.lib.fortigatelocalin',
+)
+
+
+def _GeneratorErrors() -> Tuple[type, ...]:
+  """Returns the errors of the generator modules imported so far."""
+  errors = [aclgenerator.Error, generators.Error]
+  for module_name in _GENERATOR_ERROR_MODULES:
+    module = sys.modules.get(module_name)
+    if module is not None:
+      errors.append(module.Error)
+  return tuple(errors)
+
+
+def _SharedOutputs() -> List[List[str]]:
+  """Returns the groups of registered platforms sharing an output file."""
+  platforms_by_suffix = collections.defaultdict(list)
+  for plugin in sorted(generators.Registered(),
+                       key=lambda plugin: plugin.platform):
+    for suffix in set(plugin.Suffixes()):
+      platforms_by_suffix[suffix].append(plugin.platform)
+  return [group for group in platforms_by_suffix.values() if len(group) > 1]
 
 
 def SetupFlags():
@@ -113,6 +151,45 @@ def SetupFlags():
   flags.DEFINE_multi_string(
       'config_file', None,
       'A yaml file with the configuration options for capirca')
+  flags.DEFINE_string(
+      'cache_directory', None,
+      'Directory for the render cache; policies whose text, includes and '
+      'referenced definitions are unchanged are not rendered again.\n'
+      '(default: \'%s\')' % config.defaults['cache_directory'])
+  flags.DEFINE_string(
+      'naming_cache', None,
+      'File caching the parsed and expanded definitions, used instead of '
+      'parsing the definitions directory while none of its files changed.\n'
+      '(default: \'%s\')' % config.defaults['naming_cache'])
+  flags.DEFINE_boolean(
+      'output_manifest', None,
+      'Keep a manifest of the digests of the rendered files in the output '
+      'directory, so files are compared with it instead of being read back.\n'
+      '(default: \'%s\')' % str(config.defaults['output_manifest']).lower())
+  flags.DEFINE_boolean(
+      'print_changed', None,
+      'Print the path of every changed file written, one per line.\n'
+      '(default: \'%s\')' % str(config.defaults['print_changed']).lower())
+  flags.DEFINE_string(
+      'stats_file', None,
+      'File in which the render time of every policy is kept, so the '
+      'slowest policies are rendered first in the next run.\n'
+      '(default: \'%s\')' % config.defaults['stats_file'])
+  flags.DEFINE_string(
+      'profile_report', None,
+      'Write the time spent in every phase of every policy and platform, and '
+      'the peak memory of every policy, to this JSON or CSV file.\n'
+      '(default: \'%s\')' % config.defaults['profile_report'])
+  flags.DEFINE_integer(
+      'profile_slowest', None,
+      'With --profile_report, also render this many of the policies '
+      'expected to be slowest with cProfile and write their statistics next '
+      'to the report.\n'
+      '(default: \'%s\')' % config.defaults['profile_slowest'])
+  flags.DEFINE_list(
+      'changed_includes', None,
+      'Print the policy files which use any of these include files, directly '
+      'or through another include, instead of rendering acls.')
 
 
 class Error(Exception):
@@ -149,19 +226,34 @@ def SkipLines(text, skip_line_func=False):
 def RenderFile(base_directory: str, input_file: pathlib.Path,
                output_directory: pathlib.Path, definitions: naming.Naming,
                exp_info: int, optimize: bool, shade_check: bool,
-               write_files: WriteList):
+               write_files: WriteList,
+               render_cache: Optional[rendercache.RenderCache] = None,
+               render_platforms: Optional[Collection[str]] = None,
+               manifest: Optional[outputmanifest.Manifest] = None,
+               staging_directory: Optional[pathlib.Path] = None):
   """Render a single file.
 
   Args:
     base_directory: The base directory to look for acls.
     input_file: the name of the input policy file.
     output_directory: the directory in which we place the rendered file.
-    definitions: the definitions from naming.Naming().
+    definitions: the definitions from naming.Naming(), or a
+      namingsnapshot.NamingSnapshot of them.
     exp_info: print a info message when a term is set to expire in that many
       weeks.
     optimize: a boolean indicating if we should turn on optimization or not.
     shade_check: should we raise an error if a term is completely shaded
-    write_files: a list of file tuples, (output_file, acl_text), to write
+    write_files: a list of file tuples, (output_file, acl_text) or
+      (output_file, StagedOutput), to write
+    render_cache: optional rendercache.RenderCache used to skip rendering of
+      policies which have not changed since they were last rendered.
+    render_platforms: optional platforms to render; the other platforms of
+      the policy are skipped.
+    manifest: optional outputmanifest.Manifest of the output directory, used
+      to tell whether files changed without reading them.
+    staging_directory: optional directory in which the changed ACLs are
+      staged, on the filesystem of the output directory; by default they are
+      staged next to their output file.
   """
   output_relative = input_file.relative_to(base_directory).parent.parent
   output_directory = output_directory / output_relative
@@ -169,48 +261,43 @@ def RenderFile(base_directory: str, input_file: pathlib.Path,
   logging.debug('rendering file: %s into %s', input_file, output_directory)
 
   pol = None
-  jcl = False
-  evojcl = False
-  acl = False
-  atp = False
-  asacl = False
-  aacl = False
-  bacl = False
-  eacl = False
-  gca = False
-  gcefw = False
-  gcphf = False
-  ips = False
-  ipt = False
-  msmpc = False
-  spd = False
-  nsx = False
-  nsxt_pol = False
-  oc = False
-  pcap_accept = False
-  pcap_deny = False
-  pf = False
-  srx = False
-  jsl = False
-  nft = False
-  win_afw = False
-  nxacl = False
-  xacl = False
-  paloalto = False
-  sonic_pol = False
-  k8s_pol = False
-  gce_vpc_tf_pol = False
-  fcl = False
-  lipfcl = False
 
   try:
-    with open(input_file) as f:
+    with renderprofile.Phase('read'), open(input_file) as f:
       conf = f.read()
       logging.debug('opened and read %s', input_file)
   except IOError as e:
     logging.warning('bad file: \n%s', e)
     raise
 
+  render_key = None
+  rendered = []
+  if render_cache:
+    try:
+      preprocessed = '\n'.join(
+          policy._Preprocess(conf, base_dir=base_directory))  # pylint: disable=protected-access
+    except policy.Error:
+      # Let the parser below report the problem.
+      preprocessed = None
+    if preprocessed is not None:
+      options = {
+          'exp_info': exp_info,
+          'optimize': bool(optimize),
+          'shade_check': bool(shade_check),
+      }
+      if render_platforms is not None:
+        options['platforms'] = sorted(render_platforms)
+      render_key = render_cache.Key(
+          preprocessed, input_file.relative_to(base_directory), options)
+      cached = render_cache.Lookup(render_key, definitions)
+      if cached is not None:
+        logging.debug('render cache hit: %s', input_file)
+        for acl_suffix, acl_text, binary in cached:
+          RenderACL(acl_text, acl_suffix, output_directory, input_file,
+                    write_files, binary, manifest=manifest)
+        return
+      definitions = rendercache.RecordingNaming(definitions)
+
   try:
     pol = policy.ParsePolicy(
         conf,
@@ -228,265 +315,51 @@ def RenderFile(base_directory: str, input_file: pathlib.Path,
   platforms = set()
   for header in pol.headers:
     platforms.update(header.platforms)
+  if render_platforms is not None:
+    platforms.intersection_update(render_platforms)
 
-  if 'juniper' in platforms:
-    jcl = copy.deepcopy(pol)
-  if 'juniperevo' in platforms:
-    evojcl = copy.deepcopy(pol)
-  if 'cisco' in platforms:
-    acl = copy.deepcopy(pol)
-  if 'ciscoasa' in platforms:
-    asacl = copy.deepcopy(pol)
-  if 'brocade' in platforms:
-    bacl = copy.deepcopy(pol)
-  if 'arista' in platforms:
-    eacl = copy.deepcopy(pol)
-  if 'arista_tp' in platforms:
-    atp = copy.deepcopy(pol)
-  if 'aruba' in platforms:
-    aacl = copy.deepcopy(pol)
-  if 'ipset' in platforms:
-    ips = copy.deepcopy(pol)
-  if 'iptables' in platforms:
-    ipt = copy.deepcopy(pol)
-  if 'msmpc' in platforms:
-    msmpc = copy.deepcopy(pol)
-  if 'nsxv' in platforms:
-    nsx = copy.deepcopy(pol)
-  if 'nsxt' in platforms:
-    nsxt_pol = copy.deepcopy(pol)
-  if 'openconfig' in platforms:
-    oc = copy.deepcopy(pol)
-  if 'packetfilter' in platforms:
-    pf = copy.deepcopy(pol)
-  if 'pcap' in platforms:
-    pcap_accept = copy.deepcopy(pol)
-    pcap_deny = copy.deepcopy(pol)
-  if 'speedway' in platforms:
-    spd = copy.deepcopy(pol)
-  if 'srx' in platforms:
-    srx = copy.deepcopy(pol)
-  if 'srxlo' in platforms:
-    jsl = copy.deepcopy(pol)
-  if 'windows_advfirewall' in platforms:
-    win_afw = copy.deepcopy(pol)
-  if 'cisconx' in platforms:
-    nxacl = copy.deepcopy(pol)
-  if 'ciscoxr' in platforms:
-    xacl = copy.deepcopy(pol)
-  if 'nftables' in platforms:
-    nft = copy.deepcopy(pol)
-  if 'gce' in platforms:
-    gcefw = copy.deepcopy(pol)
-  if 'gce_vpc_tf' in platforms:
-    gce_vpc_tf_pol = copy.deepcopy(pol)
-  if 'gcp_hf' in platforms:
-    gcphf = copy.deepcopy(pol)
-  if 'paloalto' in platforms:
-    paloalto = copy.deepcopy(pol)
-  if 'sonic' in platforms:
-    sonic_pol = copy.deepcopy(pol)
-  if 'cloudarmor' in platforms:
-    gca = copy.deepcopy(pol)
-  if 'k8s' in platforms:
-    k8s_pol = copy.deepcopy(pol)
-  if 'fortigate' in platforms:
-    fcl = copy.deepcopy(pol)
-  if 'fortigatelocalin' in platforms:
-    lipfcl = copy.deepcopy(pol)
-
-  acl_obj: aclgenerator.ACLGenerator
-
+  # Every output gets its own copy of the policy, taken before any generator
+  # runs, unless its generator leaves the addresses alone.
+  outputs = []
+  staged = len(write_files)
   try:
-    if jcl:
-      acl_obj = juniper.Juniper(jcl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if evojcl:
-      acl_obj = juniperevo.JuniperEvo(evojcl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if msmpc:
-      acl_obj = junipermsmpc.JuniperMSMPC(msmpc, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if srx:
-      acl_obj = junipersrx.JuniperSRX(srx, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if acl:
-      acl_obj = cisco.Cisco(acl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if asacl:
-      acl_obj = ciscoasa.CiscoASA(asacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if aacl:
-      acl_obj = aruba.Aruba(aacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if bacl:
-      acl_obj = brocade.Brocade(bacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if eacl:
-      acl_obj = arista.Arista(eacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if atp:
-      acl_obj = arista_tp.AristaTrafficPolicy(atp, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if ips:
-      acl_obj = ipset.Ipset(ips, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if ipt:
-      acl_obj = iptables.Iptables(ipt, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if nsx:
-      acl_obj = nsxv.Nsxv(nsx, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if nsxt_pol:
-      acl_obj = nsxt.Nsxt(nsxt_pol, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if oc:
-      acl_obj = openconfig.OpenConfig(oc, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if spd:
-      acl_obj = speedway.Speedway(spd, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if pcap_accept:
-      acl_obj = pcap.PcapFilter(pcap_accept, exp_info)
-      RenderACL(
-          str(acl_obj), '-accept' + acl_obj.SUFFIX, output_directory,
-          input_file, write_files)
-    if pcap_deny:
-      acl_obj = pcap.PcapFilter(pcap_deny, exp_info, invert=True)
-      RenderACL(
-          str(acl_obj), '-deny' + acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if pf:
-      acl_obj = packetfilter.PacketFilter(pf, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if win_afw:
-      acl_obj = windows_advfirewall.WindowsAdvFirewall(win_afw, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if jsl:
-      acl_obj = srxlo.SRXlo(jsl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if nxacl:
-      acl_obj = cisconx.CiscoNX(nxacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if xacl:
-      acl_obj = ciscoxr.CiscoXR(xacl, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if nft:
-      acl_obj = nftables.Nftables(nft, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if gcefw:
-      acl_obj = gce.GCE(gcefw, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if gce_vpc_tf_pol:
-      acl_obj = gce_vpc_tf.TerraformGCE(gce_vpc_tf_pol, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if gcphf:
-      acl_obj = gcp_hf.HierarchicalFirewall(gcphf, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-
-    if paloalto:
-      acl_obj = paloaltofw.PaloAltoFW(paloalto, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-    if sonic_pol:
-      acl_obj = sonic.Sonic(sonic_pol, exp_info)
-      RenderACL(
-          str(acl_obj), '.json', output_directory, input_file, write_files,
-          True)
-    if gca:
-      acl_obj = cloudarmor.CloudArmor(gca, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-
-    if k8s_pol:
-      acl_obj = k8s.K8s(k8s_pol, exp_info)
-      RenderACL(
-          str(acl_obj), acl_obj.SUFFIX, output_directory, input_file,
-          write_files)
-
-    if fcl:
-      acl_obj = fortigate.Fortigate(fcl, exp_info)
-      RenderACL(str(acl_obj), acl_obj.SUFFIX, output_directory,
-                input_file, write_files)
-    if lipfcl:
-      acl_obj = fortigatelocalin.FortigateLocalIn(lipfcl, exp_info)
-      RenderACL(str(acl_obj), acl_obj.SUFFIX, output_directory,
-                input_file, write_files)
+    for plugin in generators.ForPlatforms(platforms):
+      generator = plugin.Load()
+      for output in plugin.outputs:
+        outputs.append((generator, output,
+                        pol.Copy(generator.MUTATES_ADDRESSES)))
+
+    for generator, output, generator_pol in outputs:
+      acl_obj = generator(generator_pol, exp_info, **dict(output.options))
+      suffix = output.suffix
+      if suffix is None:
+        suffix = acl_obj.SUFFIX
+      if render_key or output.binary:
+        # The render cache keeps the text of the outputs.
+        RenderACL(_Format(acl_obj), suffix, output_directory, input_file,
+                  write_files, output.binary, rendered=rendered,
+                  manifest=manifest)
+      else:
+        StreamACL(acl_obj, suffix, output_directory, input_file, write_files,
+                  manifest=manifest, staging_directory=staging_directory)
 
   # TODO(robankeny) add additional errors.
-  except (
-      juniper.Error,
-      junipermsmpc.Error,
-      junipersrx.Error,
-      cisco.Error,
-      ipset.Error,
-      iptables.Error,
-      speedway.Error,
-      pcap.Error,
-      sonic.Error,
-      aclgenerator.Error,
-      aruba.Error,
-      nftables.Error,
-      gce.Error,
-      gce_vpc_tf.Error,
-      cloudarmor.Error,
-      k8s.Error,
-      fortigate.Error,
-      fortigatelocalin.Error) as e:
+  except _GeneratorErrors() as e:
+    _DiscardStaged(write_files, staged)
     raise ACLGeneratorError('Error generating target ACL for %s:\n%s' %
                             (input_file, e))
+  except BaseException:
+    _DiscardStaged(write_files, staged)
+    raise
+
+  if render_key:
+    render_cache.Store(render_key, definitions, rendered)
+
+
+def _Format(acl_obj: aclgenerator.ACLGenerator) -> str:
+  """Returns the text of a generated ACL."""
+  with renderprofile.Phase('format', acl_obj._PLATFORM):  # pylint: disable=protected-access
+    return str(acl_obj)
 
 
 def RenderACL(acl_text: str,
@@ -494,7 +367,9 @@ def RenderACL(acl_text: str,
               output_directory: pathlib.Path,
               input_file: pathlib.Path,
               write_files: List[Tuple[pathlib.Path, str]],
-              binary: bool = False):
+              binary: bool = False,
+              rendered: Optional[List[Tuple[str, str, bool]]] = None,
+              manifest: Optional[outputmanifest.Manifest] = None):
   """Write the ACL string out to file if appropriate.
 
   Args:
@@ -504,17 +379,121 @@ def RenderACL(acl_text: str,
     input_file: The name of the policy file that was used to render ACL.
     write_files: A list of file tuples, (output_file, acl_text), to write.
     binary: Boolean if the rendered ACL is in binary format.
+    rendered: Optional list collecting (acl_suffix, acl_text, binary) tuples
+      of every rendered ACL, whether or not it changed on disk.
+    manifest: Optional outputmanifest.Manifest; the file is only read back
+      when the manifest can not tell whether it changed.
   """
+  if rendered is not None:
+    rendered.append((acl_suffix, acl_text, binary))
   input_filename = input_file.with_suffix(acl_suffix).name
   output_file = output_directory / input_filename
 
-  if FilesUpdated(output_file, acl_text, binary):
+  if manifest is None:
+    changed = FilesUpdated(output_file, acl_text, binary)
+  else:
+    digest = outputmanifest.Digest(acl_text)
+    changed = manifest.Changed(output_file, digest)
+    if changed is None:
+      changed = FilesUpdated(output_file, acl_text, binary)
+      if not changed:
+        manifest.verified.append((output_file, digest))
+  if changed:
     logging.info('file changed: %s', output_file)
     write_files.append((output_file, acl_text))
   else:
     logging.debug('file not changed: %s', output_file)
 
 
+def StreamACL(acl_obj: aclgenerator.ACLGenerator,
+              acl_suffix: str,
+              output_directory: pathlib.Path,
+              input_file: pathlib.Path,
+              write_files: WriteList,
+              manifest: Optional[outputmanifest.Manifest] = None,
+              staging_directory: Optional[pathlib.Path] = None):
+  """Stream the ACL to a staged file, kept if it differs from the one on disk.
+
+  Unlike RenderACL, the whole text of the ACL is never held in memory: the
+  generator writes it line by line, and it is compared with the file on disk
+  line by line.
+
+  Args:
+    acl_obj: the ACL Generator.
+    acl_suffix: File suffix to append to output filename.
+    output_directory: The directory to write the output file.
+    input_file: The name of the policy file that was used to render ACL.
+    write_files: A list of file tuples, (output_file, StagedOutput), to write.
+    manifest: Optional outputmanifest.Manifest; the file is only read back
+      when the manifest can not tell whether it changed.
+    staging_directory: Optional directory in which the ACL is staged, on the
+      filesystem of output_directory; by default it is output_directory.
+  """
+  input_filename = input_file.with_suffix(acl_suffix).name
+  output_file = output_directory / input_filename
+  staged_file = (staging_directory or output_directory) / ('.%s.%d-%d.tmp' % (
+      output_file.name, os.getpid(), next(_STAGED_COUNTER)))
+
+  changed = None
+  try:
+    output_directory.mkdir(parents=True, exist_ok=True)
+    with renderprofile.Phase('format', acl_obj._PLATFORM):  # pylint: disable=protected-access
+      with open(staged_file, 'w') as f:
+        acl_obj.WriteTo(f)
+    digest = None
+    if manifest is not None:
+      with open(staged_file) as f:
+        digest = outputmanifest.DigestLines(_SplitLines(f))
+      changed = manifest.Changed(output_file, digest)
+    if changed is None:
+      changed = _StagedUpdated(output_file, staged_file)
+      if manifest is not None and not changed:
+        manifest.verified.append((output_file, digest))
+  finally:
+    if not changed:
+      _Unlink(staged_file)
+  if changed:
+    logging.info('file changed: %s', output_file)
+    write_files.append((output_file, StagedOutput(staged_file, digest)))
+  else:
+    logging.debug('file not changed: %s', output_file)
+
+
+def _DiscardStaged(write_files: WriteList, start: int):
+  """Removes the staged files queued from start on, and their entries."""
+  for _, file_contents in write_files[start:]:
+    if isinstance(file_contents, StagedOutput):
+      _Unlink(file_contents.path)
+  del write_files[start:]
+
+
+def _SplitLines(f) -> Iterator[str]:
+  """Yields the lines of a text file, as str.split('\n') would split them."""
+  line = ''
+  for line in f:
+    yield line[:-1] if line.endswith('\n') else line
+  if not line or line.endswith('\n'):
+    yield ''
+
+
+def _P4Tags(text: str) -> bool:
+  """Returns whether a line holds no version control keyword."""
+  return not any(tag in text for tag in outputmanifest.KEYWORDS)
+
+
+def _StagedUpdated(file_name: pathlib.Path, staged_file: pathlib.Path) -> bool:
+  """Diff a staged ACL with what's already on disk, like FilesUpdated."""
+  try:
+    f = open(file_name)
+  except IOError:
+    return True
+  with f, open(staged_file) as staged:
+    return any(
+        old != new for old, new in itertools.zip_longest(
+            filter(_P4Tags, _SplitLines(f)),
+            filter(_P4Tags, _SplitLines(staged))))
+
+
 def FilesUpdated(file_name: pathlib.Path, new_text: str, binary: bool) -> bool:
   """Diff the rendered acl with what's already on disk.
 
@@ -536,15 +515,8 @@ def FilesUpdated(file_name: pathlib.Path, new_text: str, binary: bool) -> bool:
   except IOError:
     return True
   if not binary:
-    p4_id = '$I d:'.replace(' ', '')
-    p4_date = '$Da te:'.replace(' ', '')
-    p4_revision = '$Rev ision:'.replace(' ', '')
-
-    def P4Tags(text: str) -> bool:
-      return not (p4_id in text or p4_date in text or p4_revision in text)
-
-    filtered_conf = filter(P4Tags, conf.split('\n'))
-    filtered_text = filter(P4Tags, new_text.split('\n'))
+    filtered_conf = filter(_P4Tags, conf.split('\n'))
+    filtered_text = filter(_P4Tags, new_text.split('\n'))
     return list(filtered_conf) != list(filtered_text)
   return conf != new_text
 
@@ -583,43 +555,175 @@ def DescendDirectory(input_dirname: str,
   return policy_files
 
 
-def WriteFiles(write_files: WriteList):
+def AffectedPolicies(base_directory: str, ignore_directories: List[str],
+                     changed_includes: List[str]) -> List[pathlib.Path]:
+  """Find the policies which use any of the changed include files.
+
+  Args:
+    base_directory: directory containing policy files.
+    ignore_directories: directories to ignore when searching for policy files.
+    changed_includes: paths of the changed include files.
+
+  Returns:
+    a sorted list of policy file paths
+  """
+  policies = DescendDirectory(base_directory, ignore_directories)
+  graph = policy.IncludeGraph(policies, base_dir=base_directory)
+  return policy.PoliciesUsingIncludes(graph, changed_includes)
+
+
+def WriteFiles(write_files: WriteList) -> int:
   """Writes files to disk.
 
   Args:
-    write_files: List of file names and strings.
+    write_files: List of file names and strings, or StagedOutput of the
+      files streamed next to them.
+
+  Returns:
+    The number of files written.
   """
-  if write_files:
-    logging.info('writing %d files to disk...', len(write_files))
-  else:
-    logging.info('no files changed, not writing to disk')
   for output_file, file_contents in write_files:
     _WriteFile(output_file, file_contents)
+  return len(write_files)
 
 
-def _WriteFile(output_file: pathlib.Path, file_contents: str):
+def _WriteFile(output_file: pathlib.Path,
+               file_contents: Union[str, StagedOutput]):
   """Inner file writing function.
 
+  The contents are written to a temporary file next to output_file, which then
+  replaces it, so readers never see a partially written ACL.
+
   Args:
     output_file: Path to write to
-    file_contents: Data to write
+    file_contents: Data to write, or the StagedOutput already holding it
   """
+  output_file = pathlib.Path(output_file)
+  if isinstance(file_contents, StagedOutput):
+    try:
+      logging.info('writing file: %s', output_file)
+      os.replace(file_contents.path, output_file)
+    except IOError:
+      logging.warning('error while writing file: %s', output_file)
+      _Unlink(file_contents.path)
+      raise
+    return
+  temp_file = output_file.with_name(
+      '.%s.%d.tmp' % (output_file.name, os.getpid()))
   try:
-    parent_path = pathlib.Path(output_file).parent
+    parent_path = output_file.parent
     if not parent_path.is_dir():
       parent_path.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w') as output:
+    with open(temp_file, 'w') as output:
       logging.info('writing file: %s', output_file)
       output.write(file_contents)
+    os.replace(temp_file, output_file)
   except IOError:
     logging.warning('error while writing file: %s', output_file)
+    _Unlink(temp_file)
     raise
 
 
+def _Unlink(path: pathlib.Path):
+  """Removes a file, if it exists."""
+  try:
+    path.unlink()
+  except FileNotFoundError:
+    pass
+
+
+def _RenderPolicy(
+    args: Tuple
+) -> Tuple[str, float, WriteList, Optional[renderprofile.FileProfile],
+           List[Tuple[pathlib.Path, str]]]:
+  """Renders one policy, or some of its platforms, in a renderer process.
+
+  Args:
+    args: the task name followed by the arguments of RenderFile, without
+      write_files, and the profile options: None when the render is not
+      profiled, or whether cProfile statistics are collected.
+
+  Returns:
+    The task name, its render time in seconds, the WriteList of the changed
+    files, the FileProfile of the render, if any, and
+    the (output_file, digest) tuples of the unchanged files which the output
+    manifest did not list yet.
+  """
+  (name, base_directory, input_file, output_directory, definitions, exp_info,
+   optimize, shade_check, render_cache, render_platforms, manifest,
+   staging_directory, cprofile) = args
+  write_files: WriteList = []
+  profile = None
+  if cprofile is not None:
+    profile = renderprofile.FileProfile(name, cprofile=cprofile)
+  # Terms left unchanged since the last render of the task are not rendered
+  # again when the policy has to be.
+  term_cache = render_cache.TermCache(name) if render_cache else None
+  start = time.perf_counter()
+  with contextlib.ExitStack() as profiling:
+    if profile:
+      profiling.enter_context(profile)
+    with contextlib.ExitStack() as caching:
+      if term_cache:
+        caching.enter_context(term_cache)
+      RenderFile(base_directory, input_file, output_directory, definitions,
+                 exp_info, optimize, shade_check, write_files, render_cache,
+                 render_platforms, manifest, staging_directory)
+    if term_cache:
+      term_cache.Save()
+  verified = []
+  if manifest:
+    verified, manifest.verified = manifest.verified, []
+  return name, time.perf_counter() - start, write_files, profile, verified
+
+
+def _Write(write_files: WriteList,
+           profile: Optional[renderprofile.FileProfile],
+           manifest: Optional[outputmanifest.Manifest] = None,
+           verified: List[Tuple[pathlib.Path, str]] = ()) -> int:
+  """Writes the changed files of a render, adding the time to its profile.
+
+  The written files, and the unchanged files verified by the renderer, are
+  recorded in the output manifest, if any.
+  """
+  start = time.perf_counter()
+  written = WriteFiles(write_files)
+  if manifest:
+    for output_file, file_contents in write_files:
+      if isinstance(file_contents, StagedOutput):
+        manifest.Record(output_file, file_contents.digest)
+      else:
+        manifest.Record(output_file, outputmanifest.Digest(file_contents))
+    for output_file, digest in verified:
+      manifest.Record(output_file, digest)
+  if profile:
+    seconds = time.perf_counter() - start
+    profile.Add('write', seconds)
+    profile.seconds += seconds
+  return written
+
+
+def _StagingDirectory(output_directory: str) -> tempfile.TemporaryDirectory:
+  """Returns the directory in which the ACLs of a run are staged.
+
+  It is made in the output directory, so that the staged ACLs are on the
+  filesystem of their output files, which they replace without being copied.
+  """
+  pathlib.Path(output_directory).mkdir(parents=True, exist_ok=True)
+  return tempfile.TemporaryDirectory(prefix='.aclgen-', dir=output_directory)
+
+
 def Run(base_directory: str, definitions_directory: str, policy_file: str,
         output_directory: str, exp_info: int, max_renderers: int,
         ignore_directories: List[str], optimize: bool, shade_check: bool,
-        context: multiprocessing.context.BaseContext):
+        context: multiprocessing.context.BaseContext,
+        cache_directory: Optional[str] = None,
+        stats_file: Optional[str] = None,
+        profile_report: Optional[str] = None,
+        profile_slowest: int = 0,
+        naming_cache: Optional[str] = None,
+        output_manifest: bool = False,
+        print_changed: bool = False):
   """Generate ACLs.
 
   Args:
@@ -635,57 +739,151 @@ def Run(base_directory: str, definitions_directory: str, policy_file: str,
     optimize: a boolean indicating if we should turn on optimization or not.
     shade_check: should we raise an error if a term is completely shaded.
     context: multiprocessing context
+    cache_directory: optional directory of the render cache; when unset every
+      policy is rendered.
+    stats_file: optional file in which the render time of every policy is
+      kept, so the slowest policies are started first in the next run.
+    profile_report: optional JSON or CSV file to which the time of every
+      policy, platform and phase and the peak memory of every policy are
+      written.
+    profile_slowest: the number of policies expected to be slowest, from the
+      stats file or their size, which are rendered with cProfile and whose
+      statistics are written next to the profile report.
+    naming_cache: optional file caching the definitions, which are parsed
+      again only when a definition file changed.
+    output_manifest: keep a manifest of the digests of the rendered files in
+      the output directory, and compare renders with it instead of reading
+      the files back.
+    print_changed: print the path of every file written, in sorted order.
   """
   definitions = None
+  snapshot = None
   try:
-    definitions = naming.Naming(definitions_directory)
+    if naming_cache:
+      definitions, snapshot = namingsnapshot.LoadNaming(
+          definitions_directory, naming_cache, processes=max_renderers)
+    else:
+      definitions = naming.Naming(definitions_directory,
+                                  processes=max_renderers)
   except naming.NoDefinitionsError:
     err_msg = 'bad definitions directory: %s' % definitions_directory
     logging.fatal(err_msg)
     return  # static type analyzer can't detect that logging.fatal exits program
 
-  # thead-safe list for storing files to write
-  manager: multiprocessing.managers.SyncManager = context.Manager()
-  write_files: WriteList = cast(WriteList, manager.list())
-
+  render_cache = None
+  if cache_directory:
+    render_cache = rendercache.RenderCache(cache_directory)
+  manifest = None
+  if output_manifest:
+    manifest = outputmanifest.Manifest(output_directory)
+
+  # Files are written as soon as their policy is rendered, so only the output
+  # of the policies in flight is held in memory.
+  files_written = 0
+  changed_files = []
   with_errors = False
+  report = renderprofile.Report()
   logging.info('finding policies...')
-  if policy_file:
-    # render just one file
-    logging.info('rendering one file')
-    RenderFile(base_directory, pathlib.Path(policy_file),
-               pathlib.Path(output_directory), definitions, exp_info, optimize,
-               shade_check, write_files)
-  elif max_renderers == 1:
-    # If only one process, run it sequentially
-    policies = DescendDirectory(base_directory, ignore_directories)
-    for pol in policies:
-      RenderFile(base_directory, pol, pathlib.Path(output_directory),
-                 definitions, exp_info, optimize, shade_check, write_files)
+  # Renderers stage the changed ACLs in a directory of the run, which is
+  # removed with whatever is left in it, even when the run is interrupted
+  # before the files of every finished render are written.
+  staging = _StagingDirectory(output_directory)
+  staging_directory = pathlib.Path(staging.name)
+  try:
+    if policy_file:
+      # render just one file
+      logging.info('rendering one file')
+      _, _, write_files, profile, verified = _RenderPolicy((
+          policy_file, base_directory, pathlib.Path(policy_file),
+          pathlib.Path(output_directory), definitions, exp_info, optimize,
+          shade_check, render_cache, None, manifest, staging_directory,
+          profile_slowest > 0 if profile_report else None))
+      changed_files.extend(output_file for output_file, _ in write_files)
+      files_written += _Write(write_files, profile, manifest, verified)
+      if profile:
+        report.Add(profile)
+    else:
+      # Policies are rendered largest first, as estimated from their previous
+      # render times, and the largest are split into a task per platform.
+      stats = renderscheduler.RenderStats(stats_file)
+      tasks = renderscheduler.Schedule(
+          DescendDirectory(base_directory, ignore_directories), base_directory,
+          max_renderers, stats, _SharedOutputs())
+      # None when renders are not profiled, else whether cProfile is used. It
+      # slows renders down a lot, so only the expected slowest are profiled.
+      cprofiles = [None] * len(tasks)
+      if profile_report:
+        cprofiles = [index < profile_slowest for index in range(len(tasks))]
+      if max_renderers == 1:
+        # If only one process, run it sequentially
+        for task, cprofile in zip(tasks, cprofiles):
+          name, seconds, write_files, profile, verified = _RenderPolicy((
+              task.name, base_directory, task.policy_file,
+              pathlib.Path(output_directory), definitions, exp_info, optimize,
+              shade_check, render_cache, task.platforms, manifest,
+              staging_directory, cprofile))
+          stats.Record(name, seconds)
+          changed_files.extend(output_file for output_file, _ in write_files)
+          files_written += _Write(write_files, profile, manifest, verified)
+          if profile:
+            report.Add(profile)
+      else:
+        # render all files in parallel
+        with tempfile.TemporaryDirectory() as snapshot_directory:
+          # Renderers map the expanded definitions from a file instead of
+          # receiving (and expanding) the full definitions for every policy.
+          # The naming cache is such a file.
+          if snapshot is None:
+            snapshot = namingsnapshot.Compile(
+                definitions,
+                pathlib.Path(snapshot_directory) / 'naming.snapshot')
+          with context.Pool(processes=max_renderers) as pool:
+            # Idle renderers take the next task, one at a time, and send back
+            # the changed files of each, which are written in the order the
+            # tasks finish.
+            results = pool.imap_unordered(
+                _RenderPolicy,
+                [(task.name, base_directory, task.policy_file,
+                  pathlib.Path(output_directory), snapshot, exp_info, optimize,
+                  shade_check, render_cache, task.platforms, manifest,
+                  staging_directory, cprofile)
+                 for task, cprofile in zip(tasks, cprofiles)])
+            while True:
+              try:
+                name, seconds, write_files, profile, verified = next(results)
+              except StopIteration:
+                break
+              except (ACLParserError, ACLGeneratorError) as e:
+                with_errors = True
+                logging.warning(
+                    '\n\nerror encountered in rendering process:\n%s\n\n', e)
+                continue
+              stats.Record(name, seconds)
+              changed_files.extend(
+                  output_file for output_file, _ in write_files)
+              files_written += _Write(write_files, profile, manifest, verified)
+              if profile:
+                report.Add(profile)
+      stats.Save()
+  finally:
+    staging.cleanup()
+  if manifest:
+    manifest.Save()
+
+  if profile_report:
+    report.Save(profile_report)
+    logging.info('wrote profile report: %s', profile_report)
+    for path in report.SaveSlowest(pathlib.Path(profile_report).parent,
+                                   profile_slowest):
+      logging.info('wrote cProfile statistics: %s', path)
+
+  if files_written:
+    logging.info('wrote %d files to disk', files_written)
   else:
-    # render all files in parallel
-    policies = DescendDirectory(base_directory, ignore_directories)
-    pool = context.Pool(processes=max_renderers)
-    results: List[multiprocessing.pool.AsyncResult] = []
-    for pol in policies:
-      results.append(
-          pool.apply_async(
-              RenderFile,
-              args=(base_directory, pol, output_directory, definitions,
-                    exp_info, optimize, shade_check, write_files)))
-    pool.close()
-    pool.join()
-
-    for result in results:
-      try:
-        result.get()
-      except (ACLParserError, ACLGeneratorError) as e:
-        with_errors = True
-        logging.warning('\n\nerror encountered in rendering process:\n%s\n\n',
-                        e)
-
-  # actually write files to disk
-  WriteFiles(write_files)
+    logging.info('no files changed, not writing to disk')
+  if print_changed:
+    for output_file in sorted(changed_files):
+      print(output_file)
 
   if with_errors:
     logging.warning('done, with errors.')
@@ -710,12 +908,25 @@ def main(argv):
       str(configs['policy_file']), str(configs['output_directory']))
   logging.debug('capirca configurations: %s', configs)
 
+  if configs['changed_includes']:
+    for policy_file in AffectedPolicies(configs['base_directory'],
+                                        configs['ignore_directories'],
+                                        configs['changed_includes']):
+      print(policy_file)
+    return
+
   context = multiprocessing.get_context()
 
   Run(configs['base_directory'], configs['definitions_directory'],
       configs['policy_file'], configs['output_directory'], configs['exp_info'],
       configs['max_renderers'], configs['ignore_directories'],
-      configs['optimize'], configs['shade_check'], context)
+      configs['optimize'], configs['shade_check'], context,
+      configs['cache_directory'], stats_file=configs['stats_file'],
+      profile_report=configs['profile_report'],
+      profile_slowest=configs['profile_slowest'],
+      naming_cache=configs['naming_cache'],
+      output_manifest=configs['output_manifest'],
+      print_changed=configs['print_changed'])
 
 
 def EntryPoint():
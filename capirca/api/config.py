@@ -23,6 +23,10 @@ class Settings(BaseSettings):
         "./def",
         description="Path to Capirca definition files for validation",
     )
+    naming_cache_file: str = Field(
+        "",
+        description="File caching the parsed definitions between requests",
+    )
 
     class Config:
         env_prefix = "CAPIRCA_"
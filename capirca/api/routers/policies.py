@@ -17,12 +17,22 @@ from capirca.api.models.schemas import (
     ValidationResult,
 )
 from capirca.api.services.validator import PolicyValidator
-from capirca.lib import naming, policy
+from capirca.api.config import get_settings
+from capirca.lib import naming, namingsnapshot, policy
 from capirca.api.services.graph import GraphService
 
 router = APIRouter(prefix="/policies", tags=["policies"])
 
 
+def _load_definitions() -> naming.Naming:
+    """Load the definitions, through the naming cache file when configured."""
+    cache_file = get_settings().naming_cache_file
+    if cache_file:
+        definitions, _ = namingsnapshot.LoadNaming('./def', cache_file)
+        return definitions
+    return naming.Naming('./def')
+
+
 @router.get("", response_model=List[Policy])
 def list_policies(
     skip: int = 0,
@@ -115,7 +125,7 @@ def validate_policy(
         raise HTTPException(status_code=404, detail="Policy not found")
     
     try:
-        definitions = naming.Naming('./def')
+        definitions = _load_definitions()
     except Exception:
         definitions = None
     
@@ -154,17 +164,16 @@ def get_policy_graph(
     try:
         # Load definitions if available
         try:
-            definitions = naming.Naming('./def')
+            definitions = _load_definitions()
         except Exception:
             definitions = None
             
         # Parse the policy
-        parsed_policy = policy.ParsePolicy(
-            db_policy.content,
+        parsed_policy = policy.PolicyParser(
             definitions=definitions,
             optimize=False,
             shade_check=False
-        )
+        ).Parse(db_policy.content)
         
         # Convert to graph
         graph_service = GraphService()
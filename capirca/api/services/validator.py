@@ -97,12 +97,11 @@ class PolicyValidator:
                 except Exception:
                     pass
             
-            parsed_policy = policy.ParsePolicy(
-                policy_content,
+            parsed_policy = policy.PolicyParser(
                 definitions=defs,
                 optimize=False,
                 shade_check=False
-            )
+            ).Parse(policy_content)
             
             if parsed_policy is False:
                 errors.append(ValidationError(
@@ -146,11 +145,10 @@ class PolicyValidator:
             return errors
         
         try:
-            parsed_policy = policy.ParsePolicy(
-                policy_content,
+            parsed_policy = policy.PolicyParser(
                 definitions=self.definitions,
                 optimize=False
-            )
+            ).Parse(policy_content)
             
             if parsed_policy is False:
                 return errors
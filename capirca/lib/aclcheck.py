@@ -15,6 +15,7 @@
 
 """Check where hosts, ports and protocols are matched in a capirca policy."""
 
+import bisect
 import logging
 from capirca.lib import nacaddr
 from capirca.lib import policy
@@ -40,6 +41,9 @@ class NoTargetError(Error):
 class AclCheck:
   """Check where hosts, ports and protocols match in a NAC policy.
 
+  Terms are checked one at a time. To check many flows against a policy,
+  compile it once with CompiledPolicy and use its Check and CheckMany.
+
   Attributes:
     pol_obj: policy.Policy object.
     pol: policy.Policy object.
@@ -68,45 +72,25 @@ class AclCheck:
                sport='any',
                dport='any',
                proto='any',
+               compiled=None,
               ):
 
     logging.debug('aclcheck __init__')
     self.pol_obj = pol
     self.proto = proto
-
-    # validate source port
-    if sport == 'any':
-      self.sport = sport
-    else:
-      self.sport = port.Port(sport)
-
-    # validate destination port
-    if dport == 'any':
-      self.dport = dport
-    else:
-      self.dport = port.Port(dport)
-
-    # validate source address
-    if src == 'any':
-      self.src = src
-    else:
-      try:
-        self.src = nacaddr.IP(src)
-      except ValueError:
-        raise AddressError('bad source address: %s\n' % src)
-
-    # validate destination address
-    if dst == 'any':
-      self.dst = dst
-    else:
-      try:
-        self.dst = nacaddr.IP(dst)
-      except ValueError:
-        raise AddressError('bad destination address: %s\n' % dst)
+    self.sport = _ParsePort(sport)
+    self.dport = _ParsePort(dport)
+    self.src = _ParseAddress(src, 'source')
+    self.dst = _ParseAddress(dst, 'destination')
 
     if not isinstance(self.pol_obj, (policy.Policy)):
       raise BadPolicyError('Policy object is not valid.')
 
+    if compiled is not None:
+      self.matches, self.exact_matches = compiled.Lookup(
+          self.src, self.dst, self.sport, self.dport, self.proto)
+      return
+
     self.matches = []
     self.exact_matches = []
     for header, terms in self.pol_obj.filters:
@@ -218,18 +202,7 @@ class AclCheck:
     Returns:
       ret_str: a list of reasons this term may possible match
     """
-    ret_str = []
-    if 'first-fragment' in term.option:
-      ret_str.append('first-frag')
-    if term.fragment_offset:
-      ret_str.append('frag-offset')
-    if term.packet_length:
-      ret_str.append('packet-length')
-    if 'established' in term.option:
-      ret_str.append('est')
-    if 'tcp-established' in term.option and 'tcp' in term.protocol:
-      ret_str.append('tcp-est')
-    return ret_str
+    return _PossibleMatch(term)
 
   def _AddrInside(self, addr, addresses):
     """Check if address is matched in another address or group of addresses.
@@ -287,6 +260,295 @@ class Match:
     return text
 
 
+def _ParsePort(value):
+  """Returns the port number of value, or 'any'."""
+  if value == 'any':
+    return value
+  return port.Port(value)
+
+
+def _ParseAddress(value, kind):
+  """Returns the nacaddr of value, or 'any'.
+
+  Args:
+    value: an address, network or 'any'.
+    kind: 'source' or 'destination', used in the error message.
+
+  Returns:
+    A nacaddr.IPv4 or nacaddr.IPv6 object, or 'any'.
+
+  Raises:
+    AddressError: value is not an address.
+  """
+  if value == 'any':
+    return value
+  try:
+    return nacaddr.IP(value)
+  except ValueError:
+    raise AddressError('bad %s address: %s\n' % (kind, value))
+
+
+def _PossibleMatch(term):
+  """Returns the list of reasons a matching term may only possibly match."""
+  ret_str = []
+  if 'first-fragment' in term.option:
+    ret_str.append('first-frag')
+  if term.fragment_offset:
+    ret_str.append('frag-offset')
+  if term.packet_length:
+    ret_str.append('packet-length')
+  if 'established' in term.option:
+    ret_str.append('est')
+  if 'tcp-established' in term.option and 'tcp' in term.protocol:
+    ret_str.append('tcp-est')
+  return ret_str
+
+
+class _IntervalIndex:
+  """The terms matching every point of a line of addresses or ports.
+
+  The ranges of all terms cut the line into elementary intervals, within which
+  the same terms match.  Each interval holds the bitmask of those terms, bit i
+  standing for term i, so finding the terms of a point is a binary search.
+  """
+
+  def __init__(self, wildcard=0):
+    # The terms that match every point, such as terms without addresses.
+    self.wildcard = wildcard
+    self._ranges = []
+    self._starts = [0]
+    self._masks = [0]
+
+  def Add(self, first, last, bit):
+    """Adds the range [first, last] to the term of bit."""
+    self._ranges.append((first, last, bit))
+
+  def Compile(self):
+    """Builds the elementary intervals from the ranges added."""
+    events = {}
+    for first, last, bit in self._ranges:
+      events.setdefault(first, []).append((bit, 1))
+      events.setdefault(last + 1, []).append((bit, -1))
+    # A term may hold overlapping ranges, so count the ranges of every term
+    # covering the current point.
+    counts = {}
+    mask = 0
+    starts = [0]
+    masks = [0]
+    for point in sorted(events):
+      for bit, delta in events[point]:
+        count = counts.get(bit, 0) + delta
+        counts[bit] = count
+        if count:
+          mask |= bit
+        else:
+          mask &= ~bit
+      if point == starts[-1]:
+        masks[-1] = mask
+      elif mask != masks[-1]:
+        starts.append(point)
+        masks.append(mask)
+    self._starts = starts
+    self._masks = masks
+    self._ranges = []
+
+  def Lookup(self, point):
+    """Returns the bitmask of the terms matching point."""
+    return (self._masks[bisect.bisect_right(self._starts, point) - 1] |
+            self.wildcard)
+
+
+class _CompiledFilter:
+  """The terms of one filter, indexed by every field AclCheck matches."""
+
+  def __init__(self, filtername, terms):
+    self.filtername = filtername
+    self.terms = terms
+    self.source = self._AddressIndexes(terms, 'source_address')
+    self.destination = self._AddressIndexes(terms, 'destination_address')
+    self.source_port = self._PortIndex(terms, 'source_port')
+    self.destination_port = self._PortIndex(terms, 'destination_port')
+    self.protocols = {}
+    self.any_protocol = 0
+    self.protocol_except = {}
+    self.actionable = 0
+    self.results = []
+    for i, term in enumerate(terms):
+      bit = 1 << i
+      if term.protocol:
+        for proto in term.protocol:
+          self.protocols[proto] = self.protocols.get(proto, 0) | bit
+      else:
+        self.any_protocol |= bit
+      for proto in term.protocol_except:
+        self.protocol_except[proto] = self.protocol_except.get(proto, 0) | bit
+      if term.action:  # avoid any verbatim
+        self.actionable |= bit
+      possible = _PossibleMatch(term)
+      match = Match(filtername, term.name, possible, term.action, term.qos)
+      exact = None
+      if not possible and 'next' not in term.action:
+        exact = Match(filtername, term.name, [], term.action, term.qos)
+      self.results.append((match, exact))
+
+  @staticmethod
+  def _AddressIndexes(terms, field):
+    """Returns an _IntervalIndex of the addresses of field per IP version."""
+    indexes = {4: _IntervalIndex(), 6: _IntervalIndex()}
+    for i, term in enumerate(terms):
+      bit = 1 << i
+      addresses = getattr(term, field)
+      if not addresses:
+        for index in indexes.values():
+          index.wildcard |= bit
+      for addr in addresses:
+        indexes[addr.version].Add(int(addr.network_address),
+                                  int(addr.broadcast_address), bit)
+    for index in indexes.values():
+      index.Compile()
+    return indexes
+
+  @staticmethod
+  def _PortIndex(terms, field):
+    """Returns an _IntervalIndex of the ports of field."""
+    index = _IntervalIndex()
+    for i, term in enumerate(terms):
+      bit = 1 << i
+      ports = getattr(term, field)
+      if not ports:
+        index.wildcard |= bit
+      for first, last in ports:
+        index.Add(first, last, bit)
+    index.Compile()
+    return index
+
+  def _AddressMask(self, indexes, addr):
+    """Returns the bitmask of the terms whose addresses may hold addr."""
+    index = indexes[addr.version]
+    first = int(addr.network_address)
+    last = int(addr.broadcast_address)
+    if first == last:
+      return index.Lookup(first)
+    # A term holding both ends of a network may still hold them in different
+    # addresses, which is checked term by term in Lookup.
+    return index.Lookup(first) & index.Lookup(last)
+
+  def Lookup(self, src, dst, sport, dport, proto, matches, exact_matches):
+    """Appends the matches of a flow in this filter, in term order."""
+    mask = self.actionable
+    if src != 'any':
+      mask &= self._AddressMask(self.source, src)
+    if mask and dst != 'any':
+      mask &= self._AddressMask(self.destination, dst)
+    if mask and sport != 'any':
+      mask &= self.source_port.Lookup(sport)
+    if mask and dport != 'any':
+      mask &= self.destination_port.Lookup(dport)
+    if mask and proto != 'any':
+      mask &= self.protocols.get(proto, 0) | self.any_protocol
+    if mask:
+      mask &= ~self.protocol_except.get(proto, 0)
+    while mask:
+      low = mask & -mask
+      mask ^= low
+      i = low.bit_length() - 1
+      term = self.terms[i]
+      if not (self._Holds(src, term.source_address) and
+              self._Holds(dst, term.destination_address)):
+        continue
+      match, exact = self.results[i]
+      matches.append(match)
+      if exact:
+        exact_matches.append(exact)
+        return
+
+  @staticmethod
+  def _Holds(addr, addresses):
+    """Checks a network flow address against the addresses of a term."""
+    if addr == 'any' or not addresses or addr.num_addresses == 1:
+      return True
+    return any(addr.subnet_of(ip) for ip in addresses)
+
+
+class CompiledPolicy:
+  """A policy compiled once to check many flows against it.
+
+  The terms of every filter are indexed by address, port and protocol, so
+  finding the terms matching a flow takes a few binary searches instead of a
+  pass over every term.  The matches are the same as those of AclCheck.
+
+  Sample usage:
+    compiled = CompiledPolicy(pol)
+    check = compiled.Check(src='10.1.1.1', dport='80', proto='tcp')
+    checks = compiled.CheckMany([{'src': '10.1.1.1', 'dport': '443'}])
+
+  Attributes:
+    pol_obj: policy.Policy object.
+  """
+
+  def __init__(self, pol):
+    if not isinstance(pol, (policy.Policy)):
+      raise BadPolicyError('Policy object is not valid.')
+    self.pol_obj = pol
+    self._filters = [
+        _CompiledFilter(header.target[0].options[0], terms)
+        for header, terms in pol.filters]
+
+  def Lookup(self, src, dst, sport, dport, proto):
+    """Finds the terms of every filter matching a flow.
+
+    Args:
+      src: source nacaddr, or 'any'.
+      dst: destination nacaddr, or 'any'.
+      sport: source port number, or 'any'.
+      dport: destination port number, or 'any'.
+      proto: protocol name, or 'any'.
+
+    Returns:
+      A tuple of the list of all matches and the list of exact matches.
+    """
+    matches = []
+    exact_matches = []
+    for compiled_filter in self._filters:
+      compiled_filter.Lookup(src, dst, sport, dport, proto, matches,
+                             exact_matches)
+    return matches, exact_matches
+
+  def Check(self, src='any', dst='any', sport='any', dport='any',
+            proto='any'):
+    """Returns the AclCheck of a flow."""
+    return AclCheck(self.pol_obj, src, dst, sport, dport, proto, compiled=self)
+
+  def CheckMany(self, flows):
+    """Checks many flows at once.
+
+    Flows repeated in the input are looked up once.
+
+    Args:
+      flows: iterable of flows, each a dict with any of the keys src, dst,
+        sport, dport and proto, or a tuple of them in that order.  Missing
+        fields are 'any'.
+
+    Returns:
+      The list of the AclCheck of every flow, in the order of flows.
+    """
+    checks = []
+    seen = {}
+    for flow in flows:
+      if isinstance(flow, dict):
+        flow = tuple(flow.get(key, 'any') for key in _FLOW_FIELDS)
+      else:
+        flow = tuple(flow) + ('any',) * (len(_FLOW_FIELDS) - len(flow))
+      check = seen.get(flow)
+      if check is None:
+        check = seen[flow] = self.Check(*flow)
+      checks.append(check)
+    return checks
+
+
+_FLOW_FIELDS = ('src', 'dst', 'sport', 'dport', 'proto')
+
+
 def main():
   pass
 
@@ -16,14 +16,23 @@
 """ACL Generator base class."""
 
 import copy
+import json
+from json import encoder
 import logging
 import re
 import string
 
 from capirca.lib import policy
+from capirca.lib import renderprofile
 import six
 import hashlib
 
+# Text of the networks formatted by AddressText, keyed by version, network
+# address and prefix length.
+_ADDRESS_TEXT = {}
+_ADDRESS_TEXT_LIMIT = 1 << 20
+
+
 # generic error class
 class Error(Exception):
   """Base error class."""
@@ -212,6 +221,10 @@ class ACLGenerator:
   _SUPPORTED_AF = {'inet', 'inet6'}
   # Commonly misspelled protocols that the generator should reject.
   _FILTER_BLACKLIST = {}
+  # Whether the generator modifies the nacaddr objects of the policy terms in
+  # place. Policies rendered by such generators get a private copy of every
+  # address instead of sharing them with the other generators.
+  MUTATES_ADDRESSES = True
 
   # Only warn if these tokens are not implemented by a platform. These are not
   # meant to be overridden in subclasses like supported tokens/sub tokens.
@@ -288,7 +301,7 @@ class ACLGenerator:
           # Only verify optional keywords if the term is active on the platform.
           err = []
           warn = []
-          for el, val in term.__dict__.items():
+          for el, val in term.AttributeItems():
             # Private attributes do not need to be valid keywords.
             if (val and el not in supported_tokens and not
                 el.startswith('flatten')):
@@ -319,7 +332,25 @@ class ACLGenerator:
       raise UnsupportedFilterError('\n %s' % '\n'.join(all_err))
     if all_warn:
       logging.debug('\n %s', '\n'.join(all_warn))
-    self._TranslatePolicy(pol, exp_info)
+    with renderprofile.Phase('translate_policy', self._PLATFORM):
+      self._TranslatePolicy(pol, exp_info)
+
+  def IterLines(self):
+    """Yields the rendered ACL line by line, each line with its line ending.
+
+    The lines joined are str(self).  Generators with large outputs override
+    this to yield their output while they render it, and define __str__ as
+    the lines joined; a subclass overriding __str__ must then override
+    IterLines as well.
+
+    Returns:
+      an iterator of strings, which may hold several lines.
+    """
+    return iter(str(self).splitlines(keepends=True))
+
+  def WriteTo(self, output):
+    """Writes the rendered ACL to a text file object, line by line."""
+    output.writelines(self.IterLines())
 
   def _TranslatePolicy(self, pol, exp_info):
     # pylint: disable=unused-argument
@@ -519,6 +550,130 @@ class ACLGenerator:
     return hashlib.sha256(name_bytes).hexdigest()[:truncation_length]
 
 
+def IterJoinedLines(lines):
+  """Yields the lines of '\n'.join(lines), without joining them.
+
+  Args:
+    lines: an iterable of strings.
+
+  Yields:
+    every string followed by a line ending, but the last.
+  """
+  lines = iter(lines)
+  previous = next(lines, None)
+  if previous is None:
+    return
+  for line in lines:
+    yield previous + '\n'
+    previous = line
+  yield previous
+
+
+def AddressText(address):
+  """Returns str(address) for an IP network, formatting each network once.
+
+  Generators render the same networks in many terms and address families, and
+  formatting IPv6 networks in particular is costly.
+
+  Args:
+    address: an ipaddress or nacaddr network.
+
+  Returns:
+    The network in CIDR notation, as str() returns it.
+  """
+  key = (address.version, int(address.network_address), address.prefixlen)
+  text = _ADDRESS_TEXT.get(key)
+  if text is None:
+    if len(_ADDRESS_TEXT) >= _ADDRESS_TEXT_LIMIT:
+      _ADDRESS_TEXT.clear()
+    text = _ADDRESS_TEXT[key] = str(address)
+  return text
+
+
+def AddressTexts(addresses):
+  """Returns the AddressText of every network of a list."""
+  return [AddressText(address) for address in addresses]
+
+
+class _NonStringKeyError(Exception):
+  """A dict key needs the conversions of json.dumps."""
+
+
+def DumpJson(obj, indent=2, sort_keys=False, separators=(',', ': ')):
+  """Returns json.dumps(obj, indent=indent, ...), faster.
+
+  json.dumps only uses its C encoder without indentation.  This encodes the
+  nesting of dicts and lists in Python too, but every list of strings with a
+  single join, and is used for the large outputs of JSON based generators.
+
+  Args:
+    obj: dicts, lists, tuples, strings, numbers, booleans and None.
+    indent: number of spaces to indent nested values with.
+    sort_keys: whether dict items are sorted by key.
+    separators: (item separator, key separator) tuple.
+
+  Returns:
+    The JSON text, as json.dumps returns it.
+  """
+  try:
+    return _DumpJson(obj, ' ' * indent, sort_keys, separators)
+  except _NonStringKeyError:
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys,
+                      separators=separators)
+
+
+def _DumpJson(obj, indent, sort_keys, separators):
+  """Returns the JSON text of obj, for DumpJson."""
+  item_separator, key_separator = separators
+  encode_string = encoder.encode_basestring_ascii
+  chunks = []
+  append = chunks.append
+
+  def Encode(value, newline):
+    if isinstance(value, str):
+      append(encode_string(value))
+    elif isinstance(value, dict):
+      if not value:
+        append('{}')
+        return
+      inner = newline + indent
+      items = sorted(value.items()) if sort_keys else value.items()
+      append('{')
+      separator = inner
+      for key, item in items:
+        if not isinstance(key, str):
+          raise _NonStringKeyError()
+        append(separator)
+        append(encode_string(key))
+        append(key_separator)
+        Encode(item, inner)
+        separator = item_separator + inner
+      append(newline)
+      append('}')
+    elif isinstance(value, (list, tuple)):
+      if not value:
+        append('[]')
+        return
+      inner = newline + indent
+      append('[')
+      if all(isinstance(item, str) for item in value):
+        append(inner)
+        append((item_separator + inner).join(map(encode_string, value)))
+      else:
+        separator = inner
+        for item in value:
+          append(separator)
+          Encode(item, inner)
+          separator = item_separator + inner
+      append(newline)
+      append(']')
+    else:
+      append(json.dumps(value))
+
+  Encode(obj, '\n')
+  return ''.join(chunks)
+
+
 def ProtocolNameToNumber(protocols, proto_to_num, name_to_num_map):
   """Convert a protocol name to a numeric value.
 
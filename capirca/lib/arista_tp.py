@@ -753,6 +753,7 @@ class AristaTrafficPolicy(aclgenerator.ACLGenerator):
   _AF_MAP = {"inet": 4, "inet6": 6}
   _DEFAULT_PROTOCOL = "ip"
   _PLATFORM = "arista_tp"
+  MUTATES_ADDRESSES = False
   _SUPPORTED_AF = frozenset(("inet", "inet6", "mixed"))
   _TERM = Term
   _LOGGING = set()
@@ -241,6 +241,7 @@ class Aruba(aclgenerator.ACLGenerator):
   """
 
   SUFFIX = '.aacl'
+  MUTATES_ADDRESSES = False
 
   _ACL_LINE_HEADER = 'ip access-list session'
 
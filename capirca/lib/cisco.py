@@ -16,12 +16,14 @@
 """Cisco generator."""
 
 import datetime
+import hashlib
 import ipaddress
 from typing import cast, Union
 
 from absl import logging
 from capirca.lib import aclgenerator
 from capirca.lib import nacaddr
+from capirca.lib import rendercache
 from capirca.lib import summarizer
 
 
@@ -196,6 +198,66 @@ class TermStandard:
     return '\n'.join(ret_str)
 
 
+class ObjectGroupRegistry:
+  """The object groups of every object-group filter of a policy.
+
+  A network group is named after the token of its first address, and a port
+  group after its range.  Each group is defined once for the whole policy;
+  a network group whose name is taken by a group of other addresses is named
+  after the hash of its addresses too.  Interned network groups are looked up
+  by their addresses, so that identical groups of other names are shared.
+  """
+
+  def __init__(self):
+    # (af, handle) -> the lines of the network group.
+    self._networks = {}
+    # (af, the lines of the network group) -> handle of an interned group.
+    self._interned = {}
+    self._ports = set()
+
+  def Network(self, name, af, addrs, intern=False):
+    """Returns the handle of a network group, and its definition if new.
+
+    Args:
+      name: the name of the group.
+      af: the address family of the group, 4 or 6.
+      addrs: the addresses of the group.
+      intern: whether a group of other name but the same addresses is used.
+
+    Returns:
+      the handle of the group, and the lines defining it or None if the group
+      is already defined.
+    """
+    lines = tuple(' %s/%s' % (addr.network_address, addr.prefixlen)
+                  for addr in addrs)
+    if intern and (af, lines) in self._interned:
+      return self._interned[af, lines], None
+    handle = name
+    if self._networks.get((af, handle), lines) != lines:
+      handle = '%s-%s' % (name, hashlib.sha256(
+          '\n'.join(lines).encode()).hexdigest()[:8])
+    self._interned.setdefault((af, lines), handle)
+    if (af, handle) in self._networks:
+      return handle, None
+    self._networks[af, handle] = lines
+    return handle, ['object-group network ipv%d %s' % (af, handle)] + list(
+        lines) + ['exit\n']
+
+  def Port(self, port):
+    """Returns the definition of a port group, or None if already defined."""
+    port_key = '%s-%s' % (port[0], port[1])
+    if port_key in self._ports:
+      return None
+    self._ports.add(port_key)
+    lines = ['object-group port %s' % port_key]
+    if port[0] != port[1]:
+      lines.append(' range %d %d' % (port[0], port[1]))
+    else:
+      lines.append(' eq %d' % port[0])
+    lines.append('exit\n')
+    return lines
+
+
 class ObjectGroup:
   """Used for printing out the object group definitions.
 
@@ -215,69 +277,67 @@ class ObjectGroup:
       172.24.0.0
       172.28.0.0
     exit
+
+  The groups are kept in an ObjectGroupRegistry shared by the filters of a
+  policy, and only those first used by this filter are printed here.
   """
 
-  def __init__(self, af=4):
+  def __init__(self, af=4, registry=None):
     self.filter_name = ''
     self.terms = []
     self.af = af
+    self.registry = registry or ObjectGroupRegistry()
+    self._lines = ['\n']
 
   @property
   def valid(self):
     return bool(self.terms)
 
-  def AddTerm(self, term):
+  def AddTerm(self, term, intern=False):
+    """Adds the object groups of a term.
+
+    Args:
+      term: the policy term.
+      intern: whether network groups of the same addresses are shared.
+
+    Returns:
+      the handles of the source and destination network groups, None for
+      any address.
+    """
     self.terms.append(term)
+    # I don't have an easy way get the token name used in the pol file
+    # w/o reading the pol file twice (with some other library) or doing
+    # some other ugly hackery. Instead, the entire block of source and dest
+    # addresses for a given term is given a unique, computable name which
+    # is not related to the NETWORK.net token name.  that's what you get
+    # for using cisco, which has decided to implement its own meta language.
+
+    # Create network object-groups
+    handles = []
+    for source_or_dest in ('source_address', 'destination_address'):
+      addrs = term.GetAddressOfVersion(source_or_dest, self.af)
+      handle = None
+      if addrs:
+        handle, lines = self.registry.Network(addrs[0].parent_token, self.af,
+                                              addrs, intern=intern)
+        if lines:
+          self._lines.extend(lines)
+      handles.append(handle)
+
+    # Create port object-groups
+    for port in term.source_port + term.destination_port:
+      if not port:
+        continue
+      lines = self.registry.Port(port)
+      if lines:
+        self._lines.extend(lines)
+    return tuple(handles)
 
   def AddName(self, filter_name):
     self.filter_name = filter_name
 
   def __str__(self):
-    ret_str = ['\n']
-    # netgroups will contain two-tuples of group name string and family int.
-    netgroups = set()
-    ports = {}
-
-    for term in self.terms:
-      # I don't have an easy way get the token name used in the pol file
-      # w/o reading the pol file twice (with some other library) or doing
-      # some other ugly hackery. Instead, the entire block of source and dest
-      # addresses for a given term is given a unique, computable name which
-      # is not related to the NETWORK.net token name.  that's what you get
-      # for using cisco, which has decided to implement its own meta language.
-
-      # Create network object-groups
-      addr_type = ('source_address', 'destination_address')
-
-      for source_or_dest in addr_type:
-        addrs = term.GetAddressOfVersion(source_or_dest, self.af)
-        if addrs:
-          net_def_name = addrs[0].parent_token
-          # We have addresses for this family and have not already seen it.
-          if (net_def_name, self.af) not in netgroups:
-            netgroups.add((net_def_name, self.af))
-            ret_str.append('object-group network ipv%d %s' % (
-                self.af, net_def_name))
-            for addr in addrs:
-              ret_str.append(' %s/%s' % (addr.network_address,
-                                         addr.prefixlen))
-            ret_str.append('exit\n')
-
-      # Create port object-groups
-      for port in term.source_port + term.destination_port:
-        if not port:
-          continue
-        port_key = '%s-%s' % (port[0], port[1])
-        if port_key not in ports:
-          ports[port_key] = True
-          ret_str.append('object-group port %s' % port_key)
-          if port[0] != port[1]:
-            ret_str.append(' range %d %d' % (port[0], port[1]))
-          else:
-            ret_str.append(' eq %d' % port[0])
-          ret_str.append('exit\n')
-
-    return '\n'.join(ret_str)
+    return '\n'.join(self._lines)
 
 
 class PortMap:
@@ -806,12 +866,16 @@ class ObjectGroupTerm(Term):
   # Protocols should be emitted as integers rather than strings.
   _PROTO_INT = True
 
-  def __init__(self, term, filter_name, af=4, platform='cisco', verbose=True):
+  def __init__(self, term, filter_name, af=4, platform='cisco', verbose=True,
+               source_group=None, destination_group=None):
     super().__init__(term, af=af)
     self.term = term
     self.filter_name = filter_name
     self.platform = platform
     self.verbose = verbose
+    # The handles of the network groups in the ObjectGroupRegistry.
+    self.source_group = source_group
+    self.destination_group = destination_group
 
   def __str__(self):
     # Verify platform specific terms. Skip whole term if platform does not
@@ -873,12 +937,14 @@ class ObjectGroupTerm(Term):
     source_address = self.term.source_address
     if not self.term.source_address:
       source_address = [nacaddr.IPv4('0.0.0.0/0', token='any')]
-    source_address_set.add(source_address[0].parent_token)
+    source_address_set.add(self.source_group or
+                           source_address[0].parent_token)
 
     destination_address = self.term.destination_address
     if not self.term.destination_address:
       destination_address = [nacaddr.IPv4('0.0.0.0/0', token='any')]
-    destination_address_set.add(destination_address[0].parent_token)
+    destination_address_set.add(self.destination_group or
+                                destination_address[0].parent_token)
     # ports
     source_port = [()]
     destination_port = [()]
@@ -922,6 +988,7 @@ class Cisco(aclgenerator.ACLGenerator):
   """A cisco policy object."""
 
   _PLATFORM = 'cisco'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'ip'
   SUFFIX = '.acl'
   # Protocols should be emitted as numbers.
@@ -968,6 +1035,9 @@ class Cisco(aclgenerator.ACLGenerator):
     good_filters = ['extended', 'standard', 'object-group',
                     'object-group-inet6', 'inet6', 'mixed', 'enable_dsmo']
 
+    # The object groups are defined once for all the filters.
+    registry = ObjectGroupRegistry()
+
     for header, terms in pol.filters:
       if self._PLATFORM not in header.platforms:
         continue
@@ -997,9 +1067,9 @@ class Cisco(aclgenerator.ACLGenerator):
                 filter_type, self._PLATFORM, str(good_filters)))
 
       if filter_type == 'object-group-inet6':
-        obj_target = ObjectGroup(af=6)
+        obj_target = ObjectGroup(af=6, registry=registry)
       else:
-        obj_target = ObjectGroup()
+        obj_target = ObjectGroup(registry=registry)
 
       filter_list = [filter_type]
       if filter_type == 'mixed':
@@ -1089,10 +1159,13 @@ class Cisco(aclgenerator.ACLGenerator):
               dsts = term.GetAddressOfVersion('destination_address', 4)
               if not dsts:
                 continue
-            obj_target.AddTerm(term)
+            source_group, destination_group = obj_target.AddTerm(
+                term, intern=self.remove_duplicate_network_objectgroups)
             new_terms.append(
                 self._GetObjectGroupTerm(
-                    term, filter_name, verbose=self.verbose
+                    term, filter_name, verbose=self.verbose,
+                    source_group=source_group,
+                    destination_group=destination_group,
                 )
             )
           elif next_filter == 'object-group-inet6':
@@ -1104,9 +1177,12 @@ class Cisco(aclgenerator.ACLGenerator):
               dsts = term.GetAddressOfVersion('destination_address', 6)
               if not dsts:
                 continue
-            obj_target.AddTerm(term)
-            new_terms.append(self._GetObjectGroupTerm(term, filter_name, af=6,
-                                                      verbose=self.verbose))
+            source_group, destination_group = obj_target.AddTerm(
+                term, intern=self.remove_duplicate_network_objectgroups)
+            new_terms.append(self._GetObjectGroupTerm(
+                term, filter_name, af=6, verbose=self.verbose,
+                source_group=source_group,
+                destination_group=destination_group))
           elif next_filter == 'inet6':
             new_terms.append(
                 Term(
@@ -1130,9 +1206,12 @@ class Cisco(aclgenerator.ACLGenerator):
             filter_options,
         ))
 
-  def _GetObjectGroupTerm(self, term, filter_name, af=4, verbose=True):
+  def _GetObjectGroupTerm(self, term, filter_name, af=4, verbose=True,
+                          source_group=None, destination_group=None):
     """Returns an ObjectGroupTerm object."""
-    return ObjectGroupTerm(term, filter_name, af=af, verbose=verbose)
+    return ObjectGroupTerm(term, filter_name, af=af, verbose=verbose,
+                           source_group=source_group,
+                           destination_group=destination_group)
 
   def _remove_duplicate_objects(self, target):
     """Remove all duplicate object-groups and rename to the first group found.
@@ -1397,7 +1476,7 @@ class Cisco(aclgenerator.ACLGenerator):
 
         # now add the terms
         for term in terms:
-          term_str = str(term)
+          term_str = rendercache.RenderTerm(term)
           if term_str:
             target.append(term_str)
 
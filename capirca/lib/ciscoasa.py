@@ -293,6 +293,7 @@ class CiscoASA(aclgenerator.ACLGenerator):
   """A cisco ASA policy object."""
 
   _PLATFORM = 'ciscoasa'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'ip'
   SUFFIX = '.asa'
 
@@ -64,10 +64,13 @@ class CiscoXR(cisco.Cisco):
 
     return supported_tokens, supported_sub_tokens
 
-  def _GetObjectGroupTerm(self, term, filter_name, af=4, verbose=True):
+  def _GetObjectGroupTerm(self, term, filter_name, af=4, verbose=True,
+                          source_group=None, destination_group=None):
     """Returns an ObjectGroupTerm object."""
     return CiscoXRObjectGroupTerm(term, filter_name, af=af,
-                                  platform=self._PLATFORM, verbose=verbose)
+                                  platform=self._PLATFORM, verbose=verbose,
+                                  source_group=source_group,
+                                  destination_group=destination_group)
 
 
 class CiscoXRObjectGroupTerm(cisco.ObjectGroupTerm):
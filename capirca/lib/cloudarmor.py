@@ -6,13 +6,10 @@ https://cloud.google.com/armor/docs/
 """
 
 import copy
-import json
 import logging
 
 from capirca.lib import aclgenerator
 
-import six
-
 
 # Generic error class
 class Error(Exception):
@@ -125,7 +122,7 @@ class Term(aclgenerator.Term):
         rule['match'] = {
             'versionedExpr': 'SRC_IPS_V1',
             'config': {
-                'srcIpRanges': [str(saddr) for saddr in chunk],
+                'srcIpRanges': aclgenerator.AddressTexts(chunk),
             }
         }
         rules.append(rule)
@@ -143,6 +140,7 @@ class CloudArmor(aclgenerator.ACLGenerator):
   """A CloudArmor policy object."""
 
   _PLATFORM = 'cloudarmor'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.gca'
   _SUPPORTED_AF = set(('inet', 'inet6', 'mixed'))
 
@@ -252,7 +250,5 @@ class CloudArmor(aclgenerator.ACLGenerator):
     """Return the JSON blob for CloudArmor."""
 
     out = '%s\n\n' % (
-        json.dumps(self.cloudarmor_policies, indent=2,
-                   separators=(six.ensure_str(','), six.ensure_str(': ')),
-                   sort_keys=True))
+        aclgenerator.DumpJson(self.cloudarmor_policies, sort_keys=True))
     return out
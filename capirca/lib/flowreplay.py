@@ -0,0 +1,292 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Replays flow records against a policy with aclcheck.
+
+Flows are read from CSV, with a header row, or from JSON lines.  Every flow
+has the fields src, dst, sport, dport and proto; a missing or empty field is
+'any'.  The policy is compiled once and the flows are checked in chunks,
+across a process pool when more than one process is used.  Forked workers
+inherit the compiled policy; others map the expanded definitions from a naming
+snapshot and only parse the policy.  Every flow gets a verdict, a JSON line
+listing the terms it matches, and the matches are counted per term.
+
+Sample usage:
+    hits = HitCounts()
+    for lines, chunk_hits in Replay('./def', policy_text, ReadFlows(f)):
+      out.writelines(lines)
+      hits.Merge(chunk_hits)
+    hits.Save(sys.stderr)
+"""
+
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import pathlib
+import tempfile
+
+from capirca.lib import aclcheck
+from capirca.lib import naming
+from capirca.lib import namingsnapshot
+from capirca.lib import policy
+from capirca.lib import port
+
+FLOW_FIELDS = ('src', 'dst', 'sport', 'dport', 'proto')
+DEFAULT_CHUNK_SIZE = 10000
+
+# The policy checked by a worker process, inherited from the parent or
+# compiled by the initializer of the worker.
+_COMPILED = None
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class FlowFormatError(Error):
+  """Flow records are not in a supported format."""
+
+
+def ReadFlows(stream, flow_format=None):
+  """Reads flow records.
+
+  Args:
+    stream: file object of the records.
+    flow_format: 'csv' or 'jsonl'.  When None, records whose first line starts
+      with '{' are JSON lines, others CSV.
+
+  Yields:
+    A tuple of the fields of every flow, in the order of FLOW_FIELDS.
+
+  Raises:
+    FlowFormatError: the format is unknown or a record cannot be read.
+  """
+  first = stream.readline()
+  lines = itertools.chain([first], stream)
+  if flow_format is None:
+    flow_format = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+  if flow_format == 'csv':
+    records = csv.DictReader(lines)
+  elif flow_format == 'jsonl':
+    records = _ReadJsonLines(lines)
+  else:
+    raise FlowFormatError('unknown flow format: %s' % flow_format)
+  for record in records:
+    yield tuple(str(record.get(field) or 'any').strip()
+                for field in FLOW_FIELDS)
+
+
+def _ReadJsonLines(lines):
+  for number, line in enumerate(lines, 1):
+    if not line.strip():
+      continue
+    try:
+      record = json.loads(line)
+    except ValueError as e:
+      raise FlowFormatError('bad flow record on line %d: %s' % (number, e))
+    if not isinstance(record, dict):
+      raise FlowFormatError('flow record on line %d is not an object' % number)
+    yield record
+
+
+class HitCounts:
+  """The number of flows matching every term.
+
+  Attributes:
+    flows: the number of flows checked.
+    errors: the number of flows that could not be checked.
+    terms: dict of (filter, term, action) to a list of the number of flows
+      matching the term, exactly matching it and possibly matching it.
+  """
+
+  def __init__(self):
+    self.flows = 0
+    self.errors = 0
+    self.terms = {}
+
+  def Add(self, check):
+    """Counts the matches of an AclCheck."""
+    exact = {(match.filter, match.term) for match in check.ExactMatches()}
+    for match in check.Matches():
+      counts = self.terms.setdefault((match.filter, match.term, match.action),
+                                     [0, 0, 0])
+      counts[0] += 1
+      if (match.filter, match.term) in exact:
+        counts[1] += 1
+      if match.possibles:
+        counts[2] += 1
+
+  def Merge(self, other):
+    """Adds the counts of another HitCounts."""
+    self.flows += other.flows
+    self.errors += other.errors
+    for key, other_counts in other.terms.items():
+      counts = self.terms.setdefault(key, [0, 0, 0])
+      for i, count in enumerate(other_counts):
+        counts[i] += count
+
+  def Save(self, stream):
+    """Writes the counts as CSV, most matched terms first."""
+    writer = csv.writer(stream)
+    writer.writerow(['filter', 'term', 'action', 'matches', 'exact',
+                     'possible'])
+    for (filtername, term, action), counts in sorted(
+        self.terms.items(), key=lambda item: (-item[1][0], item[0])):
+      writer.writerow([filtername, term, action] + counts)
+
+
+def Verdict(flow, check):
+  """Returns the verdict of a flow as a dict.
+
+  Args:
+    flow: tuple of the fields of the flow.
+    check: the AclCheck of the flow.
+
+  Returns:
+    A dict of the fields of the flow and the list of matches, each holding the
+    filter, term, action, possible match reasons and whether it is exact.
+  """
+  exact = {(match.filter, match.term) for match in check.ExactMatches()}
+  verdict = dict(zip(FLOW_FIELDS, flow))
+  verdict['matches'] = [
+      {'filter': match.filter, 'term': match.term, 'action': match.action,
+       'possibles': match.possibles,
+       'exact': (match.filter, match.term) in exact}
+      for match in check.Matches()]
+  return verdict
+
+
+def CheckFlows(compiled, flows):
+  """Checks a chunk of flows.
+
+  Args:
+    compiled: the aclcheck.CompiledPolicy to check the flows against.
+    flows: list of flows.
+
+  Returns:
+    A tuple of the list of the JSON verdict lines of the flows, in order, and
+    the HitCounts of the flows.
+  """
+  lines = []
+  hits = HitCounts()
+  seen = {}
+  for flow in flows:
+    hits.flows += 1
+    result = seen.get(flow)
+    if result is None:
+      try:
+        check = compiled.Check(*flow)
+      except (aclcheck.Error, port.Error) as e:
+        hits.errors += 1
+        verdict = dict(zip(FLOW_FIELDS, flow))
+        verdict['error'] = str(e).strip()
+        lines.append(json.dumps(verdict) + '\n')
+        continue
+      # Repeated flows, common in flow logs, are checked once.
+      result = seen[flow] = (json.dumps(Verdict(flow, check)) + '\n', check)
+    line, check = result
+    lines.append(line)
+    hits.Add(check)
+  return lines, hits
+
+
+def Compile(definitions_directory, policy_text):
+  """Compiles a policy for checking flows.
+
+  Args:
+    definitions_directory: directory of the naming definitions.
+    policy_text: text of the policy.
+
+  Returns:
+    A tuple of the naming.Naming definitions the policy was parsed with and
+    the aclcheck.CompiledPolicy of the policy.
+  """
+  defs = naming.Naming(definitions_directory)
+  return defs, aclcheck.CompiledPolicy(policy.ParsePolicy(policy_text, defs))
+
+
+def _InitWorker(snapshot, policy_text):
+  global _COMPILED
+  _COMPILED = aclcheck.CompiledPolicy(
+      policy.ParsePolicy(policy_text, snapshot))
+
+
+def _CheckChunk(flows):
+  return CheckFlows(_COMPILED, flows)
+
+
+def _Chunks(flows, chunk_size):
+  flows = iter(flows)
+  while True:
+    chunk = list(itertools.islice(flows, chunk_size))
+    if not chunk:
+      return
+    yield chunk
+
+
+def Replay(definitions_directory, policy_text, flows, processes=1,
+           chunk_size=DEFAULT_CHUNK_SIZE):
+  """Checks a stream of flows against a policy.
+
+  The flows are read as the chunks are checked, so the stream may be larger
+  than memory.
+
+  Args:
+    definitions_directory: directory of the naming definitions.
+    policy_text: text of the policy.
+    flows: iterable of flows, as yielded by ReadFlows.
+    processes: the number of processes checking the flows.
+    chunk_size: the number of flows checked per task.
+
+  Yields:
+    The result of CheckFlows for every chunk, in the order of the flows.
+  """
+  global _COMPILED
+  # Parse the policy here first, so errors in it are raised to the caller
+  # rather than in every worker.
+  defs, compiled = Compile(definitions_directory, policy_text)
+  if processes <= 1:
+    for chunk in _Chunks(flows, chunk_size):
+      yield CheckFlows(compiled, chunk)
+    return
+
+  context = multiprocessing.get_context()
+  with tempfile.TemporaryDirectory() as snapshot_directory:
+    if context.get_start_method() == 'fork':
+      # Workers forked from here inherit the compiled policy.
+      _COMPILED = compiled
+      initializer = None
+      initargs = ()
+    else:
+      initializer = _InitWorker
+      initargs = (namingsnapshot.Compile(
+          defs, pathlib.Path(snapshot_directory) / 'naming.snapshot'),
+                  policy_text)
+    try:
+      with context.Pool(processes=processes, initializer=initializer,
+                        initargs=initargs) as pool:
+        # Pool.imap reads its whole input ahead, so a bounded window of chunks
+        # is submitted instead.
+        pending = collections.deque()
+        for chunk in _Chunks(flows, chunk_size):
+          pending.append(pool.apply_async(_CheckChunk, (chunk,)))
+          if len(pending) > 2 * processes:
+            yield pending.popleft().get()
+        while pending:
+          yield pending.popleft().get()
+    finally:
+      _COMPILED = None
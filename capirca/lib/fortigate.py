@@ -740,6 +740,7 @@ class Fortigate(aclgenerator.ACLGenerator):
   """A Fortigate policy object."""
 
   _PLATFORM = 'fortigate'
+  MUTATES_ADDRESSES = False
   _NGFW_MODE = 'profile-based'
   _DEFAULT_PROTOCOL = 'ALL'
   SUFFIX = '.fcl'
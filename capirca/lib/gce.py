@@ -28,6 +28,7 @@ import logging
 import re
 from typing import Any, Dict, Iterable, List
 
+from capirca.lib import aclgenerator
 from capirca.lib import gcp
 from capirca.lib import nacaddr
 import six
@@ -395,7 +396,7 @@ class Term(gcp.Term):
         rule = copy.deepcopy(proto_dict)
         if len(source_addr_chunks) > 1:
           rule['name'] = '%s-%d' % (rule['name'], i+1)
-        rule['sourceRanges'] = [str(saddr) for saddr in chunk]
+        rule['sourceRanges'] = aclgenerator.AddressTexts(chunk)
         rules.append(rule)
     elif daddrs:
       dest_addr_chunks = [
@@ -405,7 +406,7 @@ class Term(gcp.Term):
         rule = copy.deepcopy(proto_dict)
         if len(dest_addr_chunks) > 1:
           rule['name'] = '%s-%d' % (rule['name'], i+1)
-        rule['destinationRanges'] = [str(daddr) for daddr in chunk]
+        rule['destinationRanges'] = aclgenerator.AddressTexts(chunk)
         rules.append(rule)
     else:
       rules.append(proto_dict)
@@ -489,6 +490,11 @@ class GCE(gcp.GCP):
           address_family = i
           filter_options.remove(i)
 
+      # Merge rules to lower the attribute count if set.
+      pack = 'pack' in filter_options
+      if pack:
+        filter_options.remove('pack')
+
       for opt in filter_options:
         try:
           max_attribute_count = int(opt)
@@ -505,6 +511,7 @@ class GCE(gcp.GCP):
         logging.warning('GCE filter does not specify a network.')
 
       term_names = set()
+      filter_rules = []
       if IsDefaultDeny(terms[-1]):
         terms[-1].protocol = ['all']
         terms[-1].priority = 65534
@@ -569,32 +576,70 @@ class GCE(gcp.GCP):
         else:
           term_address_families = [address_family]
         for term_af in term_address_families:
-          for rules in Term(term, term_af, address_family).ConvertToDict():
-            logging.debug('Attribute count of rule %s is: %d', term.name,
-                          GetAttributeCount(rules))
-            total_attribute_count += GetAttributeCount(rules)
-            total_rule_count += 1
-            if max_attribute_count and total_attribute_count > max_attribute_count:
-              # Stop processing rules as soon as the attribute count is over the
-              # limit.
-              raise ExceededAttributeCountError(
-                  'Attribute count (%d) for %s exceeded the maximum (%d)' %
-                  (total_attribute_count, filter_name, max_attribute_count))
-            self.gce_policies.append(rules)
+          filter_rules.extend(
+              Term(term, term_af, address_family).ConvertToDict())
+
+      if pack:
+        filter_rules = PackRules(filter_rules)
+      for rules in filter_rules:
+        attribute_count = GetAttributeCount(rules)
+        logging.debug('Attribute count of rule %s is: %d', rules['name'],
+                      attribute_count)
+        total_attribute_count += attribute_count
+        total_rule_count += 1
+        if max_attribute_count and total_attribute_count > max_attribute_count:
+          # Stop processing rules as soon as the attribute count is over the
+          # limit.
+          raise ExceededAttributeCountError(
+              'Attribute count (%d) for %s exceeded the maximum (%d)' %
+              (total_attribute_count, filter_name, max_attribute_count))
+        self.gce_policies.append(rules)
     logging.info('Total rule count of policy %s is: %d', filter_name,
                  total_rule_count)
     logging.info('Total attribute count of policy %s is: %d', filter_name,
                  total_attribute_count)
 
   def __str__(self):
-    out = '%s\n\n' % (json.dumps(self.gce_policies, indent=2,
-                                 separators=(six.ensure_str(','),
-                                             six.ensure_str(': ')),
-                                 sort_keys=True))
+    out = '%s\n\n' % (aclgenerator.DumpJson(self.gce_policies,
+                                            sort_keys=True))
 
     return out
 
 
+def PackRules(rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+  """Merges the rules of a filter into fewer rules of lower attribute count.
+
+  Rules of the same priority are merged when they differ only in their IP
+  ranges, protocols and ports, or target tags, as far as the per rule limits
+  allow.  GCE evaluates the rules of a priority together, so this does not
+  change what they match.
+
+  Args:
+    rules: rule dicts.
+
+  Returns:
+    The packed rule dicts, each with the name of a rule it replaces.
+  """
+
+  def Locator(*keys):
+
+    def Locate(rule):
+      for key in keys:
+        if key in rule:
+          return rule, key
+      return None
+
+    return Locate
+
+  dimensions = [
+      gcp.PackDimension(Locator('sourceRanges', 'destinationRanges'),
+                        Term._TERM_ADDRESS_LIMIT, addresses=True),
+      gcp.PackDimension(Locator('allowed', 'denied')),
+      gcp.PackDimension(Locator('targetTags'), Term._TERM_TARGET_TAGS_LIMIT),
+  ]
+  return gcp.PackRules(rules, dimensions, volatile=('name', 'description'))
+
+
 def GetAttributeCount(dict_term: Dict[str, Any]) -> int:
   """Calculate the attribute count of a term in its dictionary form.
 
@@ -27,6 +27,7 @@ import re
 
 from typing import Dict, Any
 
+from capirca.lib import aclgenerator
 from capirca.lib import gcp
 from capirca.lib import nacaddr
 import six
@@ -384,7 +385,7 @@ class Term(gcp.Term):
         rule = copy.deepcopy(proto_dict)
         if len(source_addr_chunks) > 1:
           rule['name'] = '%s-%d' % (rule['name'], i + 1)
-        rule['source_ranges'] = [str(saddr) for saddr in chunk]
+        rule['source_ranges'] = aclgenerator.AddressTexts(chunk)
         # if rule[
         #     'priority'] != Term.DENY_ALL_PRIORITY:  # If not the deny-all rule.
         rule['priority'] = priority_index
@@ -399,7 +400,7 @@ class Term(gcp.Term):
         rule = copy.deepcopy(proto_dict)
         if len(dest_addr_chunks) > 1:
           rule['name'] = '%s-%d' % (rule['name'], i + 1)
-        rule['destination_ranges'] = [str(daddr) for daddr in chunk]
+        rule['destination_ranges'] = aclgenerator.AddressTexts(chunk)
         # if rule[
         #     'priority'] != Term.DENY_ALL_PRIORITY:  # If not the deny-all rule.
         rule['priority'] = priority_index
@@ -607,11 +608,7 @@ class TerraformGCE(gcp.GCP):
 
   def __str__(self):
     out = '%s\n\n' % (
-        json.dumps(
-            self.resource_wrapper,
-            indent=2,
-            separators=(six.ensure_str(','), six.ensure_str(': ')),
-            sort_keys=True))
+        aclgenerator.DumpJson(self.resource_wrapper, sort_keys=True))
     return out
 
 
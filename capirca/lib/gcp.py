@@ -3,13 +3,15 @@
 Base class for GCP firewalling products.
 """
 
+import copy
 import ipaddress
+import itertools
 import json
 import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from capirca.lib import aclgenerator
-
-import six
+from capirca.lib import nacaddr
 
 
 class Error(Exception):
@@ -61,15 +63,12 @@ class GCP(aclgenerator.ACLGenerator):
 
   policies = []
   _GOOD_DIRECTION = ['INGRESS', 'EGRESS']
+  MUTATES_ADDRESSES = False
 
   def __str__(self):
     """Return the JSON blob for a GCP object."""
     out = '%s\n\n' % (
-        json.dumps(
-            self.policies,
-            indent=2,
-            separators=(six.ensure_str(','), six.ensure_str(': ')),
-            sort_keys=True))
+        aclgenerator.DumpJson(self.policies, sort_keys=True))
     return out
 
 
@@ -177,15 +176,122 @@ def FilterIPv4InIPv6FormatAddrs(addrs):
   """
   filtered = []
   for addr in addrs:
-    ipaddr = ipaddress.ip_interface(addr).ip
-    if isinstance(ipaddr, ipaddress.IPv6Address):
-      ipv6 = ipaddress.IPv6Address(ipaddr)
+    if hasattr(addr, 'network_address'):
+      ipaddr = addr.network_address
+    else:
+      ipaddr = ipaddress.ip_interface(addr).ip
+    if ipaddr.version == 6:
+      ip = int(ipaddr)
       # Check if it's an IPv4-mapped or 6to4 address.
-      if ipv6.ipv4_mapped is not None or ipv6.sixtofour is not None:
+      if ip >> 32 == 0xFFFF or ip >> 112 == 0x2002:
         continue
       # Check if it's an IPv4-compatible address.
-      if ipv6.packed.hex(
-      )[:24] == '000000000000000000000000' and not ipv6.is_unspecified:
+      if ip >> 32 == 0 and ip:
         continue
-    filtered += [addr]
+    filtered.append(addr)
   return filtered
+
+
+class PackDimension(NamedTuple):
+  """A list of match values along which rules can be merged.
+
+  The values of such a list are alternatives: a rule matches a packet when any
+  of them does.  Two rules equal but for this list can thus be replaced by one
+  rule with the values of both.
+
+  Attributes:
+    locate: function returning the dict holding the list in a rule dict and
+      its key, or None when the rule does not restrict on it.
+    limit: maximum length of the list in a rule, or None.
+    addresses: whether the values are IP ranges, collapsed when merged.
+  """
+  locate: Callable[[Dict[str, Any]], Optional[Tuple[Dict[str, Any], str]]]
+  limit: Optional[int] = None
+  addresses: bool = False
+
+
+def PackRules(rules: List[Dict[str, Any]], dimensions: List[PackDimension],
+              volatile: Tuple[str, ...],
+              run_key: Optional[Callable[[Dict[str, Any]], Any]] = None
+              ) -> List[Dict[str, Any]]:
+  """Merges rules which differ along one dimension, to lower their cost.
+
+  Rules are merged along each dimension in turn, and the merged lists are
+  split again into as few rules as the limit of the dimension allows.  Every
+  resulting rule keeps the volatile fields of one of the rules it replaces, in
+  order, so names stay unique.
+
+  Only rules of the same run are merged, runs being the maximal sequences of
+  consecutive rules with equal run_key.  Rules evaluated in order can be
+  reordered within a run of rules with the same action, but not across runs.
+
+  Args:
+    rules: rule dicts, which are not modified.
+    dimensions: the PackDimension to merge along, in order.
+    volatile: keys of the fields which do not affect what a rule matches, such
+      as its name.
+    run_key: function returning the run of a rule, or None when all the rules
+      can be reordered.
+
+  Returns:
+    The packed rule dicts, ordered by their first merged rule.
+  """
+  for dimension in dimensions:
+    packed = []
+    for _, run in itertools.groupby(rules, key=run_key or (lambda rule: None)):
+      groups = {}
+      for rule in run:
+        location = dimension.locate(rule)
+        if location is None:
+          key = object()
+        else:
+          key = _PackKey(rule, location, dimension, volatile)
+        groups.setdefault(key, []).append(rule)
+      for group in groups.values():
+        packed.extend(_MergeRules(group, dimension))
+    rules = packed
+  return rules
+
+
+def _PackKey(rule, location, dimension, volatile):
+  """Returns what a rule matches, but for the list of a dimension."""
+  container, key = location
+  values = container.pop(key)
+  try:
+    fields = [key, {k: v for k, v in rule.items() if k not in volatile}]
+    if dimension.addresses and values:
+      # A rule can not mix IPv4 and IPv6 ranges.
+      fields.append(':' in values[0])
+    return json.dumps(fields, sort_keys=True)
+  finally:
+    container[key] = values
+
+
+def _MergeRules(group, dimension):
+  """Returns the rules of a group merged along a dimension."""
+  if len(group) == 1:
+    return group
+  values = []
+  for rule in group:
+    container, key = dimension.locate(rule)
+    values.extend(container[key])
+  if dimension.addresses:
+    values = aclgenerator.AddressTexts(nacaddr.CollapseAddrList(
+        [nacaddr.IP(value) for value in values]))
+  else:
+    unique = {}
+    for value in values:
+      unique.setdefault(json.dumps(value, sort_keys=True), value)
+    values = list(unique.values())
+  limit = dimension.limit or len(values)
+  chunks = [values[i:i + limit] for i in range(0, len(values), limit)]
+  if len(chunks) > len(group):
+    # Only rules already over the limit can need more chunks.
+    return group
+  merged = []
+  for rule, chunk in zip(group, chunks):
+    rule = copy.deepcopy(rule)
+    container, key = dimension.locate(rule)
+    container[key] = chunk
+    merged.append(rule)
+  return merged
@@ -9,6 +9,7 @@ import re
 from typing import Dict, Any
 
 from absl import logging
+from capirca.lib import aclgenerator
 from capirca.lib import gcp
 from capirca.lib import nacaddr
 
@@ -298,13 +299,11 @@ class Term(gcp.Term):
       for daddr_chunk in destination_address_chunks:
         rule = copy.deepcopy(term_dict)
         if self.api_version == 'ga':
-          rule['match'][dest_ip_range] = [
-              daddr.with_prefixlen for daddr in daddr_chunk
-          ]
+          rule['match'][dest_ip_range] = aclgenerator.AddressTexts(
+              daddr_chunk)
         else:
-          rule['match']['config'][dest_ip_range] = [
-              daddr.with_prefixlen for daddr in daddr_chunk
-          ]
+          rule['match']['config'][dest_ip_range] = aclgenerator.AddressTexts(
+              daddr_chunk)
         rule['priority'] = priority_index
         rules.append(rule)
         priority_index += 1
@@ -345,13 +344,11 @@ class Term(gcp.Term):
       for saddr_chunk in source_address_chunks:
         rule = copy.deepcopy(term_dict)
         if self.api_version == 'ga':
-          rule['match'][src_ip_range] = [
-              saddr.with_prefixlen for saddr in saddr_chunk
-          ]
+          rule['match'][src_ip_range] = aclgenerator.AddressTexts(
+              saddr_chunk)
         else:
-          rule['match']['config'][src_ip_range] = [
-              saddr.with_prefixlen for saddr in saddr_chunk
-          ]
+          rule['match']['config'][src_ip_range] = aclgenerator.AddressTexts(
+              saddr_chunk)
         rule['priority'] = priority_index
         rules.append(rule)
         priority_index += 1
@@ -456,6 +453,11 @@ class HierarchicalFirewall(gcp.GCP):
           filter_options.remove(i)
           break
 
+      # Merge rules to lower the cost of the policy if set.
+      pack = 'pack' in filter_options
+      if pack:
+        filter_options.remove('pack')
+
       # Find the default maximum cost of a policy, an integer, if specified.
       max_cost = self._DEFAULT_MAXIMUM_COST
       for opt in filter_options:
@@ -521,6 +523,8 @@ class HierarchicalFirewall(gcp.GCP):
       else:
         term_address_families = [address_family]
 
+      filter_rules = []
+      first_priority = counter
       for term in terms:
         if term.stateless_reply:
           continue
@@ -561,11 +565,20 @@ class HierarchicalFirewall(gcp.GCP):
               api_version=api_version).ConvertToDict(priority_index=counter)
           if not rules:
             continue
-          for dict_term in rules:
-            total_cost += GetRuleTupleCount(dict_term, api_version)
-            policy['rules'].append(dict_term)
+          filter_rules.extend(rules)
           counter += len(rules)
 
+      if pack:
+        filter_rules = PackRules(filter_rules, api_version)
+        # Rules are evaluated in priority order, which packing keeps.
+        counter = first_priority
+        for dict_term in filter_rules:
+          dict_term['priority'] = counter
+          counter += 1
+      for dict_term in filter_rules:
+        total_cost += GetRuleTupleCount(dict_term, api_version)
+        policy['rules'].append(dict_term)
+
     # We want to check the total policy cost, not just per policy.
     if total_cost > policies_max_cost:
       raise ExceededCostError(
@@ -628,3 +641,56 @@ def GetRuleTupleCount(dict_term: Dict[str, Any], api_version):
       layer4_count += +1
 
   return addresses_count + layer4_count + targets_count + prefixes_count
+
+
+def PackRules(rules, api_version):
+  """Merges the rules of a policy into fewer rules of lower tuple count.
+
+  Consecutive rules with the same action, direction and logging are merged
+  when they differ only in their IP ranges, protocols and ports, or targets,
+  as far as the per rule limits allow.  This does not change what the rules
+  match, since these rules are evaluated in order and reordering them does
+  not change the action taken on a packet.
+
+  Args:
+    rules: rule dicts, in priority order.
+    api_version: A string indicating the api version.
+
+  Returns:
+    The packed rule dicts, in priority order, with their original priorities.
+  """
+  syntax = ApiVersionSyntaxMap.SYNTAX_MAP[api_version]
+
+  def Config(rule):
+    if api_version == 'ga':
+      return rule['match']
+    return rule['match']['config']
+
+  def LocateAddresses(rule):
+    config = Config(rule)
+    for key in (syntax['src_ip_range'], syntax['dest_ip_range']):
+      if key in config:
+        return config, key
+    return None
+
+  def LocateLayer4(rule):
+    config = Config(rule)
+    if syntax['layer_4_config'] in config:
+      return config, syntax['layer_4_config']
+    return None
+
+  def LocateTargets(rule):
+    if 'targetResources' in rule:
+      return rule, 'targetResources'
+    return None
+
+  dimensions = [
+      gcp.PackDimension(LocateAddresses, Term._TERM_ADDRESS_LIMIT,
+                        addresses=True),
+      gcp.PackDimension(LocateLayer4),
+      gcp.PackDimension(LocateTargets, Term._TERM_TARGET_RESOURCES_LIMIT),
+  ]
+  return gcp.PackRules(
+      rules, dimensions, volatile=('description', 'priority'),
+      run_key=lambda rule: (rule['action'], rule['direction'],
+                            rule['enableLogging']))
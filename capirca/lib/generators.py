@@ -0,0 +1,260 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Registry of the ACL generator of every platform.
+
+A generator module is only imported the first time a policy targeting its
+platform is rendered, so a run imports the generators it uses and no others.
+
+Generators of other packages register through the 'capirca.generators' entry
+point group.  The name of an entry point is the platform keyword and its
+value the aclgenerator.ACLGenerator subclass, for instance in setup.py:
+
+    entry_points={
+        'capirca.generators': ['myplatform = mypackage.mymodule:MyGenerator'],
+    }
+
+The entry points are only read when a policy targets a platform which is not
+built in, and never replace a built-in platform.  The errors of such a
+generator are reported as generator errors when they derive from
+aclgenerator.Error.
+
+Sample usage:
+    for plugin in generators.ForPlatforms(['juniper', 'cisco']):
+      generator = plugin.Load()
+"""
+
+import importlib
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+
+from absl import logging
+
+ENTRY_POINT_GROUP = 'capirca.generators'
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class UnknownPlatformError(Error):
+  """No generator is registered for a platform."""
+
+
+class PluginLoadError(Error):
+  """The generator of a platform can not be imported."""
+
+
+class Output(NamedTuple):
+  """A file rendered for every policy targeting a platform.
+
+  Attributes:
+    suffix: the suffix of the file, or None for the SUFFIX of the generator.
+    options: (name, value) pairs of keyword arguments of the generator.
+    binary: whether the file is compared with the file on disk as bytes.
+  """
+  suffix: Optional[str] = None
+  options: Tuple[Tuple[str, Any], ...] = ()
+  binary: bool = False
+
+
+class Plugin:
+  """A platform keyword and the generator rendering it.
+
+  Attributes:
+    platform: the keyword of the platform in policy targets.
+    target: the generator class, as 'module:attribute'.
+    outputs: the Output of every file rendered for a policy.
+  """
+
+  def __init__(self, platform: str, target: str,
+               outputs: Tuple[Output, ...] = (Output(),)):
+    self.platform = platform
+    self.target = target
+    self.outputs = outputs
+    self._generator = None
+
+  def __repr__(self):
+    return 'Plugin(%r, %r)' % (self.platform, self.target)
+
+  def Load(self):
+    """Returns the generator class, importing its module the first time.
+
+    Raises:
+      PluginLoadError: if the generator can not be imported.
+    """
+    if self._generator is None:
+      module_name, _, attribute = self.target.partition(':')
+      try:
+        generator = importlib.import_module(module_name)
+        for name in attribute.split('.'):
+          generator = getattr(generator, name)
+      except (ImportError, AttributeError) as e:
+        raise PluginLoadError('cannot load the generator %s of platform %s: %s'
+                              % (self.target, self.platform, e))
+      self._generator = generator
+    return self._generator
+
+  def Suffixes(self) -> List[str]:
+    """Returns the suffixes of the files rendered for a policy."""
+    return [output.suffix if output.suffix is not None else self.Load().SUFFIX
+            for output in self.outputs]
+
+
+# The built-in platforms, in the order their files are rendered.
+_BUILTIN_PLUGINS = (
+    Plugin('juniper', 'capirca.lib.juniper:Juniper', (Output('.jcl'),)),
+    Plugin('juniperevo', 'capirca.lib.juniperevo:JuniperEvo',
+           (Output('.evojcl'),)),
+    Plugin('msmpc', 'capirca.lib.junipermsmpc:JuniperMSMPC',
+           (Output('.msmpc'),)),
+    Plugin('srx', 'capirca.lib.junipersrx:JuniperSRX', (Output('.srx'),)),
+    Plugin('cisco', 'capirca.lib.cisco:Cisco', (Output('.acl'),)),
+    Plugin('ciscoasa', 'capirca.lib.ciscoasa:CiscoASA', (Output('.asa'),)),
+    Plugin('aruba', 'capirca.lib.aruba:Aruba', (Output('.aacl'),)),
+    Plugin('brocade', 'capirca.lib.brocade:Brocade', (Output('.bacl'),)),
+    Plugin('arista', 'capirca.lib.arista:Arista', (Output('.eacl'),)),
+    Plugin('arista_tp', 'capirca.lib.arista_tp:AristaTrafficPolicy',
+           (Output('.atp'),)),
+    Plugin('ipset', 'capirca.lib.ipset:Ipset', (Output('.ips'),)),
+    Plugin('iptables', 'capirca.lib.iptables:Iptables', (Output(''),)),
+    Plugin('nsxv', 'capirca.lib.nsxv:Nsxv', (Output('.nsx'),)),
+    Plugin('nsxt', 'capirca.lib.nsxt:Nsxt', (Output('.nsxt'),)),
+    Plugin('openconfig', 'capirca.lib.openconfig:OpenConfig',
+           (Output('.oacl'),)),
+    Plugin('speedway', 'capirca.lib.speedway:Speedway', (Output('.ipt'),)),
+    Plugin('pcap', 'capirca.lib.pcap:PcapFilter',
+           (Output('-accept.pcap'),
+            Output('-deny.pcap', options=(('invert', True),)))),
+    Plugin('packetfilter', 'capirca.lib.packetfilter:PacketFilter',
+           (Output('.pf'),)),
+    Plugin('windows_advfirewall',
+           'capirca.lib.windows_advfirewall:WindowsAdvFirewall',
+           (Output('.bat'),)),
+    Plugin('srxlo', 'capirca.lib.srxlo:SRXlo', (Output('.jsl'),)),
+    Plugin('cisconx', 'capirca.lib.cisconx:CiscoNX', (Output('.nxacl'),)),
+    Plugin('ciscoxr', 'capirca.lib.ciscoxr:CiscoXR', (Output('.xacl'),)),
+    Plugin('nftables', 'capirca.lib.nftables:Nftables', (Output('.nft'),)),
+    Plugin('gce', 'capirca.lib.gce:GCE', (Output('.gce'),)),
+    Plugin('gce_vpc_tf', 'capirca.lib.gce_vpc_tf:TerraformGCE',
+           (Output('.tf.json'),)),
+    Plugin('gcp_hf', 'capirca.lib.gcp_hf:HierarchicalFirewall',
+           (Output('.gcphf'),)),
+    Plugin('paloalto', 'capirca.lib.paloaltofw:PaloAltoFW', (Output('.xml'),)),
+    Plugin('sonic', 'capirca.lib.sonic:Sonic',
+           (Output('.json', binary=True),)),
+    Plugin('cloudarmor', 'capirca.lib.cloudarmor:CloudArmor',
+           (Output('.gca'),)),
+    Plugin('k8s', 'capirca.lib.k8s:K8s', (Output('.yml'),)),
+    Plugin('fortigate', 'capirca.lib.fortigate:Fortigate', (Output('.fcl'),)),
+    Plugin('fortigatelocalin',
+           'capirca.lib.fortigatelocalin:FortigateLocalIn',
+           (Output('.fcl'),)),
+)
+
+BUILTIN_PLATFORMS = frozenset(plugin.platform for plugin in _BUILTIN_PLUGINS)
+
+# Every registered platform, in render order.
+_REGISTRY = {plugin.platform: plugin for plugin in _BUILTIN_PLUGINS}
+_entry_points_loaded = False
+
+
+def Register(platform: str, target: str,
+             outputs: Tuple[Output, ...] = (Output(),)) -> Plugin:
+  """Registers the generator of a platform, rendered after those before it.
+
+  Args:
+    platform: the keyword of the platform in policy targets.
+    target: the generator class, as 'module:attribute'.
+    outputs: the Output of every file rendered for a policy.
+
+  Returns:
+    The registered Plugin.
+
+  Raises:
+    Error: if a generator is already registered for the platform.
+  """
+  if platform in _REGISTRY:
+    raise Error('a generator is already registered for platform %s: %s' %
+                (platform, _REGISTRY[platform].target))
+  plugin = Plugin(platform, target, outputs)
+  _REGISTRY[platform] = plugin
+  return plugin
+
+
+def Unregister(platform: str):
+  """Removes a platform added by Register or an entry point."""
+  if platform in BUILTIN_PLATFORMS:
+    raise Error('cannot unregister built-in platform %s' % platform)
+  _REGISTRY.pop(platform, None)
+
+
+def _EntryPoints():
+  """Returns the installed entry points of the generator group."""
+  try:
+    from importlib import metadata  # pylint: disable=g-import-not-at-top
+  except ImportError:
+    # Python before 3.8 has no entry point API.
+    return []
+  entry_points = metadata.entry_points()
+  if hasattr(entry_points, 'select'):
+    return list(entry_points.select(group=ENTRY_POINT_GROUP))
+  return list(entry_points.get(ENTRY_POINT_GROUP, []))
+
+
+def _LoadEntryPoints():
+  """Registers the generators of the entry points, once per process."""
+  global _entry_points_loaded
+  if _entry_points_loaded:
+    return
+  _entry_points_loaded = True
+  for entry_point in sorted(_EntryPoints(), key=lambda ep: ep.name):
+    if entry_point.name in _REGISTRY:
+      logging.warning('ignoring generator %s of platform %s, which is '
+                      'already registered', entry_point.value, entry_point.name)
+      continue
+    Register(entry_point.name, entry_point.value)
+
+
+def Registered() -> List[Plugin]:
+  """Returns the plugins registered so far, without reading entry points."""
+  return list(_REGISTRY.values())
+
+
+def Get(platform: str) -> Plugin:
+  """Returns the plugin of a platform.
+
+  Raises:
+    UnknownPlatformError: if no generator is registered for the platform.
+  """
+  if platform not in _REGISTRY:
+    _LoadEntryPoints()
+  if platform not in _REGISTRY:
+    raise UnknownPlatformError('no generator for platform %s' % platform)
+  return _REGISTRY[platform]
+
+
+def ForPlatforms(platforms: Iterable[str]) -> List[Plugin]:
+  """Returns the plugins of the platforms, in render order.
+
+  Platforms without a generator are skipped.
+
+  Args:
+    platforms: platform keywords.
+  """
+  platforms = set(platforms)
+  if not platforms.issubset(_REGISTRY):
+    _LoadEntryPoints()
+  return [plugin for platform, plugin in _REGISTRY.items()
+          if platform in platforms]
@@ -22,6 +22,7 @@ performace of iptables firewall.
 
 import string
 
+from capirca.lib import aclgenerator
 from capirca.lib import iptables
 from capirca.lib import nacaddr
 
@@ -194,6 +195,10 @@ class Ipset(iptables.Iptables):
     output.append(iptables_output)
     return '\n'.join(output)
 
+  def IterLines(self):
+    # The sets come first, but are only known once the rules are rendered.
+    return aclgenerator.ACLGenerator.IterLines(self)
+
   def _GenerateSetConfig(self, term):
     """Generates set configuration for supplied term.
 
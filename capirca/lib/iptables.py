@@ -22,6 +22,7 @@ from string import Template  # pylint: disable=g-importing-member
 from absl import logging
 from capirca.lib import aclgenerator
 from capirca.lib import nacaddr
+from capirca.lib import rendercache
 
 
 class Term(aclgenerator.Term):
@@ -627,6 +628,7 @@ class Iptables(aclgenerator.ACLGenerator):
   """Generates filters and terms from provided policy object."""
 
   _PLATFORM = 'iptables'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'all'
   SUFFIX = ''
   _RENDER_PREFIX = None
@@ -801,6 +803,15 @@ class Iptables(aclgenerator.ACLGenerator):
     self.iptables_policies[0] = tuple(pol)
 
   def __str__(self):
+    # Subclasses such as ipset extend __str__, and their IterLines with it.
+    return ''.join(Iptables.IterLines(self))
+
+  def IterLines(self):
+    """Yields the lines of the rules as they are rendered."""
+    return aclgenerator.IterJoinedLines(self._IterRules())
+
+  def _IterRules(self):
+    """Yields the lines of the rules, without line endings."""
     target = []
     pretty_platform = '%s%s' % (self._PLATFORM[0].upper(), self._PLATFORM[1:])
 
@@ -835,17 +846,19 @@ class Iptables(aclgenerator.ACLGenerator):
       else:
         # Custom chains have no concept of default policy.
         target.append(self._DEFAULTACTION_FORMAT_CUSTOM_CHAIN % filter_name)
+      yield from target
+      del target[:]
       # add the terms
       for term in terms:
-        term_str = str(term)
+        term_str = rendercache.RenderTerm(term)
         if term_str:
-          target.append(term_str)
+          yield term_str
 
     if self._RENDER_SUFFIX:
       target.append(self._RENDER_SUFFIX)
 
     target.append('')
-    return '\n'.join(target)
+    yield from target
 
 
 class Error(Exception):
@@ -19,6 +19,7 @@ import datetime
 from absl import logging
 from capirca.lib import aclgenerator
 from capirca.lib import nacaddr
+from capirca.lib import rendercache
 from capirca.lib import summarizer
 import six
 
@@ -83,10 +84,23 @@ class Config:
     self.lines = []
 
   def __str__(self):
+    self.CheckIndent()
+    return '\n'.join(self.lines)
+
+  def CheckIndent(self):
+    """Checks that the configuration is back to its initial indent.
+
+    Raises:
+      JuniperIndentationError: if it is not.
+    """
     if self.indent != self._initial_indent:
       raise JuniperIndentationError(
           'Expected indent %d but got %d' % (self._initial_indent, self.indent))
-    return '\n'.join(self.lines)
+
+  def Flush(self):
+    """Returns the lines appended since the last flush, and drops them."""
+    lines, self.lines = self.lines, []
+    return lines
 
   def Append(self, line, verbatim=False):
     """Append one line to the configuration.
@@ -904,6 +918,7 @@ class Juniper(aclgenerator.ACLGenerator):
   """
 
   _PLATFORM = 'juniper'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'ip'
   _SUPPORTED_AF = frozenset(('inet', 'inet6', 'bridge', 'mixed'))
   _TERM = Term
@@ -1066,7 +1081,12 @@ class Juniper(aclgenerator.ACLGenerator):
                                       interface_specific, filter_enhanced_mode, new_terms))
 
   def __str__(self):
+    return ''.join(self.IterLines())
+
+  def IterLines(self):
+    """Yields the configuration, one filter at a time."""
     config = Config()
+    flushed = False
 
     for (header, filter_name, filter_type, interface_specific, filter_enhanced_mode, terms
         ) in self.juniper_policies:
@@ -1095,12 +1115,17 @@ class Juniper(aclgenerator.ACLGenerator):
         config.Append('enhanced-mode;')
 
       for term in terms:
-        term_str = str(term)
+        term_str = rendercache.RenderTerm(term)
         if term_str:
           config.Append(term_str, verbatim=True)
 
       config.Append('}')  # filter { ... }
       config.Append('}')  # family inet { ... }
       config.Append('}')  # firewall { ... }
+      for line in config.Flush():
+        flushed = True
+        yield line + '\n'
 
-    return str(config) + '\n'
+    config.CheckIndent()
+    if not flushed:
+      yield '\n'
@@ -38,6 +38,7 @@ class Term(juniper.Term):
   _NEXT_HEADER_EXCEPT = 'next-header-except'
   _PAYLOAD_PROTOCOL = 'payload-protocol'
   _PAYLOAD_PROTOCOL_EXCEPT = 'payload-protocol-except'
+  _EXTENSION_HEADERS = ('hop-by-hop', 'fragment')
 
   def __str__(self, term_type_table=None):
     if not term_type_table:
@@ -58,7 +59,6 @@ class Term(juniper.Term):
       FilterDirectionError: If a direction is not provided for the filter
         e.g. ingress or egress
     """
-    self.extension_headers = ['hop-by-hop', 'fragment']
     # 'hopopt' is renamed to 'hop-by-hop' in juniper base class, add an
     # additional key with the same protocol number to aid renaming.
     self.PROTO_MAP['hop-by-hop'] = 0
@@ -79,12 +79,12 @@ class Term(juniper.Term):
       if self.filter_direction == self._INGRESS:
         if self.interface_type == 'physical':
           if not any(header in self.term.protocol
-                     for header in self.extension_headers):
+                     for header in self._EXTENSION_HEADERS):
             term_type_table[self._INET6][
                 self._PROTOCOL] = self._PAYLOAD_PROTOCOL
 
           if not any(header in self.term.protocol_except
-                     for header in self.extension_headers):
+                     for header in self._EXTENSION_HEADERS):
             term_type_table[self._INET6][
                 self._PROTOCOL_EXCEPT] = self._PAYLOAD_PROTOCOL_EXCEPT
 
@@ -94,10 +94,10 @@ class Term(juniper.Term):
               self._PROTOCOL_EXCEPT] = self._PAYLOAD_PROTOCOL_EXCEPT
 
           self.term.protocol = aclgenerator.ProtocolNameToNumber(
-              self.term.protocol, self.extension_headers, self.PROTO_MAP)
+              self.term.protocol, self._EXTENSION_HEADERS, self.PROTO_MAP)
 
           self.term.protocol_except = aclgenerator.ProtocolNameToNumber(
-              self.term.protocol_except, self.extension_headers, self.PROTO_MAP)
+              self.term.protocol_except, self._EXTENSION_HEADERS, self.PROTO_MAP)
 
       # Egress filter.
       if self.filter_direction == self._EGRESS:
@@ -106,10 +106,10 @@ class Term(juniper.Term):
             self._PROTOCOL_EXCEPT] = self._PAYLOAD_PROTOCOL_EXCEPT
 
         self.term.protocol = aclgenerator.ProtocolNameToNumber(
-            self.term.protocol, self.extension_headers, self.PROTO_MAP)
+            self.term.protocol, self._EXTENSION_HEADERS, self.PROTO_MAP)
 
         self.term.protocol_except = aclgenerator.ProtocolNameToNumber(
-            self.term.protocol_except, self.extension_headers, self.PROTO_MAP)
+            self.term.protocol_except, self._EXTENSION_HEADERS, self.PROTO_MAP)
 
       return term_type_table
 
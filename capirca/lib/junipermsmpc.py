@@ -320,6 +320,7 @@ class JuniperMSMPC(aclgenerator.ACLGenerator):
        pol: policy.Policy object
   """
   _PLATFORM = 'msmpc'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.msmpc'
   _SUPPORTED_AF = frozenset(('inet', 'inet6', 'mixed'))
   _AF_MAP = {'inet': 4, 'inet6': 6, 'mixed': None}
@@ -18,6 +18,7 @@
 
 
 import collections
+import collections.abc
 import copy
 import datetime
 import itertools
@@ -81,6 +82,106 @@ class IndentList(list):
     self.append('%s%s' % (self._indent * size, data))
 
 
+class _AddressSet:
+  """The addresses of an address-set, indexed by a prefix tree.
+
+  An address contained in an earlier one is dropped, and an address
+  containing an earlier one replaces it, whichever of the two comes first.
+  The nodes of the tree of an address family are numbered like a binary
+  heap: the root is 1 and the children of node n are 2n and 2n + 1.  An
+  insertion walks the path from the node of the address to the root.
+
+  Attributes:
+    addresses: the list of addresses, in insertion order.
+  """
+
+  def __init__(self):
+    self.addresses = []
+    # Per address family, the positions of the addresses of every node...
+    self._positions = {4: {}, 6: {}}
+    # ...and the first position of the addresses below every node.
+    self._first = {4: {}, 6: {}}
+    self._collapsed = None
+
+  def Add(self, address):
+    """Adds an address, unless an earlier address contains it."""
+    positions = self._positions[address.version]
+    first = self._first[address.version]
+    node = (1 << address.prefixlen) | (
+        int(address.network_address) >> (
+            address.max_prefixlen - address.prefixlen))
+    end = len(self.addresses)
+    containing = end
+    ancestor = node
+    while ancestor:
+      if ancestor in positions:
+        containing = min(containing, positions[ancestor][0])
+      ancestor >>= 1
+    contained = min(first.get(2 * node, end), first.get(2 * node + 1, end))
+    if containing < contained:
+      return
+    self._collapsed = None
+    if contained == end:
+      self.addresses.append(address)
+      positions.setdefault(node, []).append(end)
+      while node and node not in first:
+        first[node] = end
+        node >>= 1
+      return
+    # Replace every copy of the first contained address.
+    replaced = self.addresses[contained]
+    replaced_node = (1 << replaced.prefixlen) | (
+        int(replaced.network_address) >> (
+            replaced.max_prefixlen - replaced.prefixlen))
+    moved = positions.pop(replaced_node)
+    for position in moved:
+      self.addresses[position] = address
+    positions[node] = sorted(positions.get(node, []) + moved)
+    while replaced_node != node:
+      below = min(first.get(2 * replaced_node, end),
+                  first.get(2 * replaced_node + 1, end))
+      if replaced_node in positions:
+        below = min(below, positions[replaced_node][0])
+      if below == end:
+        first.pop(replaced_node, None)
+      else:
+        first[replaced_node] = below
+      replaced_node >>= 1
+
+  def Collapsed(self):
+    """Returns the sorted and collapsed addresses."""
+    if self._collapsed is None:
+      self._collapsed = nacaddr.CollapseAddrList(self.addresses)
+    return self._collapsed
+
+
+class AddressBook(collections.abc.Mapping):
+  """The address-sets of a zone, mapping their names to their addresses."""
+
+  def __init__(self):
+    self._sets = {}
+
+  def __getitem__(self, name):
+    return self._sets[name].addresses
+
+  def __iter__(self):
+    return iter(self._sets)
+
+  def __len__(self):
+    return len(self._sets)
+
+  def Add(self, address):
+    """Adds an address to the address-set named by its parent token."""
+    name = address.parent_token
+    if name not in self._sets:
+      self._sets[name] = _AddressSet()
+    self._sets[name].Add(address)
+
+  def Collapsed(self, name):
+    """Returns the sorted and collapsed addresses of an address-set."""
+    return self._sets[name].Collapsed()
+
+
 class Term(aclgenerator.Term):
   """Representation of an individual SRX term.
 
@@ -539,11 +640,12 @@ class JuniperSRX(aclgenerator.ACLGenerator):
           for zone in self.addressbook:
             for unused_name, ips in sorted(
                 self.addressbook[zone].items()):
-              ips = [i for i in ips]
-              if term.source_address == ips:
-                term.source_address = ips
-              if term.destination_address == ips:
-                term.destination_address = ips
+              if (len(term.source_address) == len(ips) and
+                  term.source_address == ips):
+                term.source_address = list(ips)
+              if (len(term.destination_address) == len(ips) and
+                  term.destination_address == ips):
+                term.destination_address = list(ips)
 
         # Filter source_address based on filter_type & add to address book
         if term.source_address:
@@ -691,17 +793,8 @@ class JuniperSRX(aclgenerator.ACLGenerator):
       address: a naming library address object
     """
     if zone not in self.addressbook:
-      self.addressbook[zone] = collections.defaultdict(list)
-    name = address.parent_token
-    for ip in self.addressbook[zone][name]:
-      if ip.supernet_of(address):
-        return
-      if address.supernet_of(ip):
-        for index, ip_addr in enumerate(self.addressbook[zone][name]):
-          if ip_addr == ip:
-            self.addressbook[zone][name][index] = address
-        return
-    self.addressbook[zone][name].append(address)
+      self.addressbook[zone] = AddressBook()
+    self.addressbook[zone].Add(address)
 
   def _SortAddressBookNumCheck(self, item):
     """Used to give a natural order to the list of acl entries.
@@ -757,8 +850,7 @@ class JuniperSRX(aclgenerator.ACLGenerator):
       names = sorted(global_address_book.keys())
       for name in names:
         counter = 0
-        ips = nacaddr.SortAddrList(global_address_book[name])
-        ips = nacaddr.CollapseAddrList(ips)
+        ips = nacaddr.CollapseAddrList(global_address_book[name])
         global_address_book[name] = ips
         for ip in ips:
           target.IndentAppend(4, 'address ' + name + '_' + str(counter) + ' ' +
@@ -785,11 +877,8 @@ class JuniperSRX(aclgenerator.ACLGenerator):
         # building individual addresses
         groups = sorted(self.addressbook[zone])
         for group in groups:
-          ips = nacaddr.SortAddrList(self.addressbook[zone][group])
-          ips = nacaddr.CollapseAddrList(ips)
-          self.addressbook[zone][group] = ips
           count = 0
-          for address in self.addressbook[zone][group]:
+          for address in self.addressbook[zone].Collapsed(group):
             target.IndentAppend(4, 'address ' + group + '_' + str(count) +
                                 ' ' + str(address) + ';')
             count += 1
@@ -798,7 +887,7 @@ class JuniperSRX(aclgenerator.ACLGenerator):
         for group in groups:
           target.IndentAppend(4, 'address-set ' + group + ' {')
           count = 0
-          for address in self.addressbook[zone][group]:
+          for unused_address in self.addressbook[zone].Collapsed(group):
             target.IndentAppend(5, 'address ' + group + '_' + str(count) + ';')
             count += 1
 
@@ -911,11 +1000,21 @@ class JuniperSRX(aclgenerator.ACLGenerator):
 
   def __str__(self):
     """Render the output of the JuniperSRX policy into config."""
+    return ''.join(self.IterLines())
+
+  def IterLines(self):
+    """Yields the lines of the config as they are rendered."""
+    return aclgenerator.IterJoinedLines(self._IterConfig())
+
+  def _IterConfig(self):
+    """Yields the lines of the config, without line endings."""
     target = IndentList(self.INDENT)
     target.append('security {')
 
     # ADDRESSBOOK
     target.extend(self._GenerateAddressBook())
+    yield from target
+    del target[:]
 
     # POLICIES
     target.IndentAppend(1, '/*')
@@ -949,15 +1048,16 @@ class JuniperSRX(aclgenerator.ACLGenerator):
             3,
             JunipersrxList('apply-groups-except', header.apply_groups_except)
         )
+      yield from target
+      del target[:]
       for term in terms:
         str_result = str(term)
         if str_result:
-          target.append(str_result)
+          yield str_result
       target.IndentAppend(2, '}')
     target.IndentAppend(1, '}')
     target.append('}')
 
     # APPLICATIONS
     target.extend(self._GenerateApplications())
-
-    return '\n'.join(target)
+    yield from target
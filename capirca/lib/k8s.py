@@ -204,22 +204,27 @@ class Term(aclgenerator.Term):
     base_port_selector = {}
     if self.term.direction == 'INGRESS':
       for source_address in self.term.source_address:
-        peer_selector = {'ipBlock': {'cidr': str(source_address)}}
+        peer_selector = {
+            'ipBlock': {'cidr': aclgenerator.AddressText(source_address)}}
         for exclude in self.term.source_address_exclude:
           if peer_selector['ipBlock'].get('except') is None:
             peer_selector['ipBlock']['except'] = []
 
-          peer_selector['ipBlock']['except'].append(str(exclude))
+          peer_selector['ipBlock']['except'].append(
+              aclgenerator.AddressText(exclude))
         peer_selectors.append(peer_selector)
       peer_selector_key = 'from'
     else:
       for destination_address in self.term.destination_address:
-        peer_selector = {'ipBlock': {'cidr': str(destination_address)}}
+        peer_selector = {
+            'ipBlock': {
+                'cidr': aclgenerator.AddressText(destination_address)}}
         for exclude in self.term.destination_address_exclude:
           if peer_selector['ipBlock'].get('except') is None:
             peer_selector['ipBlock']['except'] = []
 
-          peer_selector['ipBlock']['except'].append(str(exclude))
+          peer_selector['ipBlock']['except'].append(
+              aclgenerator.AddressText(exclude))
         peer_selectors.append(peer_selector)
       peer_selector_key = 'to'
 
@@ -262,6 +267,7 @@ class K8s(aclgenerator.ACLGenerator):
   _API_VERSION = 'networking.k8s.io/v1'
   _RESOURCE_KIND = 'NetworkPolicyList'
   _PLATFORM = 'k8s'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.yml'
   _SUPPORTED_AF = frozenset(('mixed'))
   _GOOD_DIRECTION = ['INGRESS', 'EGRESS']
@@ -15,13 +15,13 @@
 
 """A subclass of the ipaddress library that includes comments for ipaddress."""
 
+import bisect
 import collections
+import copy
 import ipaddress
 import itertools
 from typing import Union
 
-import capirca.utils.iputils as iputils
-
 
 def IP(ip, comment='', token='', strict=True):
   """Take an ip string and return an object of the correct type.
@@ -64,9 +64,38 @@ def _is_subnet_of(a, b):  # pylint: disable=invalid-name
         'Unable to test subnet containment between %s and %s' % (a, b))
 
 
+def _broadcast_address(self):  # pylint: disable=invalid-name
+  """Returns the last address of the network, cached in a slot.
+
+  ipaddress caches it with functools.cached_property, which would give every
+  network a dictionary of its own.
+
+  Args:
+    self: an IPv4 or IPv6 object.
+
+  Returns:
+    An ipaddress.IPv4Address or ipaddress.IPv6Address object.
+  """
+  try:
+    return self._broadcast_address
+  except AttributeError:
+    self._broadcast_address = self._address_class(
+        self.network_address._ip | self._ALL_ONES >> self._prefixlen)  # pylint: disable=protected-access
+    return self._broadcast_address
+
+
+def _hostmask(self):  # pylint: disable=invalid-name
+  return self._address_class(self._ALL_ONES >> self._prefixlen)  # pylint: disable=protected-access
+
+
 class IPv4(ipaddress.IPv4Network):
   """This subclass allows us to keep text comments related to each object."""
 
+  # ipaddress networks keep their attributes in an instance dictionary; slots
+  # keep these objects small, as large policies hold millions of them.
+  __slots__ = ('text', 'token', 'parent_token', 'network_address', 'netmask',
+               '_prefixlen', '_broadcast_address')
+
   def __init__(self, ip_string, comment='', token='', strict=True):
     self.text = comment
     self.token = token
@@ -141,11 +170,18 @@ class IPv4(ipaddress.IPv4Network):
   # Backwards compatibility name from v1.
   Supernet = supernet
   _is_subnet_of = _is_subnet_of
+  broadcast_address = property(_broadcast_address)
+  hostmask = property(_hostmask)
 
 
 class IPv6(ipaddress.IPv6Network):
   """This subclass allows us to keep text comments related to each object."""
 
+  # ipaddress networks keep their attributes in an instance dictionary; slots
+  # keep these objects small, as large policies hold millions of them.
+  __slots__ = ('text', 'token', 'parent_token', 'network_address', 'netmask',
+               '_prefixlen', '_broadcast_address')
+
   def __init__(self, ip_string, comment='', token='', strict=True):
     self.text = comment
     self.token = token
@@ -205,6 +241,8 @@ class IPv6(ipaddress.IPv6Network):
   # Backwards compatibility name from v1.
   Supernet = supernet
   _is_subnet_of = _is_subnet_of
+  broadcast_address = property(_broadcast_address)
+  hostmask = property(_hostmask)
 
   def AddComment(self, comment=''):
     """Append comment to self.text, comma separated.
@@ -224,20 +262,214 @@ class IPv6(ipaddress.IPv6Network):
 IPType = Union[IPv4, IPv6]
 
 
-def _InNetList(adders, ip):
-  """Returns True if ip is contained in adders."""
-  for addr in adders:
-    if ip.subnet_of(addr):
-      return True
-  return False
+# Addresses of both versions are placed on one integer line, IPv6 above IPv4.
+# The gap keeps the last IPv4 address and the first IPv6 address apart, so
+# intervals of different versions are never adjacent.
+_V6_OFFSET = 1 << 33
+
+
+def _Interval(addr):
+  """Returns the first and last position of addr on the address line."""
+  first = addr.network_address._ip  # pylint: disable=protected-access
+  if addr.version == 6:
+    first += _V6_OFFSET
+  return first, first + (1 << (addr.max_prefixlen - addr.prefixlen)) - 1
+
+
+def _SortKey(addr):
+  """Returns a key which sorts networks like comparing them would."""
+  return _Interval(addr)[0], addr.prefixlen
+
+
+def _Summarize(first, last):
+  """Yields the IPv4 or IPv6 objects covering the positions first to last.
+
+  Args:
+    first: first position on the address line.
+    last: last position on the address line, of the same version as first.
+
+  Yields:
+    The fewest new IPv4 or IPv6 objects covering the range, in order.
+  """
+  if first >= _V6_OFFSET:
+    addr_class, max_prefixlen, offset = IPv6, 128, _V6_OFFSET
+  else:
+    addr_class, max_prefixlen, offset = IPv4, 32, 0
+  first -= offset
+  last -= offset
+  while first <= last:
+    # The largest block aligned at first which does not go beyond last.
+    host_bits = (last - first + 1).bit_length() - 1
+    if first:
+      host_bits = min(host_bits, (first & -first).bit_length() - 1)
+    yield addr_class((first, max_prefixlen - host_bits))
+    first += 1 << host_bits
+
+
+def _IsUpperHalf(first, last):
+  """Returns True if first to last is the upper half of its supernet."""
+  size = last - first + 1
+  if first >= _V6_OFFSET:
+    first -= _V6_OFFSET
+  return bool(first & size)
+
+
+def _AddComment(text, comment):
+  """Returns text with comment appended like IPv4.AddComment would."""
+  if not text:
+    return comment
+  if comment and comment not in text:
+    return text + ', ' + comment
+  return text
+
+
+class AddressSet:
+  """A set of addresses held as sorted, disjoint integer intervals.
+
+  Unlike lists of IPv4 and IPv6 objects, which are compared one object at a
+  time, an AddressSet answers containment and computes differences with
+  binary searches over its intervals. Comments and tokens are not kept;
+  Addresses() and Subtract() build new objects only when they are needed.
+  """
+
+  def __init__(self, addresses=()):
+    self._firsts = []
+    self._lasts = []
+    for first, last in sorted(_Interval(addr) for addr in addresses):
+      if self._lasts and first <= self._lasts[-1] + 1:
+        self._lasts[-1] = max(self._lasts[-1], last)
+      else:
+        self._firsts.append(first)
+        self._lasts.append(last)
+
+  def __bool__(self):
+    return bool(self._firsts)
+
+  def __eq__(self, other):
+    if not isinstance(other, AddressSet):
+      return NotImplemented
+    return self._firsts == other._firsts and self._lasts == other._lasts
+
+  def __contains__(self, addr):
+    """Returns True if every address of addr is in the set."""
+    first, last = _Interval(addr)
+    i = bisect.bisect_right(self._firsts, first) - 1
+    return i >= 0 and self._lasts[i] >= last
+
+  def Overlaps(self, addr):
+    """Returns True if any address of addr is in the set."""
+    first, last = _Interval(addr)
+    i = bisect.bisect_right(self._firsts, last) - 1
+    return i >= 0 and self._lasts[i] >= first
+
+  def _Remaining(self, first, last):
+    """Returns the intervals of first to last which are not in the set."""
+    remaining = []
+    i = bisect.bisect_right(self._firsts, first) - 1
+    if i < 0 or self._lasts[i] < first:
+      i += 1
+    while first <= last:
+      if i == len(self._firsts) or self._firsts[i] > last:
+        remaining.append((first, last))
+        break
+      if self._firsts[i] > first:
+        remaining.append((first, self._firsts[i] - 1))
+      first = self._lasts[i] + 1
+      i += 1
+    return remaining
+
+  def Subtract(self, addr):
+    """Returns the addresses of addr which are not in the set.
+
+    Args:
+      addr: an IPv4 or IPv6 object.
+
+    Returns:
+      [addr] if addr does not overlap the set, otherwise a sorted list of new
+      IPv4 or IPv6 objects without comments.
+    """
+    first, last = _Interval(addr)
+    remaining = self._Remaining(first, last)
+    if remaining == [(first, last)]:
+      return [addr]
+    return [block for start, end in remaining
+            for block in _Summarize(start, end)]
+
+  def Addresses(self):
+    """Returns the fewest IPv4 and IPv6 objects covering the set, sorted."""
+    return [block for first, last in zip(self._firsts, self._lasts)
+            for block in _Summarize(first, last)]
+
+
+class _SupernetIndex:
+  """Answers whether an address is a subnet of any address of a list."""
+
+  def __init__(self, addresses):
+    intervals = sorted(_Interval(addr) for addr in addresses)
+    self._firsts = [first for first, _ in intervals]
+    # The largest last position of the intervals up to each one.
+    self._max_lasts = list(itertools.accumulate(
+        (last for _, last in intervals), max))
+
+  def Covers(self, addr):
+    first, last = _Interval(addr)
+    i = bisect.bisect_right(self._firsts, first) - 1
+    return i >= 0 and self._max_lasts[i] >= last
+
+  def CoversAll(self, addresses):
+    return all(self.Covers(addr) for addr in addresses)
 
 
 def IsSuperNet(supernets, subnets):
   """Returns True if subnets are fully consumed by supernets."""
-  for net in subnets:
-    if not _InNetList(supernets, net):
-      return False
-  return True
+  return _SupernetIndex(supernets).CoversAll(subnets)
+
+
+class _GroupIndex:
+  """Index of address groups by their addresses and their first address."""
+
+  def __init__(self):
+    # (version, prefixlen) -> network address integer -> group numbers.
+    self._networks = collections.defaultdict(
+        lambda: collections.defaultdict(set))
+    self._prefixlens = {4: [], 6: []}
+    # Sorted (first position, group number) of the first address of groups.
+    self._first_addresses = []
+
+  def Add(self, number, group):
+    for addr in group:
+      key = (addr.version, addr.prefixlen)
+      if key not in self._networks:
+        bisect.insort(self._prefixlens[addr.version], addr.prefixlen)
+      self._networks[key][addr.network_address._ip].add(number)  # pylint: disable=protected-access
+    bisect.insort(self._first_addresses, (_Interval(group[0])[0], number))
+
+  def Remove(self, number, group):
+    for addr in group:
+      self._networks[(addr.version, addr.prefixlen)][
+          addr.network_address._ip].discard(number)  # pylint: disable=protected-access
+    self._first_addresses.remove((_Interval(group[0])[0], number))
+
+  def Candidates(self, group):
+    """Returns the groups which may contain or be contained in group."""
+    candidates = set()
+    # A group containing this one holds a supernet of its first address.
+    addr = group[0]
+    network = addr.network_address._ip  # pylint: disable=protected-access
+    for prefixlen in self._prefixlens[addr.version]:
+      if prefixlen > addr.prefixlen:
+        break
+      host_bits = addr.max_prefixlen - prefixlen
+      candidates.update(self._networks[(addr.version, prefixlen)].get(
+          network >> host_bits << host_bits, ()))
+    # A group contained in this one has its first address in it.
+    for addr in group:
+      first, last = _Interval(addr)
+      start = bisect.bisect_left(self._first_addresses, (first,))
+      end = bisect.bisect_right(self._first_addresses, (last, float('inf')))
+      candidates.update(
+          number for _, number in self._first_addresses[start:end])
+    return candidates
 
 
 def CollapseAddrListPreserveTokens(addresses):
@@ -249,48 +481,36 @@ def CollapseAddrListPreserveTokens(addresses):
   Returns:
     list of ipaddress.IPNetwork objects.
   """
-  ret_array = []
+  groups = []
   for grp in itertools.groupby(sorted(addresses, key=lambda x: x.parent_token),
                                lambda x: x.parent_token):
-    ret_array.append(CollapseAddrList(list(grp[1])))
-  dedup_array = []
-  i = 0
-  while len(ret_array) > i:
-    ip = ret_array.pop(0)
-    k = 0
+    groups.append(CollapseAddrList(list(grp[1])))
+  supernet_indexes = [_SupernetIndex(group) for group in groups]
+
+  # Each group is compared, in order, with the groups kept so far: it is
+  # dropped if one of them contains it, and it drops the ones it contains.
+  # Only the kept groups found by the index can be in either relation.
+  kept = []
+  index = _GroupIndex()
+  for number, group in enumerate(groups):
     to_add = True
-    while k < len(dedup_array):
-      if IsSuperNet(dedup_array[k], ip):
+    skipped = None
+    for other in sorted(index.Candidates(group)):
+      # Dropping a group skips the comparison with the group following it.
+      if other == skipped:
+        continue
+      if supernet_indexes[other].CoversAll(group):
         to_add = False
         break
-      elif IsSuperNet(ip, dedup_array[k]):
-        del dedup_array[k]
-      k += 1
+      elif supernet_indexes[number].CoversAll(groups[other]):
+        position = bisect.bisect_left(kept, other)
+        del kept[position]
+        index.Remove(other, groups[other])
+        skipped = kept[position] if position < len(kept) else None
     if to_add:
-      dedup_array.append(ip)
-  return [i for sublist in dedup_array for i in sublist]
-
-
-def _SafeToMerge(address, merge_target, check_addresses):
-  """Determine if it's safe to merge address into merge target.
-
-  Checks given address against merge target and a list of check_addresses
-  if it's OK to roll address into merge target such that it not less specific
-  than any of the check_addresses. See description of why ir is important
-  within public function CollapseAddrList.
-
-  Args:
-    address: Address that is being merged.
-    merge_target: Merge candidate address.
-    check_addresses: A dict networks_address->addrs to compare specificity with.
-
-  Returns:
-    True if safe to merge, False otherwise.
-  """
-  for check_address in check_addresses.get(address.network_address, []):
-    if merge_target.netmask <= check_address.netmask < address.netmask:
-      return False
-  return True
+      kept.append(number)
+      index.Add(number, group)
+  return [i for number in kept for i in groups[number]]
 
 
 def _CollapseAddrListInternal(addresses, complements_by_network):
@@ -312,45 +532,65 @@ def _CollapseAddrListInternal(addresses, complements_by_network):
    CollapseAddrList([])
 
   Args:
-    addresses: List of IPv4 or IPv6 objects
-    complements_by_network: Dict of IPv4 or IPv6 objects indexed by
-      network_address, that if present will be considered to avoid harmful
-      optimizations.
+    addresses: List of sorted IPv4 or IPv6 objects
+    complements_by_network: Dict of the prefix lengths of the complement
+      addresses indexed by their first position on the address line, that if
+      present will be considered to avoid harmful optimizations.
 
   Returns:
     List of IPv4 or IPv6 objects (depending on what we were passed)
   """
+  # Netblocks are compared as [first, last, prefixlen, address, text, source,
+  # token] lists. address is the caller's object while the netblock is
+  # unchanged, source the caller's object once only its comment changed. The
+  # caller's addresses are never modified, as they can be shared with other
+  # terms and policies.
   ret_array = []
   for addr in addresses:
-    addr_is_fresh = True
-    while addr_is_fresh:
-      addr_is_fresh = False
+    first, last = _Interval(addr)
+    block = [first, last, addr.prefixlen, addr, addr.text, addr, addr.token]
+    while True:
       if not ret_array:
-        ret_array.append(addr)
-        continue
-
-      prev_addr = ret_array[-1]
-      if not _SafeToMerge(addr, prev_addr, complements_by_network):
-        ret_array.append(addr)
-      elif prev_addr.supernet_of(addr):
+        ret_array.append(block)
+        break
+      prev = ret_array[-1]
+      if any(prev[2] <= prefixlen < block[2]
+             for prefixlen in complements_by_network.get(first, ())):
+        # Not safe to merge, as the merged netblock would be less specific
+        # than a complement address.
+        ret_array.append(block)
+      elif prev[0] <= first and block[1] <= prev[1]:
         # Preserve addr's comment, then subsume it.
-        prev_addr.AddComment(addr.text)
-      elif (prev_addr.version == addr.version and
-            prev_addr.prefixlen == addr.prefixlen and
-            # It's faster to compare integers than IP objects
-            prev_addr.broadcast_address._ip + 1 == addr.network_address._ip and  # pylint disable=protected-access
-            # Generating Supernet is relatively intensive compared to doing bit
-            # operations
-            (prev_addr.netmask._ip << 1) & prev_addr.network_address._ip ==      # pylint disable=protected-access
-            prev_addr.network_address._ip):                                      # pylint disable=protected-access
-        # Preserve addr's comment, then merge with it.
-        prev_addr.AddComment(addr.text)
-        addr = ret_array.pop().Supernet()
-        addr_is_fresh = True
+        if block[4] and block[4] not in prev[4]:
+          prev[3] = None
+          prev[4] = _AddComment(prev[4], block[4])
+      elif (prev[2] == block[2] and prev[1] + 1 == first and
+            not _IsUpperHalf(prev[0], prev[1])):
+        # Merge with addr into their supernet, preserving addr's comment.
+        ret_array.pop()
+        block = [prev[0], block[1], prev[2] - 1, None,
+                 _AddComment(prev[4], block[4]), None, prev[6]]
+        first = prev[0]
+        continue
       else:
-        ret_array.append(addr)
-
-  return ret_array
+        ret_array.append(block)
+      break
+
+  collapsed = []
+  for first, last, _, addr, text, source, token in ret_array:
+    if addr is not None:
+      collapsed.append(addr)
+    elif source is not None:
+      # The caller's address with a new comment.
+      new_addr = copy.deepcopy(source)
+      new_addr.text = text
+      collapsed.append(new_addr)
+    else:
+      new_addr = next(_Summarize(first, last))
+      new_addr.text = text
+      new_addr.token = new_addr.parent_token = token
+      collapsed.append(new_addr)
+  return collapsed
 
 
 def CollapseAddrList(addresses, complement_addresses=None):
@@ -380,12 +620,11 @@ def CollapseAddrList(addresses, complement_addresses=None):
     list of ipaddress.IPNetwork objects
   """
   complements_dict = collections.defaultdict(list)
-  address_set = set([a.network_address for a in addresses])
   for ca in complement_addresses or []:
-    if ca.network_address in address_set:
-      complements_dict[ca.network_address].append(ca)
+    complements_dict[_Interval(ca)[0]].append(ca.prefixlen)
   return _CollapseAddrListInternal(
-      sorted(addresses, key=ipaddress.get_mixed_type_key), complements_dict)
+      sorted(addresses, key=_SortKey),
+      complements_dict)
 
 
 def SortAddrList(addresses):
@@ -403,16 +642,10 @@ def RemoveAddressFromList(superset, exclude):
   Returns:
     a List of nacaddr IPv4 or IPv6 addresses
   """
+  excluded = AddressSet([exclude])
   ret_array = []
   for addr in superset:
-    if exclude == addr or addr.subnet_of(exclude):
-      pass
-    elif exclude.version == addr.version and exclude.subnet_of(addr):
-      # this could be optimized except that one group uses this
-      # code with ipaddrs (instead of nacaddrs).
-      ret_array.extend(IP(x) for x in iputils.exclude_address(addr, exclude))
-    else:
-      ret_array.append(addr)
+    ret_array.extend(excluded.Subtract(addr))
   return SortAddrList(ret_array)
 
 
@@ -428,12 +661,14 @@ def AddressListExclude(superset, excludes, collapse_addrs=True):
     a List of nacaddr IPv4 or IPv6 addresses
   """
   if collapse_addrs:
-    superset = CollapseAddrList(superset)[::-1]
-    excludes = CollapseAddrList(excludes)[::-1]
-  else:
-    superset = sorted(superset, reverse=True)
-    excludes = sorted(excludes, reverse=True)
-
+    excluded = AddressSet(excludes)
+    ret_array = []
+    for addr in CollapseAddrList(superset):
+      ret_array.extend(excluded.Subtract(addr))
+    return CollapseAddrList(ret_array)
+
+  superset = sorted(superset, key=_SortKey, reverse=True)
+  excludes = sorted(excludes, key=_SortKey, reverse=True)
   ret_array = []
   while superset and excludes:
     if superset[-1].overlaps(excludes[-1]):
@@ -444,10 +679,7 @@ def AddressListExclude(superset, excludes, collapse_addrs=True):
       ret_array.append(superset.pop())
     else:
       excludes.pop()
-  if collapse_addrs:
-    return CollapseAddrList(ret_array + superset)
-  else:
-    return sorted(set(ret_array + superset))
+  return sorted(set(ret_array + superset), key=_SortKey)
 
 
 ExcludeAddrs = AddressListExclude
@@ -44,9 +44,12 @@ DNS = 53/tcp
 
 """
 
+import copy
 import glob
+import multiprocessing
 import os
 import re
+import sys
 
 from absl import logging
 
@@ -94,6 +97,11 @@ class NamingSyntaxError(Error):
   """A general syntax error for the definition."""
 
 
+# Definition directories of at least this many bytes are parsed with a
+# process per file, when Naming is given more than one process.
+_PARALLEL_PARSE_BYTES = 4 * 1024 * 1024
+
+
 class _ItemUnit:
   """This class is a container for an index key and a list of associated values.
 
@@ -110,6 +118,55 @@ class _ItemUnit:
     self.items = []
 
 
+class _ParentIndex:
+  """Reverse lookups from values to the tokens of one definition type.
+
+  Attributes:
+    parents: dict of a value, without comment, to the list of tokens having
+      that value, in definition order.
+    values: set of the values of all tokens, as they are written.
+    prefixes: dict of (version, prefix length) to a dict of network address
+      to the tokens containing that network.  Only used for networks.
+    prefix_lengths: dict of IP version to the sorted prefix lengths present in
+      prefixes.
+  """
+
+  def __init__(self, group, with_prefixes=False):
+    self.parents = {}
+    self.values = set()
+    self.prefixes = {}
+    self.prefix_lengths = {4: [], 6: []}
+    for token, unit in group.items():
+      seen = set()
+      for item in unit.items:
+        self.values.add(item)
+        value = item.split('#')[0].strip()
+        if value not in seen:
+          seen.add(value)
+          self.parents.setdefault(value, []).append(token)
+        if with_prefixes and value[:1].isdigit():
+          try:
+            net = nacaddr.IP(value, strict=False)
+          except ValueError:
+            continue
+          self.prefixes.setdefault((net.version, net.prefixlen), {}).setdefault(
+              int(net.network_address), []).append(token)
+    for version, prefixlen in sorted(self.prefixes):
+      self.prefix_lengths[version].append(prefixlen)
+
+  def SupernetTokens(self, addr):
+    """Returns the tokens having a network value which contains addr."""
+    tokens = []
+    network = int(addr.network_address)
+    for prefixlen in self.prefix_lengths[addr.version]:
+      if prefixlen > addr.prefixlen:
+        break
+      mask = addr.max_prefixlen - prefixlen
+      tokens.extend(self.prefixes[(addr.version, prefixlen)].get(
+          network >> mask << mask, []))
+    return tokens
+
+
 class Naming:
   """Object to hold naming objects from NETWORK and SERVICES definition files.
 
@@ -122,13 +179,26 @@ class Naming:
      port_re: Regular Expression matching valid port entries.
   """
 
-  def __init__(self, naming_dir=None, naming_file=None, naming_type=None):
-    """Set the default values for a new Naming object."""
+  def __init__(self, naming_dir=None, naming_file=None, naming_type=None,
+               processes=1):
+    """Set the default values for a new Naming object.
+
+    Args:
+      naming_dir: directory of the definition files to parse, if any.
+      naming_file: name of the only file of naming_dir to parse, if any.
+      naming_type: definition type of naming_file, services or networks.
+      processes: the number of processes parsing the files of a large
+        naming_dir.  The default parses them in this process, as forking
+        is unsafe in a process running threads.
+    """
     self.current_symbol = None
     self.services = {}
     self.networks = {}
     self.unseen_services = {}
     self.unseen_networks = {}
+    # Expanded tokens, dropped whenever a definition of the type is added.
+    self._expanded = {'services': {}, 'networks': {}}
+    self._parent_indexes = {}
     self.port_re = re.compile(r'(^\d+-\d+|^\d+)\/\w+$|^[\w\d-]+$',
                               re.IGNORECASE | re.DOTALL)
     self.token_re = re.compile(r'(^[-_A-Z0-9]+$)', re.IGNORECASE)
@@ -137,6 +207,8 @@ class Naming:
       with open(filename, 'r') as file_handle:
         self._ParseFile(file_handle, naming_type)
     elif naming_dir:
+      if processes > 1 and self._ParseInParallel(naming_dir, processes):
+        return
       self._Parse(naming_dir, 'services')
       self._CheckUnseen('services')
 
@@ -164,8 +236,7 @@ class Naming:
     Returns:
       A sorted list of unique parent tokens.
     """
-    base_parents = []
-    recursive_parents = []
+    index = self._GetParentIndex('networks')
     # convert string to nacaddr, if arg is ipaddr then convert str() to nacaddr
     if (not isinstance(query, nacaddr.IPv4) and
        not isinstance(query, nacaddr.IPv6)):
@@ -173,42 +244,22 @@ class Naming:
         query = nacaddr.IP(query)
     # Get parent token for an IP
     if isinstance(query, nacaddr.IPv4) or isinstance(query, nacaddr.IPv6):
-      for token in self.networks:
-        for item in self.networks[token].items:
-          item = item.split('#')[0].strip()
-          if not item[:1].isdigit():
-            continue
-          try:
-            supernet = nacaddr.IP(item, strict=False)
-            if supernet.supernet_of(query):
-              base_parents.append(token)
-          except ValueError:
-            # item was not an IP
-            pass
+      base_parents = index.SupernetTokens(query)
     # Get parent token for another token
+    elif query[:1].isalpha():
+      base_parents = index.parents.get(query, [])
     else:
-      for token in self.networks:
-        for item in self.networks[token].items:
-          item = item.split('#')[0].strip()
-          if item[:1].isalpha() and item == query:
-            base_parents.append(token)
-    # look for nested tokens
-    for bp in base_parents:
-      done = False
-      for token in self.networks:
-        if bp in [item.split('#')[0].strip() for item in
-                  self.networks[token].items]:
-          # ignore IPs, only look at token values
-          if bp[:1].isalpha():
-            if bp not in recursive_parents:
-              recursive_parents.append(bp)
-              recursive_parents.extend(self.GetIpParents(bp))
-            done = True
-      # if no nested tokens, just append value
-      if not done:
-        if bp[:1].isalpha() and bp not in recursive_parents:
-          recursive_parents.append(bp)
-    return sorted(list(set(recursive_parents)))
+      base_parents = []
+    # look for nested tokens, only following tokens which start with a letter
+    parents = set()
+    pending = [bp for bp in base_parents if bp[:1].isalpha()]
+    while pending:
+      token = pending.pop()
+      if token not in parents:
+        parents.add(token)
+        pending.extend(p for p in index.parents.get(token, [])
+                       if p[:1].isalpha())
+    return sorted(parents)
 
   def GetServiceParents(self, query):
     """Given a query token, return list of services definitions with that token.
@@ -218,7 +269,7 @@ class Naming:
     Returns:
       List of service definitions containing the token.
     """
-    return self._GetParents(query, self.services)
+    return self._GetParents(query, 'services')
 
   def GetNetParents(self, query):
     """Given a query token, return list of network definitions with that token.
@@ -228,33 +279,32 @@ class Naming:
     Returns:
       A list of network definitions containing the token.
     """
-    return self._GetParents(query, self.networks)
+    return self._GetParents(query, 'networks')
 
-  def _GetParents(self, query, query_group):
-    """Given a naming item dict, return any tokens containing the value.
+  def _GetParentIndex(self, def_type):
+    """Returns the reverse index of a definition type, building it if needed."""
+    if def_type not in self._parent_indexes:
+      self._parent_indexes[def_type] = _ParentIndex(
+          getattr(self, def_type), with_prefixes=def_type == 'networks')
+    return self._parent_indexes[def_type]
+
+  def _GetParents(self, query, def_type):
+    """Given a definition type, return any tokens containing the value.
 
     Args:
       query: a service or token name, such as 53/tcp or DNS
-      query_group: either services or networks dict
+      def_type: either 'services' or 'networks'
 
     Returns:
       Returns a list of definitions containing the token in desired group.
     """
-    base_parents = []
+    index = self._GetParentIndex(def_type)
     recursive_parents = []
-    # collect list of tokens containing query
-    for token in query_group:
-      if query in [item.split('#')[0].strip() for item in
-                   query_group[token].items]:
-        base_parents.append(token)
-    if not base_parents:
-      return []
     # iterate through tokens containing query, doing recursion if necessary
-    for bp in base_parents:
-      for token in query_group:
-        if bp in query_group[token].items and bp not in recursive_parents:
-          recursive_parents.append(bp)
-          recursive_parents.extend(self._GetParents(bp, query_group))
+    for bp in index.parents.get(query, []):
+      if bp in index.values and bp not in recursive_parents:
+        recursive_parents.append(bp)
+        recursive_parents.extend(self._GetParents(bp, def_type))
       if bp not in recursive_parents:
         recursive_parents.append(bp)
     return recursive_parents
@@ -326,12 +376,17 @@ class Naming:
     Raises:
       UndefinedServiceError: If the service name isn't defined.
     """
-    expandset = set()
-    already_done = set()
-    data = []
-    service_name = ''
     data = query.split('#')     # Get the token keyword and remove any comment
     service_name = data[0].split()[0]  # strip and cast from list to string
+    expanded = self._expanded['services']
+    if service_name not in expanded:
+      expanded[service_name] = self._ExpandService(service_name, query)
+    return list(expanded[service_name])
+
+  def _ExpandService(self, service_name, query):
+    """Expands a service token into a sorted list of port/protocol values."""
+    expandset = set()
+    already_done = set()
     if service_name not in self.services:
       raise UndefinedServiceError('\nNo such service: %s' % query)
 
@@ -466,11 +521,17 @@ class Naming:
     Raises:
       UndefinedAddressError: for an undefined token value
     """
-    returnlist = []
-    data = []
-    token = ''
     data = query.split('#')     # Get the token keyword and remove any comment
     token = data[0].split()[0]  # Remove whitespace and cast from list to string
+    expanded = self._expanded['networks']
+    if token not in expanded:
+      expanded[token] = self._ExpandNet(token)
+    # Callers modify the returned objects, so they never get the cached ones.
+    return copy.deepcopy(expanded[token])
+
+  def _ExpandNet(self, token):
+    """Expands a network token into a list of new nacaddr objects."""
+    returnlist = []
     if token not in self.networks:
       raise UndefinedAddressError('%s %s' % ('\nUNDEFINED:', str(token)))
 
@@ -488,7 +549,8 @@ class Naming:
         try:
           # TODO(robankeny): Fix using error to continue processing.
           addr = nacaddr.IP(net, strict=False)
-          addr.text = comment.lstrip()
+          # Identical comments of different tokens share one string.
+          addr.text = sys.intern(comment.lstrip())
           addr.token = token
           returnlist.append(addr)
         except ValueError:
@@ -513,25 +575,79 @@ class Naming:
     Raises:
       NoDefinitionsError: if no definitions are found.
     """
-    file_names = []
-    get_files = {'services': lambda: glob.glob(defdirectory + '/*.svc'),
-                 'networks': lambda: glob.glob(defdirectory + '/*.net')}
-
-    if def_type in get_files:
-      file_names = get_files[def_type]()
-    else:
-      raise NoDefinitionsError('Definitions type %s is unknown.' % def_type)
-    if not file_names:
-      raise NoDefinitionsError('No definition files for %s in %s found.' %
-                               (def_type, defdirectory))
-
-    for current_file in file_names:
+    for current_file in DefinitionFiles(defdirectory, def_type):
       try:
         with open(current_file, 'r') as file_handle:
           self._ParseFile(file_handle, def_type)
       except IOError as error_info:
         raise NoDefinitionsError('%s' % error_info)
 
+  def _ParseInParallel(self, defdirectory, processes):
+    """Parses the files of a large definitions directory in a process each.
+
+    The definitions, and the errors raised, are the same as those of parsing
+    the files one after the other.
+
+    Args:
+      defdirectory: Path to directory containing definition files.
+      processes: the maximum number of processes parsing the files.
+
+    Returns:
+      True if the directory was parsed.  False, without parsing anything, if
+      it is small, lacks files of a type or this runs in a child process,
+      such as a pool worker, which can not start processes of its own.
+    """
+    # Python before 3.8 has no parent_process().
+    parent_process = getattr(multiprocessing, 'parent_process', lambda: None)
+    if (multiprocessing.current_process().daemon or
+        parent_process() is not None):
+      return False
+    files = []
+    try:
+      for def_type in ('services', 'networks'):
+        files.extend((file_name, def_type) for file_name in
+                     DefinitionFiles(defdirectory, def_type))
+      size = sum(os.path.getsize(file_name) for file_name, _ in files)
+    except (NoDefinitionsError, OSError):
+      # Left for the sequential parse to report.
+      return False
+    processes = min(len(files), processes)
+    if size < _PARALLEL_PARSE_BYTES or processes < 2:
+      return False
+    # Values at the top of a file continue the last token of the file before,
+    # so every file but the first is parsed as a continuation.
+    args = [(file_name, def_type, i > 0)
+            for i, (file_name, def_type) in enumerate(files)]
+    with multiprocessing.get_context().Pool(processes=processes) as pool:
+      results = pool.map(_ParseDefinitionFile, args)
+
+    unit = None
+    for def_type in ('services', 'networks'):
+      group = getattr(self, def_type)
+      unseen = getattr(self, 'unseen_' + def_type)
+      for (_, file_type), result in zip(files, results):
+        if file_type != def_type:
+          continue
+        continued, units, referenced, error = result
+        if unit is not None:
+          unit.items.extend(continued)
+        for unit in units:
+          if unit.name in group:
+            raise NamespaceCollisionError('%s %s' % (
+                '\nMultiple definitions found for service: ', unit.name))
+          group[unit.name] = unit
+          unseen.pop(unit.name, None)
+        for token in referenced:
+          if token not in group:
+            unseen[token] = True
+        if error is not None:
+          raise error
+      self._CheckUnseen(def_type)
+    if unit is not None:
+      self.current_symbol = unit.name
+      self.unit = unit
+    return True
+
   def _ParseFile(self, file_handle, def_type):
     for line in file_handle:
       self._ParseLine(line, def_type)
@@ -584,6 +700,8 @@ class Naming:
     line = line.strip()
     if not line or line.startswith('#'):  # Skip comments and blanks.
       return
+    self._expanded[definition_type].clear()
+    self._parent_indexes.pop(definition_type, None)
     comment = ''
     if line.find('#') > -1:  # if there is a comment, save it
       (line, comment) = line.split('#', 1)
@@ -650,3 +768,59 @@ class Naming:
             if value_piece not in self.networks:
               if value_piece not in self.unseen_networks:
                 self.unseen_networks[value_piece] = True
+
+
+def DefinitionFiles(defdirectory, def_type):
+  """Returns the definition files of a type in a directory.
+
+  Args:
+    defdirectory: Path to directory containing definition files.
+    def_type: 'services' or 'networks'.
+
+  Raises:
+    NoDefinitionsError: if no definitions are found.
+  """
+  file_names = []
+  get_files = {'services': lambda: glob.glob(defdirectory + '/*.svc'),
+               'networks': lambda: glob.glob(defdirectory + '/*.net')}
+
+  if def_type in get_files:
+    file_names = get_files[def_type]()
+  else:
+    raise NoDefinitionsError('Definitions type %s is unknown.' % def_type)
+  if not file_names:
+    raise NoDefinitionsError('No definition files for %s in %s found.' %
+                             (def_type, defdirectory))
+  return file_names
+
+
+def _ParseDefinitionFile(args):
+  """Parses one definition file for Naming._ParseInParallel.
+
+  Args:
+    args: tuple of the file name, its definition type and whether values at
+      the top of the file continue the token of an earlier file.
+
+  Returns:
+    A tuple of the values continuing the token of an earlier file, the
+    _ItemUnit of every token defined until the end of the file or its first
+    error, in order, the tokens referenced before they were defined in the
+    file, and the error raised parsing the file, if any.
+  """
+  file_name, def_type, continues = args
+  defs = Naming()
+  # A name no definition can have, so values before the first token are kept.
+  continued = _ItemUnit('\0')
+  if continues:
+    defs.current_symbol = continued.name
+    defs.unit = continued
+  error = None
+  try:
+    with open(file_name, 'r') as file_handle:
+      defs._ParseFile(file_handle, def_type)  # pylint: disable=protected-access
+  except IOError as error_info:
+    error = NoDefinitionsError('%s' % error_info)
+  except Error as e:
+    error = e
+  return (continued.items, list(getattr(defs, def_type).values()),
+          list(getattr(defs, 'unseen_' + def_type)), error)
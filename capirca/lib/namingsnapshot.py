@@ -0,0 +1,454 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compiled, read-only snapshot of naming definitions.
+
+A snapshot holds every network and service token of a naming.Naming object
+already expanded, so that rendering processes neither receive the definitions
+by pickle nor expand the same tokens again.  The snapshot is written to a file
+which every process maps read-only; pickling a NamingSnapshot only transfers
+the path of that file.
+
+A snapshot also serves as a cache of a definitions directory: LoadNaming()
+records the size, modification time and digest of every definition file in
+it, and loads the definitions from it instead of parsing the directory again
+while none of the files changed.
+
+File layout, all integers little-endian:
+    magic         8 bytes, _MAGIC
+    index length  uint64
+    index         UTF-8 JSON object, see Compile()
+    records       _RECORD structs, one per expanded network address
+
+Sample usage:
+    snapshot = namingsnapshot.Compile(defs, '/tmp/naming.snapshot')
+    addresses = snapshot.GetNetAddr('INTERNAL')
+
+    defs, snapshot = namingsnapshot.LoadNaming('./def', '/tmp/naming.cache')
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+
+from absl import logging
+
+from capirca.lib import nacaddr
+from capirca.lib import naming
+
+_MAGIC = b'CAPNSNP1'
+_HEADER = struct.Struct('<8sQ')
+# version, prefix length, index of the comment, index of the token and the
+# network address as a 128 bit big-endian integer.
+_RECORD = struct.Struct('<BBxxII16s')
+
+# Snapshots already mapped by this process, keyed by path.
+_LOADED = {}
+_PARSER_VERSION = None
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class SnapshotFormatError(Error):
+  """Raised when a snapshot file can not be read."""
+
+
+class _Definition:
+  """Unexpanded values of a token, like naming._ItemUnit."""
+
+  def __init__(self, name, items):
+    self.name = name
+    self.items = items
+
+
+def _ParserVersion():
+  """Returns a fingerprint of the code parsing and expanding definitions."""
+  global _PARSER_VERSION
+  if _PARSER_VERSION is None:
+    digest = hashlib.sha256()
+    for module in (naming, nacaddr):
+      digest.update(pathlib.Path(module.__file__).read_bytes())
+    digest.update(pathlib.Path(__file__).read_bytes())
+    _PARSER_VERSION = digest.hexdigest()
+  return _PARSER_VERSION
+
+
+def _Token(query):
+  """Strips comments and whitespace from a token query like naming does."""
+  return query.split('#')[0].split()[0]
+
+
+def Compile(definitions, path, sources=None):
+  """Expands every token of definitions and writes the snapshot to path.
+
+  Tokens which fail to expand are stored together with their error, which
+  is raised again when the token is looked up in the snapshot.  The file is
+  replaced atomically, so processes which mapped an earlier snapshot at path
+  keep reading it.
+
+  Args:
+    definitions: naming.Naming object.
+    path: file name of the snapshot to write.
+    sources: list of the [file name, size, modification time in ns, sha256]
+      of the definition files definitions were parsed from, when it is a
+      cache written by LoadNaming.
+
+  Returns:
+    A NamingSnapshot object backed by path.
+  """
+  strings = {}
+  records = bytearray()
+
+  def _StringIndex(text):
+    return strings.setdefault(text, len(strings))
+
+  index = {
+      'networks': {},
+      'services': {},
+      'errors': {'networks': {}, 'services': {}},
+      'definitions': {'networks': {}, 'services': {}},
+  }
+  for token in definitions.networks:
+    index['definitions']['networks'][token] = list(
+        definitions.networks[token].items)
+    try:
+      addresses = definitions.GetNet(token)
+    except (naming.Error, RecursionError) as e:
+      index['errors']['networks'][token] = [type(e).__name__, str(e)]
+      continue
+    index['networks'][token] = [len(records) // _RECORD.size, len(addresses)]
+    for addr in addresses:
+      records += _RECORD.pack(
+          addr.version, addr.prefixlen, _StringIndex(addr.text),
+          _StringIndex(addr.token),
+          int(addr.network_address).to_bytes(16, 'big'))
+  for token in definitions.services:
+    index['definitions']['services'][token] = list(
+        definitions.services[token].items)
+    try:
+      index['services'][token] = definitions.GetService(token)
+    except (naming.Error, RecursionError) as e:
+      index['errors']['services'][token] = [type(e).__name__, str(e)]
+  index['strings'] = sorted(strings, key=strings.get)
+  if sources is not None:
+    index['parser'] = _ParserVersion()
+    index['sources'] = sources
+
+  encoded_index = json.dumps(index).encode()
+  temp_path = '%s.%d.tmp' % (path, os.getpid())
+  try:
+    with open(temp_path, 'wb') as f:
+      f.write(_HEADER.pack(_MAGIC, len(encoded_index)))
+      f.write(encoded_index)
+      f.write(records)
+    os.replace(temp_path, path)
+  except BaseException:
+    if os.path.exists(temp_path):
+      os.unlink(temp_path)
+    raise
+  _LOADED.pop(str(path), None)
+  return NamingSnapshot(path)
+
+
+def _Sources(naming_dir):
+  """Returns the [file name, size, modification time] of definition files."""
+  sources = []
+  for def_type in ('services', 'networks'):
+    for file_name in naming.DefinitionFiles(naming_dir, def_type):
+      stat = os.stat(file_name)
+      sources.append([file_name, stat.st_size, stat.st_mtime_ns])
+  return sources
+
+
+def _FileDigest(file_name):
+  with open(file_name, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+def _IsCurrent(snapshot, sources):
+  """Returns whether a snapshot caches definition files as they are now.
+
+  Files whose size or modification time changed are compared by digest.
+
+  Args:
+    snapshot: NamingSnapshot object.
+    sources: the result of _Sources for the definitions directory.
+  """
+  index = snapshot._index  # pylint: disable=protected-access
+  if index.get('parser') != _ParserVersion():
+    return False
+  cached = {source[0]: source[1:] for source in index.get('sources', [])}
+  if sorted(cached) != sorted(file_name for file_name, _, _ in sources):
+    return False
+  for file_name, size, mtime_ns in sources:
+    cached_size, cached_mtime_ns, digest = cached[file_name]
+    if (size, mtime_ns) != (cached_size, cached_mtime_ns) and (
+        size != cached_size or _FileDigest(file_name) != digest):
+      return False
+  return True
+
+
+def _Naming(snapshot):
+  """Returns a naming.Naming object of the definitions in a snapshot."""
+  definitions = naming.Naming()
+  for def_type, tokens in snapshot._index['definitions'].items():  # pylint: disable=protected-access
+    group = getattr(definitions, def_type)
+    for token, items in tokens.items():
+      unit = naming._ItemUnit(token)  # pylint: disable=protected-access
+      unit.items = list(items)
+      group[token] = unit
+  return definitions
+
+
+def LoadNaming(naming_dir, cache_file, processes=1):
+  """Loads a definitions directory, through a cache file.
+
+  The cache file is a snapshot of the definitions, and is used instead of
+  parsing the directory as long as it lists the same definition files with
+  the same content and was written by the same version of the parser.
+  Otherwise the directory is parsed and the cache file written again.
+
+  Args:
+    naming_dir: directory of the definition files.
+    cache_file: file name of the cache.
+    processes: the number of processes parsing a large directory, as for
+      naming.Naming.
+
+  Returns:
+    A tuple of the naming.Naming object of the definitions and a
+    NamingSnapshot of them backed by the cache file, or None when the cache
+    file could not be written.
+
+  Raises:
+    naming.Error: the definitions could not be parsed.
+  """
+  cache_file = str(cache_file)
+  try:
+    sources = _Sources(naming_dir)
+  except (naming.Error, OSError):
+    # Left for naming.Naming to report.
+    sources = None
+  if sources is not None and os.path.exists(cache_file):
+    _Reload(cache_file)
+    snapshot = NamingSnapshot(cache_file)
+    try:
+      if _IsCurrent(snapshot, sources):
+        return _Naming(snapshot), snapshot
+    except (Error, OSError, ValueError, TypeError) as e:
+      logging.warning('ignoring naming cache %s: %s', cache_file, e)
+
+  definitions = naming.Naming(naming_dir, processes=processes)
+  if sources is None:
+    return definitions, None
+  try:
+    for source in sources:
+      source.append(_FileDigest(source[0]))
+    snapshot = Compile(definitions, cache_file, sources=sources)
+  except OSError as e:
+    logging.warning('cannot write naming cache %s: %s', cache_file, e)
+    return definitions, None
+  return definitions, snapshot
+
+
+class NamingSnapshot:
+  """Read-only naming definitions backed by a snapshot file.
+
+  The lookups used while parsing policies behave like the ones of
+  naming.Naming, but return results which were expanded when the snapshot
+  was compiled.
+
+  Attributes:
+    path: file name of the snapshot.
+  """
+
+  def __init__(self, path):
+    self.path = str(path)
+    self._definitions = None
+
+  @property
+  def _index(self):
+    # The file is only mapped once it is used, by the process using it.
+    return _Load(self.path)[0]
+
+  @property
+  def _records(self):
+    return _Load(self.path)[1]
+
+  def __getstate__(self):
+    # Only the path is sent to other processes, which map the file again.
+    return {'path': self.path}
+
+  def __setstate__(self, state):
+    self.__init__(state['path'])
+
+  @property
+  def networks(self):
+    return self._Definitions()['networks']
+
+  @property
+  def services(self):
+    return self._Definitions()['services']
+
+  def _Definitions(self):
+    if self._definitions is None:
+      self._definitions = {
+          def_type: {token: _Definition(token, items)
+                     for token, items in definitions.items()}
+          for def_type, definitions in self._index['definitions'].items()
+      }
+    return self._definitions
+
+  def _RaiseError(self, def_type, token):
+    error_name, message = self._index['errors'][def_type][token]
+    raise getattr(naming, error_name, naming.Error)(message)
+
+  def GetServiceNames(self):
+    """Returns the list of all known service names."""
+    return list(self._index['definitions']['services'])
+
+  def GetService(self, query):
+    """Given a service name, return a list of associated ports and protocols.
+
+    Args:
+      query: Service name symbol or token.
+
+    Returns:
+      A list of service values such as ['80/tcp', '443/tcp', '161/udp', ...]
+
+    Raises:
+      UndefinedServiceError: If the service name isn't defined.
+    """
+    service_name = _Token(query)
+    if service_name in self._index['services']:
+      return list(self._index['services'][service_name])
+    if service_name in self._index['errors']['services']:
+      self._RaiseError('services', service_name)
+    raise naming.UndefinedServiceError('\nNo such service: %s' % query)
+
+  def GetServiceByProto(self, query, proto):
+    """Given a service name, return list of ports in the service by protocol.
+
+    Args:
+      query: Service name to lookup.
+      proto: A particular protocol to restrict results by, such as 'tcp'.
+
+    Returns:
+      A list of service values of type 'proto', such as ['80', '443', ...]
+
+    Raises:
+      UndefinedServiceError: If the service name isn't defined.
+    """
+    service_name = _Token(query)
+    if service_name not in self._index['definitions']['services']:
+      raise naming.UndefinedServiceError(
+          '%s %s' % ('\nNo such service,', service_name))
+    proto = proto.upper()
+    services_set = set()
+    for service in self.GetService(service_name):
+      if service and '/' in service:
+        parts = service.split('/')
+        if parts[1].upper() == proto:
+          services_set.add(parts[0])
+    return sorted(services_set)
+
+  def GetNetAddr(self, token):
+    """Given a network token, return a list of nacaddr objects.
+
+    Args:
+      token: A name of a network definition, such as 'INTERNAL'
+
+    Returns:
+      A list of nacaddr.IPv4 or nacaddr.IPv6 objects.
+
+    Raises:
+      UndefinedAddressError: if the network name isn't defined.
+    """
+    return self.GetNet(token)
+
+  def GetNet(self, query):
+    """Returns new nacaddr objects for the addresses of a network token.
+
+    Args:
+      query: Network definition token which may include comment text
+
+    Returns:
+      List of nacaddr.IPv4 or nacaddr.IPv6 objects
+
+    Raises:
+      UndefinedAddressError: for an undefined token value
+    """
+    token = _Token(query)
+    if token not in self._index['networks']:
+      if token in self._index['errors']['networks']:
+        self._RaiseError('networks', token)
+      raise naming.UndefinedAddressError('%s %s' % ('\nUNDEFINED:', token))
+    first, count = self._index['networks'][token]
+    strings = self._index['strings']
+    records = self._records
+    addresses = []
+    for offset in range(first, first + count):
+      version, prefixlen, text, addr_token, address = _RECORD.unpack_from(
+          records, offset * _RECORD.size)
+      address = int.from_bytes(address, 'big')
+      addr_class = nacaddr.IPv4 if version == 4 else nacaddr.IPv6
+      addr = addr_class((address, prefixlen), strings[text],
+                        strings[addr_token])
+      addr.parent_token = token
+      addresses.append(addr)
+    return addresses
+
+
+def _Load(path):
+  """Maps a snapshot file, once per process.
+
+  Args:
+    path: file name of the snapshot.
+
+  Returns:
+    A tuple of the decoded index and a memoryview of the address records.
+
+  Raises:
+    SnapshotFormatError: if the file is not a naming snapshot.
+  """
+  if path not in _LOADED:
+    with open(path, 'rb') as f:
+      try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      except ValueError:
+        raise SnapshotFormatError('%s is not a naming snapshot' % path)
+      stat = os.fstat(f.fileno())
+    if len(data) < _HEADER.size:
+      raise SnapshotFormatError('%s is not a naming snapshot' % path)
+    magic, index_length = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+      raise SnapshotFormatError('%s is not a naming snapshot' % path)
+    index_end = _HEADER.size + index_length
+    index = json.loads(bytes(data[_HEADER.size:index_end]))
+    _LOADED[path] = (index, memoryview(data)[index_end:],
+                     (stat.st_ino, stat.st_mtime_ns))
+  return _LOADED[path]
+
+
+def _Reload(path):
+  """Forgets the mapping of a snapshot file replaced since it was mapped."""
+  if path in _LOADED:
+    stat = os.stat(path)
+    if _LOADED[path][2] != (stat.st_ino, stat.st_mtime_ns):
+      del _LOADED[path]
@@ -21,6 +21,7 @@ import logging
 
 from capirca.lib import aclgenerator
 from capirca.lib import nacaddr
+from capirca.lib import rendercache
 
 # NFTables and capirca have conflicting definitions of 'address family'
 # In capirca:
@@ -609,6 +610,7 @@ class Nftables(aclgenerator.ACLGenerator):
   """A NFtables policy object."""
 
   _PLATFORM = 'nftables'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.nft'
   _HEADER_AF = frozenset(('inet', 'inet6', 'mixed'))
   _SUPPORTED_HOOKS = frozenset(('forward', 'input', 'output'))
@@ -774,7 +776,8 @@ class Nftables(aclgenerator.ACLGenerator):
         # Instantiate object to call function from Term()
         term_object = Term(term, nf_af, nf_hook, verbose)
         child_chains[base_chain_name].update(
-            {term.name: term_object.RulesetGenerator(term)})
+            {term.name: rendercache.RenderTerm(
+                term_object, 'RulesetGenerator', term)})
       pol_counter += 1
       self.nftables_policies.append(
           (header, base_chain_name, nf_af, nf_hook, nf_priority,
@@ -943,6 +946,14 @@ class Nftables(aclgenerator.ACLGenerator):
 
   def __str__(self):
     """Render the policy as Nftables configuration."""
+    return ''.join(self.IterLines())
+
+  def IterLines(self):
+    """Yields the lines of the configuration, one table at a time."""
+    return aclgenerator.IterJoinedLines(self._IterConfiguration())
+
+  def _IterConfiguration(self):
+    """Yields the lines of the configuration, without line endings."""
     nft_config = []
     configuration = self._ConfigurationDictionary(self.nftables_policies)
     for table_name in configuration:
@@ -988,7 +999,9 @@ class Nftables(aclgenerator.ACLGenerator):
             nft_config.append(TabSpacer(8, 'jump %s' % child_chain))
           nft_config.append(TabSpacer(4, '}'))  # chain_end
         nft_config.append('}')  # table_end
+        yield from nft_config
+        del nft_config[:]
 
     # Terminating newline.
     nft_config.append('\n')
-    return '\n'.join(nft_config)
+    yield from nft_config
@@ -212,7 +212,7 @@ class Term(aclgenerator.Term):
               'Option are not implemented in standard ACLs')
 
     # check for keywords Nsxt does not support
-    term_keywords = self.term.__dict__
+    term_keywords = dict(self.term.AttributeItems())
     unsupported_keywords = []
     for key in term_keywords:
       if term_keywords[key]:
@@ -414,6 +414,7 @@ class Nsxt(aclgenerator.ACLGenerator):
   """
 
   _PLATFORM = 'nsxt'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'ip'
   SUFFIX = '.nsxt'
 
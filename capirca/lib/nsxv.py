@@ -159,7 +159,7 @@ class Term(aclgenerator.Term):
               'Option are not implemented in standard ACLs')
 
     # check for keywords Nsxv does not support
-    term_keywords = self.term.__dict__
+    term_keywords = dict(self.term.AttributeItems())
     unsupported_keywords = []
     for key  in term_keywords:
       if term_keywords[key]:
@@ -454,6 +454,7 @@ class Nsxv(aclgenerator.ACLGenerator):
   """
 
   _PLATFORM = 'nsxv'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'ip'
   SUFFIX = '.nsx'
 
@@ -26,7 +26,6 @@ import json
 import logging
 
 from capirca.lib import aclgenerator
-import six
 
 
 class Error(Exception):
@@ -130,12 +129,14 @@ class Term(aclgenerator.Term):
     # Source Addresses
     for saddr in saddrs:
       if saddr != 'any':
-        ace_dict[family]['config']['source-address'] = str(saddr)
+        ace_dict[family]['config']['source-address'] = (
+            aclgenerator.AddressText(saddr))
 
       # Destination Addresses
       for daddr in daddrs:
         if daddr != 'any':
-          ace_dict[family]['config']['destination-address'] = str(daddr)
+          ace_dict[family]['config']['destination-address'] = (
+              aclgenerator.AddressText(daddr))
 
         # Source Port
         for start, end in sports:
@@ -211,6 +212,7 @@ class OpenConfig(aclgenerator.ACLGenerator):
   """A OpenConfig firewall policy object."""
 
   _PLATFORM = 'openconfig'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.oacl'
   _SUPPORTED_AF = frozenset(('inet', 'inet6', 'mixed'))
   OC_AF_TYPE = {'inet': 'ACL_IPV4', 'inet6': 'ACL_IPV6'}
@@ -322,12 +324,7 @@ class OpenConfig(aclgenerator.ACLGenerator):
 
   def __str__(self):
     out = '%s\n\n' % (
-        json.dumps(
-            self.acl_data,
-            indent=2,
-            separators=(six.ensure_str(','), six.ensure_str(': ')),
-            sort_keys=True,
-        )
+        aclgenerator.DumpJson(self.acl_data, sort_keys=True)
     )
 
     return out
@@ -0,0 +1,196 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Manifest of the content of the files in an output directory.
+
+The manifest records, for every rendered file, a digest of its content
+without the lines holding version control keywords, as well as its size and
+modification time.  While a file still has the recorded size and modification
+time, whether a new render of it changed is decided by comparing digests,
+without reading the file back.
+
+The manifest is kept in the output directory, as MANIFEST_NAME.  Renderer
+processes only read it, and queue the files they had to read back and found
+unchanged; the process writing the files records them.
+
+Sample usage:
+    manifest = Manifest('./filters')
+    digest = Digest(text)
+    changed = manifest.Changed(output_file, digest)
+    if changed is None:
+      ... compare text with the file on disk ...
+    ... write the file if it changed ...
+    manifest.Record(output_file, digest)
+    manifest.Save()
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+from typing import Optional
+
+from absl import logging
+
+MANIFEST_NAME = '.capirca-manifest.json'
+# Bump whenever the layout of the manifest or the normalization changes.
+MANIFEST_FORMAT_VERSION = 1
+
+# Lines holding these keywords are rewritten by version control, and so are
+# ignored when outputs are compared.
+KEYWORDS = ('$I d:'.replace(' ', ''), '$Da te:'.replace(' ', ''),
+            '$Rev ision:'.replace(' ', ''))
+
+# Manifests read by this process, keyed by path, with the modification time
+# and size of the file they were read from.
+_LOADED = {}
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+def Digest(text):
+  """Returns the digest of a rendered output, without its keyword lines."""
+  return DigestLines(text.split('\n'))
+
+
+def DigestLines(lines):
+  """Returns the Digest of a rendered output, from its lines.
+
+  Args:
+    lines: the lines of the output, without line endings, as split by
+      str.split('\n').
+  """
+  digest = hashlib.sha256()
+  separator = b''
+  for line in lines:
+    if any(keyword in line for keyword in KEYWORDS):
+      continue
+    digest.update(separator + line.encode())
+    separator = b'\n'
+  return digest.hexdigest()
+
+
+def _Stat(path):
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return [stat.st_size, stat.st_mtime_ns]
+
+
+class Manifest:
+  """The digests of the files in an output directory.
+
+  Attributes:
+    directory: pathlib.Path of the output directory.
+    path: pathlib.Path of the manifest file.
+    verified: (output file, digest) tuples of the files read back and found
+      unchanged, which are yet to be recorded.
+  """
+
+  def __init__(self, directory):
+    self.directory = pathlib.Path(directory)
+    self.path = self.directory / MANIFEST_NAME
+    self.verified = []
+    self._files = None
+    self._changed = False
+
+  def __getstate__(self):
+    # Renderer processes read the manifest from disk, once per process.
+    return {'directory': self.directory}
+
+  def __setstate__(self, state):
+    self.__init__(state['directory'])
+
+  def _Key(self, output_file):
+    return os.path.relpath(output_file, self.directory)
+
+  def _Files(self):
+    if self._files is None:
+      # Shared with the other manifests of this process until recorded to.
+      self._files = _Read(str(self.path))
+    return self._files
+
+  def Changed(self, output_file, digest) -> Optional[bool]:
+    """Returns whether a new render of a file differs from the file on disk.
+
+    Args:
+      output_file: path of the file.
+      digest: the Digest of the new render.
+
+    Returns:
+      True or False, or None if the file has to be read to tell.
+    """
+    stat = _Stat(output_file)
+    if stat is None:
+      return True
+    entry = self._Files().get(self._Key(output_file))
+    if entry is None or entry[1:] != stat:
+      return None
+    return entry[0] != digest
+
+  def Record(self, output_file, digest):
+    """Records the digest of a file as it is on disk now."""
+    stat = _Stat(output_file)
+    if stat is None:
+      return
+    if not self._changed:
+      self._files = dict(self._Files())
+      self._changed = True
+    self._files[self._Key(output_file)] = [digest] + stat
+
+  def Save(self):
+    """Writes the manifest, if any file was recorded."""
+    if not self._changed:
+      return
+    temp_path = self.path.with_name('.%s.%d.tmp' % (self.path.name,
+                                                    os.getpid()))
+    try:
+      self.directory.mkdir(parents=True, exist_ok=True)
+      with open(temp_path, 'w') as f:
+        json.dump({'format': MANIFEST_FORMAT_VERSION, 'files': self._files},
+                  f, sort_keys=True)
+      os.replace(temp_path, self.path)
+    except OSError as e:
+      logging.warning('cannot write output manifest %s: %s', self.path, e)
+      try:
+        temp_path.unlink()
+      except FileNotFoundError:
+        pass
+      return
+    _LOADED.pop(str(self.path), None)
+    self._changed = False
+
+
+def _Read(path):
+  """Returns the file entries of a manifest, reading it once per process."""
+  stat = _Stat(path)
+  if stat is None:
+    return {}
+  cached = _LOADED.get(path)
+  if cached is not None and cached[0] == stat:
+    return cached[1]
+  try:
+    with open(path) as f:
+      stored = json.load(f)
+    files = stored['files'] if stored.get(
+        'format') == MANIFEST_FORMAT_VERSION else {}
+  except (OSError, ValueError, KeyError, AttributeError) as e:
+    logging.warning('ignoring output manifest %s: %s', path, e)
+    files = {}
+  _LOADED[path] = (stat, files)
+  return files
@@ -385,6 +385,7 @@ class PacketFilter(aclgenerator.ACLGenerator):
 
   _DEF_MAX_LENGTH = 31
   _PLATFORM = 'packetfilter'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'all'
   SUFFIX = '.pf'
   _TERM = Term
@@ -251,6 +251,7 @@ class PaloAltoFW(aclgenerator.ACLGenerator):
   """PaloAltoFW rendering class."""
 
   _PLATFORM = "paloalto"
+  MUTATES_ADDRESSES = False
   SUFFIX = ".xml"
   _SUPPORTED_AF = set(("inet", "inet6", "mixed"))
   _AF_MAP = {"inet": (4,), "inet6": (6,), "mixed": (4, 6)}
@@ -863,12 +864,10 @@ class PaloAltoFW(aclgenerator.ACLGenerator):
               continue
           address_book_names_dict[name] = address
 
-        # building individual address-group dictionary
-        for nested_group in groups:
-          group_names = []
-          for address, name in self.addressbook[zone][nested_group].items():
-            group_names.append(name)
-          address_book_groups_dict[nested_group] = group_names
+      # building individual address-group dictionary
+      for group in groups:
+        address_book_groups_dict[group] = list(
+            self.addressbook[zone][group].values())
 
       # sort address books and address sets
       address_book_groups_dict = collections.OrderedDict(
@@ -316,6 +316,7 @@ class PcapFilter(aclgenerator.ACLGenerator):
   """
 
   _PLATFORM = 'pcap'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'all'
   SUFFIX = '.pcap'
   _TERM = Term
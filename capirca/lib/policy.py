@@ -15,13 +15,17 @@
 
 """Parses the generic policy files and return a policy object for acl rendering."""
 
+import bisect
+import copy
 import datetime
 import os
 import sys
+import threading
 
 from absl import logging
 from capirca.lib import nacaddr
 from capirca.lib import naming
+from capirca.lib import renderprofile
 from ply import lex
 from ply import yacc
 
@@ -45,6 +49,15 @@ _FLEXIBLE_MATCH_START_OPTIONS = {'layer-3', 'layer-4', 'payload'}
 _LOGGING = set(('true', 'True', 'syslog', 'local', 'disable', 'log-both'))
 _OPTIMIZE = True
 _SHADE_CHECK = False
+# The PolicyParser running in the current thread, if any.
+_ACTIVE = threading.local()
+# Contents of include files by absolute path, along with the modification time
+# and size of the file they were read from, least recently used first. The
+# least recently used are evicted to keep the cache under _INCLUDE_CACHE_LIMIT
+# characters.
+_INCLUDE_CACHE = {}
+_INCLUDE_CACHE_LIMIT = 64 << 20
+_INCLUDE_CACHE_LOCK = threading.Lock()
 _MAX_TTL = 255
 _MIN_TTL = 0
 
@@ -137,12 +150,29 @@ class MixedPortandNonPortProtos(Error):
   """Error when protocols that use ports are mixed with protocols that don't."""
 
 
+def _ActiveParser():
+  return getattr(_ACTIVE, 'parser', None)
+
+
 def _DEFINITIONS():
+  active = _ActiveParser()
+  if active is not None:
+    return active.definitions
   if DEFINITIONS is None:
     raise ValueError('definitions object not defined.')
   return DEFINITIONS
 
 
+def _Optimize():
+  active = _ActiveParser()
+  return _OPTIMIZE if active is None else active.optimize
+
+
+def _ShadeCheck():
+  active = _ActiveParser()
+  return _SHADE_CHECK if active is None else active.shade_check
+
+
 def TranslatePorts(ports, protocols, term_name):
   """Return all ports of all protocols requested.
 
@@ -205,9 +235,11 @@ class Policy:
   def AddFilter(self, header, terms):
     """Add another header & filter."""
     self.filters.append((header, terms))
-    self._TranslateTerms(terms)
-    if _SHADE_CHECK:
-      self._DetectShading(terms)
+    with renderprofile.Phase('translate_terms'):
+      self._TranslateTerms(terms)
+    if _ShadeCheck():
+      with renderprofile.Phase('shade_check'):
+        self._DetectShading(terms)
 
   def _TranslateTerms(self, terms):
     """."""
@@ -244,10 +276,33 @@ class Policy:
           )
 
       # If argument is true, we optimize, otherwise just sort addresses
-      term.AddressCleanup(_OPTIMIZE, self._NeedsAddressBook())
+      term.AddressCleanup(_Optimize(), self._NeedsAddressBook())
       term.SanityCheck()
       term.translated = True
 
+  def Copy(self, copy_addresses=False):
+    """Returns a copy of the policy which a generator is free to modify.
+
+    This is a much cheaper alternative to copy.deepcopy(). Headers and terms
+    are copied along with every list they hold, while the nacaddr objects
+    referenced by the terms are shared with this policy unless copy_addresses
+    is set.
+
+    Args:
+      copy_addresses: bool - whether the nacaddr objects are copied as well.
+
+    Returns:
+      A new Policy object.
+    """
+    new_policy = Policy.__new__(Policy)
+    new_policy.__dict__.update(self.__dict__)
+    with renderprofile.Phase('copy'):
+      new_policy.filters = [
+          (header.Copy(), [term.Copy(copy_addresses) for term in terms])
+          for header, terms in self.filters
+      ]
+    return new_policy
+
   def _NeedsAddressBook(self):
     """Returns True if the policy uses a generator needing an addressbook."""
     for header in self.headers:
@@ -277,24 +332,71 @@ class Policy:
     contains every component of the current term then the current term would
     never be hit and is thus shaded. This can be a mistake.
 
+    Only the prior terms whose protocols and addresses can contain the term
+    are compared with it; they are found through prefix indexes of the source
+    and destination addresses of the prior terms.
+
     Args:
       terms: list of Term objects.
 
     Raises:
       ShadingError: When a term is impossible to reach.
     """
+    # Terms with equal keys behave the same in the protocol comparisons, which
+    # come first in Term.__contains__.
+    keys = {}
+    term_keys = []
+    for index, term in enumerate(terms):
+      term_keys.append(keys.setdefault(term._ProtocolKey(index), term))
+    protocols_match = {}
+
+    def _ProtocolsMatch(prior, term):
+      pair = (id(prior), id(term))
+      if pair not in protocols_match:
+        protocols_match[pair] = prior._ContainsProtocols(term)
+      return protocols_match[pair]
+
+    # Term.__contains__ flattens both terms once they pass the protocol
+    # comparisons. Flatten exactly the terms that comparing every pair of terms
+    # would have flattened, as flattening changes their addresses.
+    first_index = {}
+    last_index = {}
+    for index, key in enumerate(term_keys):
+      first_index.setdefault(id(key), (index, key))
+      last_index[id(key)] = (index, key)
+    for index, term in enumerate(terms):
+      key = term_keys[index]
+      if term.flattened:
+        continue
+      if any(prior_index < index and _ProtocolsMatch(prior_key, key)
+             for prior_index, prior_key in first_index.values()) or any(
+                 later_index > index and _ProtocolsMatch(key, later_key)
+                 for later_index, later_key in last_index.values()):
+        term.FlattenAll()
+
     shading_errors = []
+    source_index = _AddressIndex()
+    destination_index = _AddressIndex()
     for index, term in enumerate(terms):
-      for prior_index in range(index):
-        # Check each term that came before for shading. Terms with next as an
-        # action do not terminate evaluation, so cannot shade.
-        if (
-            term in terms[prior_index]
-            and 'next' not in terms[prior_index].action
-        ):
+      # Terms which were not flattened can't contain or be contained by any
+      # other term.
+      if not term.flattened:
+        continue
+      candidates = source_index.Candidates(term.flattened_saddr)
+      if candidates:
+        candidates &= destination_index.Candidates(term.flattened_daddr)
+      for prior_index in sorted(candidates):
+        prior = terms[prior_index]
+        if (_ProtocolsMatch(term_keys[prior_index], term_keys[index])
+            and term in prior):
           shading_errors.append(
-              '  %s is shaded by %s.' % (term.name, terms[prior_index].name)
+              '  %s is shaded by %s.' % (term.name, prior.name)
           )
+      # Terms with next as an action do not terminate evaluation, so cannot
+      # shade.
+      if 'next' not in term.action:
+        source_index.Add(index, term.flattened_saddr)
+        destination_index.Add(index, term.flattened_daddr)
     if shading_errors:
       raise ShadingError('\n'.join(shading_errors))
 
@@ -325,6 +427,60 @@ class Policy:
     return self.__str__()
 
 
+class _AddressIndex:
+  """Prefix index of the source or destination addresses of terms.
+
+  Used to find the terms whose addresses may contain all addresses of another
+  term, as Term.CheckAddressIsContained would check.
+  """
+
+  def __init__(self):
+    # Terms without addresses, which contain any other address list.
+    self._unrestricted = set()
+    # (version, prefix length) to a dict of network address to term indexes.
+    self._networks = {}
+    self._prefix_lengths = {4: [], 6: []}
+
+  def Add(self, index, addresses):
+    """Adds the addresses of the term at index."""
+    if not addresses:
+      self._unrestricted.add(index)
+      return
+    for addr in addresses:
+      prefix = (addr.version, addr.prefixlen)
+      if prefix not in self._networks:
+        self._networks[prefix] = {}
+        bisect.insort(self._prefix_lengths[addr.version], addr.prefixlen)
+      self._networks[prefix].setdefault(
+          int(addr.network_address), set()).add(index)
+
+  def _Supernets(self, addr):
+    """Returns the indexes of the terms having a supernet of addr."""
+    indexes = set()
+    network = int(addr.network_address)
+    for prefixlen in self._prefix_lengths[addr.version]:
+      if prefixlen > addr.prefixlen:
+        break
+      host_bits = addr.max_prefixlen - prefixlen
+      indexes.update(self._networks[(addr.version, prefixlen)].get(
+          network >> host_bits << host_bits, ()))
+    return indexes
+
+  def Candidates(self, addresses):
+    """Returns the indexes of the terms which may contain addresses."""
+    if not addresses:
+      return set(self._unrestricted)
+    contained = None
+    for addr in addresses:
+      if contained is None:
+        contained = self._Supernets(addr)
+      else:
+        contained &= self._Supernets(addr)
+      if not contained:
+        break
+    return contained | self._unrestricted
+
+
 class Term:
   """The Term object is used to store each of the terms.
 
@@ -445,87 +601,91 @@ class Term:
   _IPV4_BYTE_SIZE = 1
   _IPV6_BYTE_SIZE = 4
 
+  # Attributes of every term, in the order they are listed by AttributeItems().
+  # Terms are held in slots, as large policies keep many of them alive;
+  # __dict__ keeps any other attribute a generator may set.
+  __slots__ = (
+      'name', 'action', 'address', 'address_exclude',
+      'restrict_address_family', 'comment', 'counter', 'expiration',
+      'destination_address', 'destination_address_exclude', 'destination_port',
+      'destination_prefix', 'filter_term', 'forwarding_class',
+      'forwarding_class_except', 'logging', 'log_limit', 'log_name',
+      'loss_priority', 'option', 'owner', 'policer', 'port', 'police_kbps',
+      'police_burst', 'police_pps', 'precedence', 'protocol',
+      'protocol_except', 'qos', 'traffic_class', 'pan_application',
+      'versa_application', 'routing_instance', 'source_address',
+      'source_address_exclude', 'source_port', 'source_prefix', 'ttl',
+      'verbatim', 'packet_length', 'fragment_offset', 'hop_limit', 'icmp_type',
+      'icmp_code', 'ether_type', 'traffic_class_count', 'traffic_type',
+      'translated', 'dscp_set', 'dscp_match', 'dscp_except', 'next_ip',
+      'next_interface', 'next_hop_group', 'flexible_match_range',
+      'source_prefix_except', 'destination_prefix_except', 'inactive',
+      'encapsulate', 'decapsulate', 'port_mirror', 'destination_zone',
+      'source_zone', 'vpn', 'source_tag', 'destination_tag', 'priority',
+      'source_service_accounts', 'target_service_accounts', 'source_interface',
+      'destination_interface', 'platform', 'platform_exclude',
+      'target_resources', 'timeout', 'flattened', 'flattened_addr',
+      'flattened_saddr', 'flattened_daddr', 'stateless_reply',
+      'fortigate_application_id',
+      '__dict__',
+  )
+  # Attributes holding lists, which are only allocated once they are used as
+  # most terms leave most of them empty.
+  _LIST_ATTRIBUTES = frozenset((
+      'action', 'address', 'address_exclude', 'comment', 'destination_address',
+      'destination_address_exclude', 'destination_port', 'destination_prefix',
+      'forwarding_class', 'forwarding_class_except', 'logging', 'option',
+      'port', 'precedence', 'protocol', 'protocol_except', 'pan_application',
+      'versa_application', 'source_address', 'source_address_exclude',
+      'source_port', 'source_prefix', 'verbatim', 'icmp_type', 'icmp_code',
+      'ether_type', 'traffic_type', 'dscp_match', 'dscp_except',
+      'flexible_match_range', 'source_prefix_except',
+      'destination_prefix_except', 'destination_zone', 'source_zone',
+      'source_tag', 'destination_tag', 'source_service_accounts',
+      'target_service_accounts', 'platform', 'platform_exclude',
+      'target_resources', 'fortigate_application_id',
+  ))
+
   def __init__(self, obj):
     self.name = None
 
-    self.action = []
-    self.address = []
-    self.address_exclude = []
     self.restrict_address_family = None
-    self.comment = []
     self.counter = None
     self.expiration = None
-    self.destination_address = []
-    self.destination_address_exclude = []
-    self.destination_port = []
-    self.destination_prefix = []
     self.filter_term = None
-    self.forwarding_class = []
-    self.forwarding_class_except = []
-    self.logging = []
     self.log_limit = None
     self.log_name = None
     self.loss_priority = None
-    self.option = []
     self.owner = None
     self.policer = None
-    self.port = []
     self.police_kbps = None
     self.police_burst = None
     self.police_pps = None
-    self.precedence = []
-    self.protocol = []
-    self.protocol_except = []
     self.qos = None
     self.traffic_class = None
-    self.pan_application = []
-    self.versa_application = []
     self.routing_instance = None
-    self.source_address = []
-    self.source_address_exclude = []
-    self.source_port = []
-    self.source_prefix = []
     self.ttl = None
-    self.verbatim = []
     # juniper specific.
     self.packet_length = None
     self.fragment_offset = None
     self.hop_limit = None
-    self.icmp_type = []
-    self.icmp_code = []
-    self.ether_type = []
     self.traffic_class_count = None
-    self.traffic_type = []
     self.translated = False
     self.dscp_set = None
-    self.dscp_match = []
-    self.dscp_except = []
     self.next_ip = None
     self.next_interface = None
     self.next_hop_group = None
-    self.flexible_match_range = []
-    self.source_prefix_except = []
-    self.destination_prefix_except = []
     self.inactive = False
     self.encapsulate = None
     self.decapsulate = None
     self.port_mirror = None
     # srx specific
-    self.destination_zone = []
-    self.source_zone = []
     self.vpn = None
     # gce specific
-    self.source_tag = []
-    self.destination_tag = []
     self.priority = None
-    self.source_service_accounts = []
-    self.target_service_accounts = []
     # iptables specific
     self.source_interface = None
     self.destination_interface = None
-    self.platform = []
-    self.platform_exclude = []
-    self.target_resources = []
 
     self.timeout = None
     self.flattened = False
@@ -533,45 +693,38 @@ class Term:
     self.flattened_saddr = None
     self.flattened_daddr = None
     self.stateless_reply = False
-    # fortigate specific
-    self.fortigate_application_id = []
 
     # AddObject touches variables which might not have been initialized
     # further up so this has to be at the end.
     self.AddObject(obj)
 
+  def __getattr__(self, name):
+    # Only called for attributes without a value, such as unused lists.
+    if name in Term._LIST_ATTRIBUTES:
+      value = []
+      setattr(self, name, value)
+      return value
+    raise AttributeError(
+        '%r object has no attribute %r' % (type(self).__name__, name))
+
+  def AttributeItems(self):
+    """Returns (name, value) tuples of the attributes which have a value.
+
+    Lists which were never used are left out, as they would be empty.
+    """
+    items = []
+    for name in Term.__slots__[:-1]:
+      try:
+        items.append((name, object.__getattribute__(self, name)))
+      except AttributeError:
+        continue
+    items.extend(self.__dict__.items())
+    return items
+
   def __contains__(self, other):
     """Determine if other term is contained in this term."""
-    if self.verbatim or other.verbatim:
-      # short circuit these
-      if sorted(list(self.verbatim)) != sorted(other.verbatim):
-        return False
-
-    # check protocols
-    # either protocol or protocol-except may be used, not both at the same time.
-    if self.protocol:
-      if other.protocol:
-        if not self.CheckProtocolIsContained(other.protocol, self.protocol):
-          return False
-      # this term has protocol, other has protocol_except.
-      elif other.protocol_except:
-        return False
-      else:
-        # other does not have protocol or protocol_except. since we do other
-        # cannot be contained in self.
-        return False
-    elif self.protocol_except:
-      if other.protocol_except:
-        if not self.CheckProtocolIsContained(
-            self.protocol_except, other.protocol_except
-        ):
-          return False
-      elif other.protocol:
-        for proto in other.protocol:
-          if proto in self.protocol_except:
-            return False
-      else:
-        return False
+    if not self._ContainsProtocols(other):
+      return False
 
     # combine addresses with exclusions for proper contains comparisons.
     if not self.flattened:
@@ -768,6 +921,63 @@ class Term:
     # we have containment
     return True
 
+  def _ContainsProtocols(self, other):
+    """Determine if the protocols of other term are contained in this term.
+
+    These are the comparisons __contains__ makes before the addresses.
+
+    Args:
+      other: Term object.
+
+    Returns:
+      bool: False if other can not be contained in this term.
+    """
+    if self.verbatim or other.verbatim:
+      # short circuit these
+      if sorted(list(self.verbatim)) != sorted(other.verbatim):
+        return False
+
+    # check protocols
+    # either protocol or protocol-except may be used, not both at the same time.
+    if self.protocol:
+      if other.protocol:
+        if not self.CheckProtocolIsContained(other.protocol, self.protocol):
+          return False
+      # this term has protocol, other has protocol_except.
+      elif other.protocol_except:
+        return False
+      else:
+        # other does not have protocol or protocol_except. since we do other
+        # cannot be contained in self.
+        return False
+    elif self.protocol_except:
+      if other.protocol_except:
+        if not self.CheckProtocolIsContained(
+            self.protocol_except, other.protocol_except
+        ):
+          return False
+      elif other.protocol:
+        for proto in other.protocol:
+          if proto in self.protocol_except:
+            return False
+      else:
+        return False
+    return True
+
+  def _ProtocolKey(self, index):
+    """Returns a key which is equal for terms _ContainsProtocols treats alike.
+
+    Args:
+      index: int - position of the term, which makes the key of a term with
+        verbatim output unique.
+
+    Returns:
+      A hashable key.
+    """
+    if self.verbatim:
+      return (index,)
+    return (frozenset(self.protocol), frozenset(self.protocol_except))
+
   def __str__(self):
     ret_str = []
     ret_str.append(' name: %s' % self.name)
@@ -1214,6 +1424,35 @@ class Term:
       if mutate:
         self.address = self.flattened_addr
 
+  def Copy(self, copy_addresses=False):
+    """Returns a copy of the term with copies of all of its lists.
+
+    Lists which are shared between attributes, such as flattened_saddr and
+    source_address, stay shared in the copy.
+
+    Args:
+      copy_addresses: bool - whether the nacaddr objects are copied as well.
+
+    Returns:
+      A new Term object.
+    """
+    new_term = self.__class__.__new__(self.__class__)
+    memo = {}
+    for name, value in self.AttributeItems():
+      if isinstance(value, list):
+        if id(value) not in memo:
+          if copy_addresses:
+            memo[id(value)] = [
+                copy.deepcopy(x, memo)
+                if isinstance(x, (nacaddr.IPv4, nacaddr.IPv6)) else x
+                for x in value
+            ]
+          else:
+            memo[id(value)] = list(value)
+        value = memo[id(value)]
+      setattr(new_term, name, value)
+    return new_term
+
   def GetAddressOfVersion(self, addr_type, af=None):
     """Returns addresses of the appropriate Address Family.
 
@@ -1849,6 +2088,15 @@ class Header:
     self.apply_groups = []
     self.apply_groups_except = []
 
+  def Copy(self):
+    """Returns a copy of the header, including copies of its targets."""
+    new_header = Header()
+    new_header.target = [Target([t.platform] + t.options) for t in self.target]
+    new_header.comment = list(self.comment)
+    new_header.apply_groups = list(self.apply_groups)
+    new_header.apply_groups_except = list(self.apply_groups_except)
+    return new_header
+
   def AddObject(self, obj):
     """Add and object to the Header.
 
@@ -2937,8 +3185,7 @@ def p_strings_or_ints(p):
 
 def p_error(p):
   """."""
-  global parser
-  next_token = parser.token()
+  next_token = _ActiveParser().NextToken()
   if next_token is None:
     use_token = 'EOF'
   else:
@@ -2953,7 +3200,10 @@ def p_error(p):
     raise ParseError(' ERROR you likely have unablanaced "{"\'s')
 
 
+# The lexer and the parse tables are built once; every PolicyParser works on
+# its own copies of them.
 parser = yacc.yacc(write_tables=False, debug=0, errorlog=yacc.NullLogger())
+_LEXER = lex.lex()
 
 # pylint: enable=unused-argument,invalid-name,g-short-docstring-punctuation
 # pylint: enable=g-docstring-quotes,g-short-docstring-space
@@ -2986,6 +3236,40 @@ def _ReadFile(filename):
     raise FileNotFoundError('Unable to open policy file %s' % filename)
 
 
+def _ReadInclude(filename):
+  """Read an include file, reusing its contents while the file is unchanged.
+
+  Args:
+    filename: str - Filename
+
+  Returns:
+    data: str contents of file.
+  """
+  path = os.path.abspath(filename)
+  try:
+    stat = os.stat(path)
+  except OSError:
+    # Let _ReadFile report the problem.
+    return _ReadFile(filename)
+  version = (stat.st_mtime_ns, stat.st_size)
+  with _INCLUDE_CACHE_LOCK:
+    cached = _INCLUDE_CACHE.pop(path, None)
+    if cached is not None and cached[0] == version:
+      _INCLUDE_CACHE[path] = cached
+      return cached[1]
+  data = _ReadFile(filename)
+  if len(data) > _INCLUDE_CACHE_LIMIT:
+    return data
+  with _INCLUDE_CACHE_LOCK:
+    _INCLUDE_CACHE.pop(path, None)
+    size = len(data) + sum(len(text) for _, text in _INCLUDE_CACHE.values())
+    while size > _INCLUDE_CACHE_LIMIT:
+      _, text = _INCLUDE_CACHE.pop(next(iter(_INCLUDE_CACHE)))
+      size -= len(text)
+    _INCLUDE_CACHE[path] = (version, data)
+  return data
+
+
 def _SubDirectory(child, parent):
   """Returns if the child is a subdirectory of the parent.
 
@@ -3005,7 +3289,7 @@ def _SubDirectory(child, parent):
   )
 
 
-def _Preprocess(data, max_depth=5, base_dir=''):
+def _Preprocess(data, max_depth=5, base_dir='', includes=None):
   """Search input for include statements and import specified include file.
 
   Search input for include statements and if found, import specified file
@@ -3015,6 +3299,8 @@ def _Preprocess(data, max_depth=5, base_dir=''):
     data: A string of Policy file data.
     max_depth: Maximum depth of included files
     base_dir: Base path string where to look for policy or include files
+    includes: optional list to which the path of every included file is
+      appended, including files included by other include files.
 
   Returns:
     A string containing result of the processed input data
@@ -3040,15 +3326,146 @@ def _Preprocess(data, max_depth=5, base_dir=''):
             '%s'
             % ('Included file is from invalid directory: %s.' % include_file)
         )
-      data = _ReadFile(include_file_path)
+      if includes is not None:
+        includes.append(os.path.normpath(include_file_path))
+      data = _ReadInclude(include_file_path)
       # recursively handle includes in included data
-      inc_data = _Preprocess(data, max_depth - 1, base_dir=base_dir)
+      inc_data = _Preprocess(data, max_depth - 1, base_dir=base_dir,
+                             includes=includes)
       rval.extend(inc_data)
     else:
       rval.append(line)
   return rval
 
 
+def GetIncludes(data, base_dir=''):
+  """Returns the include files used by policy data.
+
+  Args:
+    data: A string of Policy file data.
+    base_dir: Base path string where to look for policy or include files
+
+  Returns:
+    A sorted list of the paths of the files included by data, directly or by
+    another include file.
+  """
+  includes = []
+  _Preprocess(data, base_dir=base_dir, includes=includes)
+  return sorted(set(includes))
+
+
+def IncludeGraph(policy_files, base_dir=''):
+  """Maps policy files to the include files they use.
+
+  Policies which can not be read or preprocessed are logged and mapped to the
+  includes found before the error.
+
+  Args:
+    policy_files: list of policy file paths.
+    base_dir: Base path string where to look for policy or include files
+
+  Returns:
+    A dict of each policy file to a sorted list of include file paths.
+  """
+  graph = {}
+  for policy_file in policy_files:
+    includes = []
+    try:
+      _Preprocess(_ReadFile(policy_file), base_dir=base_dir, includes=includes)
+    except Error as e:
+      logging.warning('unable to find the includes of %s: %s', policy_file, e)
+    graph[policy_file] = sorted(set(includes))
+  return graph
+
+
+def PoliciesUsingIncludes(graph, include_files):
+  """Returns the policies affected by changes to include files.
+
+  Args:
+    graph: dict of policy file to include files, as returned by IncludeGraph.
+    include_files: list of changed include file paths.
+
+  Returns:
+    A sorted list of the policy files which use any of include_files.
+  """
+  changed = {os.path.abspath(f) for f in include_files}
+  return sorted(
+      (policy_file for policy_file, includes in graph.items()
+       if changed.intersection(os.path.abspath(f) for f in includes)),
+      key=str)
+
+
+class PolicyParser:
+  """Parses policies using its own definitions and options.
+
+  The lexer and the parse tables are built only once per process. Every
+  PolicyParser owns its lexer and parser state and does not touch module
+  state while parsing, so several parsers can be used concurrently from
+  different threads. A single parser parses one policy at a time.
+
+  Attributes:
+    definitions: naming library definitions object.
+    optimize: bool - whether to summarize networks and services.
+    shade_check: bool - whether to raise an exception when a term is shaded.
+    base_dir: base path string to look for acls or include files.
+  """
+
+  def __init__(
+      self, definitions=None, optimize=True, shade_check=False, base_dir=''
+  ):
+    self.definitions = definitions
+    self.optimize = optimize
+    self.shade_check = shade_check
+    self.base_dir = base_dir
+    self._lexer = _LEXER.clone()
+    self._parser = copy.copy(parser)
+    self._lock = threading.Lock()
+
+  def NextToken(self):
+    """Returns the token following the one being parsed, for error messages."""
+    return self._parser.token()
+
+  def Parse(self, data, filename=''):
+    """Parse the policy in 'data'.
+
+    Args:
+      data: a string blob of policy data to parse.
+      filename: string - filename used by the policy.
+
+    Returns:
+      policy object or False (if parse error).
+    """
+    with self._lock:
+      if not self.definitions:
+        self.definitions = naming.Naming(DEFAULT_DEFINITIONS)
+      previous = _ActiveParser()
+      _ACTIVE.parser = self
+      try:
+        with renderprofile.Phase('preprocess'):
+          preprocessed_data = '\n'.join(
+              _Preprocess(data, base_dir=self.base_dir))
+        self._lexer.lineno = 1
+        with renderprofile.Phase('parse'):
+          policy = self._parser.parse(preprocessed_data, lexer=self._lexer)
+        policy.filename = filename
+        return policy
+      except IndexError:
+        return False
+      finally:
+        _ACTIVE.parser = previous
+
+  def ParseFile(self, filename):
+    """Parse the policy contained in file.
+
+    Args:
+      filename: Name of policy file to parse.
+
+    Returns:
+      policy object or False (if parse error).
+    """
+    return self.Parse(_ReadFile(filename), filename=filename)
+
+
 def ParseFile(
     filename, definitions=None, optimize=True, base_dir='', shade_check=False
 ):
@@ -3088,7 +3505,10 @@ def ParsePolicy(
 ):
   """Parse the policy in 'data', optionally provide a naming object.
 
-  Parse a blob of policy text into a policy object.
+  Parse a blob of policy text into a policy object. The definitions and
+  options are also stored in the module globals for callers which inspect
+  them; the parse itself only uses a new PolicyParser, so concurrent calls do
+  not see each other's definitions.
 
   Args:
     data: a string blob of policy data to parse.
@@ -3101,24 +3521,14 @@ def ParsePolicy(
   Returns:
     policy object or False (if parse error).
   """
-  try:
-    if definitions:
-      globals()['DEFINITIONS'] = definitions
-    else:
-      globals()['DEFINITIONS'] = naming.Naming(DEFAULT_DEFINITIONS)
-    globals()['_OPTIMIZE'] = optimize
-    globals()['_SHADE_CHECK'] = shade_check
-
-    lexer = lex.lex()
-
-    preprocessed_data = '\n'.join(_Preprocess(data, base_dir=base_dir))
-    global parser
-    policy = parser.parse(preprocessed_data, lexer=lexer)
-    policy.filename = filename
-    return policy
-
-  except IndexError:
-    return False
+  if not definitions:
+    definitions = naming.Naming(DEFAULT_DEFINITIONS)
+  globals()['DEFINITIONS'] = definitions
+  globals()['_OPTIMIZE'] = optimize
+  globals()['_SHADE_CHECK'] = shade_check
+  return PolicyParser(
+      definitions, optimize, shade_check, base_dir=base_dir
+  ).Parse(data, filename=filename)
 
 
 # if you call this from the command line, you can specify a pol file for it to
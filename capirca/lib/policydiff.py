@@ -0,0 +1,355 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Semantic differences between two parsed policies.
+
+Filters are matched by their targets and filter names, and terms by their
+names within a filter.  A term is modified when any of its attributes differ,
+and the difference is reported as the values removed from and added to every
+attribute, so an address list that gained a network reports only that network.
+Addresses are compared by network, so renaming a token without changing its
+addresses is not a change.
+
+Fingerprint() hashes a term, or a generator term, including the tokens and
+comments of its addresses, and is what the per-term output cache is keyed on.
+
+Sample usage:
+    diff = Diff(old_pol, new_pol)
+    if diff:
+      print(diff)
+"""
+
+import collections
+import datetime
+import enum
+import hashlib
+import marshal
+from typing import List, NamedTuple, Optional, Tuple
+
+from capirca.lib import nacaddr
+from capirca.lib import policy
+
+# Term attributes derived from others while the policy is optimized.
+_DERIVED_ATTRIBUTES = frozenset(
+    ('flattened', 'flattened_addr', 'flattened_saddr', 'flattened_daddr'))
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class UnfingerprintableError(Error):
+  """A value holds an object whose content cannot be fingerprinted."""
+
+
+def _Canonical(value, out):
+  """Appends a canonical text form of value to the list out."""
+  if value is None or isinstance(value, (bool, int, float, str, bytes)):
+    out.append(repr(value))
+  elif isinstance(value, (nacaddr.IPv4, nacaddr.IPv6)):
+    out.append('ip(%s,%r,%r,%r)' % (
+        value.with_prefixlen, value.text, value.token,
+        getattr(value, 'parent_token', None)))
+  elif isinstance(value, list) and value and isinstance(
+      value[0], (nacaddr.IPv4, nacaddr.IPv6)):
+    # Address lists are by far the largest part of terms.
+    try:
+      addresses = marshal.dumps([
+          (addr.version, addr.network_address._ip, addr.prefixlen,  # pylint: disable=protected-access
+           addr.text, addr.token, addr.parent_token)
+          for addr in value])
+    except (AttributeError, ValueError):
+      raise UnfingerprintableError('cannot fingerprint a mixed address list')
+    out.append('ips(%s)' % hashlib.sha256(addresses).hexdigest())
+  elif isinstance(value, (list, tuple)):
+    out.append('[')
+    for item in value:
+      _Canonical(item, out)
+      out.append(',')
+    out.append(']')
+  elif isinstance(value, (set, frozenset)):
+    items = []
+    for item in value:
+      item_out = []
+      _Canonical(item, item_out)
+      items.append(''.join(item_out))
+    out.append('{%s}' % ','.join(sorted(items)))
+  elif isinstance(value, dict):
+    out.append('{')
+    for key, item in sorted(value.items(), key=lambda kv: repr(kv[0])):
+      _Canonical(key, out)
+      out.append(':')
+      _Canonical(item, out)
+      out.append(',')
+    out.append('}')
+  elif isinstance(value, policy.Term):
+    # Reading an unused list attribute sets it to an empty list, which must
+    # not change the fingerprint.
+    out.append('Term(')
+    _Canonical([(name, item) for name, item in value.AttributeItems()
+                if not (isinstance(item, list) and not item)], out)
+    out.append(')')
+  elif isinstance(value, policy.VarType):
+    out.append('VarType(%d,' % value.var_type)
+    _Canonical(value.value, out)
+    out.append(')')
+  elif isinstance(value, (datetime.date, enum.Enum)):
+    out.append(repr(value))
+  elif hasattr(value, '__dict__') and not callable(value):
+    # Generator terms and the plain objects they hold.
+    cls = type(value)
+    out.append('%s.%s(' % (cls.__module__, cls.__qualname__))
+    _Canonical(vars(value), out)
+    out.append(')')
+  else:
+    raise UnfingerprintableError('cannot fingerprint %s' % type(value).__name__)
+
+
+def Fingerprint(value):
+  """Returns a digest of the content of a term or generator term.
+
+  Args:
+    value: a policy.Term, a generator term, or plain data.
+
+  Returns:
+    A hex digest string.
+
+  Raises:
+    UnfingerprintableError: value holds an object that cannot be hashed by
+      content, such as a function.
+  """
+  out = []
+  try:
+    _Canonical(value, out)
+  except RecursionError:
+    raise UnfingerprintableError('cannot fingerprint a value holding itself')
+  return hashlib.sha256(''.join(out).encode()).hexdigest()
+
+
+class AttributeDelta(NamedTuple):
+  """The values removed from and added to an attribute."""
+  attribute: str
+  removed: List[str]
+  added: List[str]
+
+
+class TermDiff(NamedTuple):
+  """A term added to, removed from or modified in a filter.
+
+  old is None for added terms and new is None for removed terms.
+  """
+  name: str
+  old: Optional[policy.Term]
+  new: Optional[policy.Term]
+  deltas: List[AttributeDelta]
+
+
+class FilterDiff(NamedTuple):
+  """The changes to a filter present in both policies.
+
+  key is the FilterKey of the filter and its occurrence among the filters
+  with the same key.
+  """
+  key: Tuple
+  old_header: policy.Header
+  new_header: policy.Header
+  header_deltas: List[AttributeDelta]
+  added_terms: List[TermDiff]
+  removed_terms: List[TermDiff]
+  modified_terms: List[TermDiff]
+  reordered: bool
+
+  def __bool__(self):
+    return bool(self.header_deltas or self.added_terms or self.removed_terms or
+                self.modified_terms or self.reordered)
+
+
+class PolicyDiff(NamedTuple):
+  """The changes between two policies.
+
+  added_filters and removed_filters hold (header, terms) tuples of filters
+  present in only one of the policies; modified_filters holds a FilterDiff of
+  every filter in both that changed.
+  """
+  added_filters: List[Tuple[policy.Header, List[policy.Term]]]
+  removed_filters: List[Tuple[policy.Header, List[policy.Term]]]
+  modified_filters: List[FilterDiff]
+
+  def __bool__(self):
+    return bool(self.added_filters or self.removed_filters or
+                self.modified_filters)
+
+  def __str__(self):
+    lines = []
+    for header, terms in self.removed_filters:
+      lines.append('- filter %s (%d terms)' % (_FilterName(header),
+                                               len(terms)))
+    for header, terms in self.added_filters:
+      lines.append('+ filter %s (%d terms)' % (_FilterName(header),
+                                               len(terms)))
+    for filter_diff in self.modified_filters:
+      lines.append('~ filter %s' % _FilterName(filter_diff.new_header))
+      lines.extend(_DeltaLines(filter_diff.header_deltas, '    '))
+      for term in filter_diff.removed_terms:
+        lines.append('  - term %s' % term.name)
+      for term in filter_diff.added_terms:
+        lines.append('  + term %s' % term.name)
+      for term in filter_diff.modified_terms:
+        lines.append('  ~ term %s' % term.name)
+        lines.extend(_DeltaLines(term.deltas, '      '))
+      if filter_diff.reordered:
+        lines.append('  terms reordered')
+    return '\n'.join(lines)
+
+
+def _DeltaLines(deltas, indent):
+  lines = []
+  for delta in deltas:
+    changes = ['-%s' % value for value in delta.removed]
+    changes.extend('+%s' % value for value in delta.added)
+    lines.append('%s%s: %s' % (indent, delta.attribute, ' '.join(changes)))
+  return lines
+
+
+def _FilterName(header):
+  return ', '.join(' '.join([target.platform] + target.options)
+                   for target in header.target)
+
+
+def FilterKey(header):
+  """Returns the key filters are matched on: their platforms and names."""
+  return tuple((target.platform, target.options[0] if target.options else '')
+               for target in header.target)
+
+
+def _FiltersByKey(pol):
+  """Returns a dict of (FilterKey, occurrence) to the (header, terms) tuples.
+
+  Filters repeating the targets of an earlier filter are told apart by their
+  occurrence among them, counted from 0.
+
+  Args:
+    pol: policy.Policy object.
+  """
+  filters = {}
+  for header, terms in pol.filters:
+    key = FilterKey(header)
+    occurrence = 0
+    while (key, occurrence) in filters:
+      occurrence += 1
+    filters[(key, occurrence)] = (header, terms)
+  return filters
+
+
+def _Describe(value):
+  """Returns the text a value is compared and reported as."""
+  if isinstance(value, (nacaddr.IPv4, nacaddr.IPv6)):
+    return value.with_prefixlen
+  if isinstance(value, tuple) and len(value) == 2 and all(
+      isinstance(port, int) for port in value):
+    first, last = value
+    return str(first) if first == last else '%d-%d' % (first, last)
+  if isinstance(value, policy.Term):
+    return value.name
+  if isinstance(value, policy.Target):
+    return ' '.join([value.platform] + value.options)
+  return str(value)
+
+
+def _Values(value):
+  if value is None:
+    return []
+  if isinstance(value, list):
+    return [_Describe(item) for item in value]
+  return [_Describe(value)]
+
+
+def _Deltas(old_items, new_items):
+  """Returns the AttributeDelta of every attribute that differs."""
+  deltas = []
+  for attribute in sorted(set(old_items) | set(new_items)):
+    old_values = collections.Counter(_Values(old_items.get(attribute)))
+    new_values = collections.Counter(_Values(new_items.get(attribute)))
+    if old_values == new_values:
+      continue
+    deltas.append(AttributeDelta(
+        attribute,
+        sorted((old_values - new_values).elements()),
+        sorted((new_values - old_values).elements())))
+  return deltas
+
+
+def _TermItems(term):
+  return {name: value for name, value in term.AttributeItems()
+          if name != 'name' and name not in _DERIVED_ATTRIBUTES}
+
+
+def _HeaderItems(header):
+  return {'target': header.target, 'comment': header.comment,
+          'apply_groups': header.apply_groups,
+          'apply_groups_except': header.apply_groups_except}
+
+
+def DiffTerms(old, new):
+  """Returns the AttributeDelta of every attribute of two terms that differs."""
+  return _Deltas(_TermItems(old), _TermItems(new))
+
+
+def _DiffFilter(key, old_filter, new_filter):
+  old_header, old_terms = old_filter
+  new_header, new_terms = new_filter
+  old_by_name = {term.name: term for term in old_terms}
+  new_by_name = {term.name: term for term in new_terms}
+  added = [TermDiff(term.name, None, term, []) for term in new_terms
+           if term.name not in old_by_name]
+  removed = [TermDiff(term.name, term, None, []) for term in old_terms
+             if term.name not in new_by_name]
+  modified = []
+  for term in new_terms:
+    old = old_by_name.get(term.name)
+    if old is None:
+      continue
+    deltas = DiffTerms(old, term)
+    if deltas:
+      modified.append(TermDiff(term.name, old, term, deltas))
+  common_old = [term.name for term in old_terms if term.name in new_by_name]
+  common_new = [term.name for term in new_terms if term.name in old_by_name]
+  return FilterDiff(
+      key, old_header, new_header,
+      _Deltas(_HeaderItems(old_header), _HeaderItems(new_header)),
+      added, removed, modified, common_old != common_new)
+
+
+def Diff(old_pol, new_pol):
+  """Computes the semantic difference between two policies.
+
+  Args:
+    old_pol: policy.Policy object.
+    new_pol: policy.Policy object.
+
+  Returns:
+    A PolicyDiff, which is false when the policies are equivalent.
+  """
+  old_filters = _FiltersByKey(old_pol)
+  new_filters = _FiltersByKey(new_pol)
+  removed = [old_filters[key] for key in old_filters if key not in new_filters]
+  added = [new_filters[key] for key in new_filters if key not in old_filters]
+  modified = []
+  for key, new_filter in new_filters.items():
+    if key in old_filters:
+      filter_diff = _DiffFilter(key, old_filters[key], new_filter)
+      if filter_diff:
+        modified.append(filter_diff)
+  return PolicyDiff(added, removed, modified)
@@ -0,0 +1,400 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""On-disk cache of rendered ACLs used for incremental aclgen builds.
+
+Every cache entry is stored under a content address computed from the
+preprocessed policy text (which already contains every resolved #include),
+the render options and the version of the generator code.  The entry itself
+records a digest of every naming token the policy referenced while it was
+parsed, including tokens nested inside those tokens.  An entry is only reused
+when all of those digests still match the loaded definitions, so a change to a
+single .net or .svc token only invalidates the policies that use it.
+
+Sample usage:
+    cache = RenderCache('/tmp/aclgen-cache')
+    key = cache.Key(policy_text, 'pol/sample.pol', options)
+    outputs = cache.Lookup(key, defs)
+    if outputs is None:
+      recorder = RecordingNaming(defs)
+      ... render the policy using recorder as its definitions ...
+      cache.Store(key, recorder, rendered_outputs)
+
+When a policy changed, only the terms which changed have to be rendered
+again: generators render their terms through RenderTerm(), which reuses the
+text of every term whose content, as hashed by policydiff.Fingerprint(), was
+rendered by the previous run of the same task.  A term whose rendering
+changes it, or the state its generator reads back afterwards, is rendered
+every time instead.  The texts of the terms of a task are kept in one file
+next to the cache entries:
+    with cache.TermCache('pol/sample.pol'):
+      ... render the policy ...
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+
+from absl import logging
+from capirca.lib import policydiff
+
+# Bump whenever the layout of a cache entry changes.
+CACHE_FORMAT_VERSION = 1
+
+_GENERATOR_VERSION = None
+
+# The TermCache generators render their terms through in this process, if any.
+_ACTIVE_TERMS = None
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+def GeneratorVersion():
+  """Returns a fingerprint of the code that renders the ACLs.
+
+  The fingerprint covers aclgen and every module in capirca/lib, so entries
+  written by an older version of any generator are never reused.
+
+  Returns:
+    A hex digest string.
+  """
+  global _GENERATOR_VERSION
+  if _GENERATOR_VERSION is None:
+    lib_dir = pathlib.Path(__file__).resolve().parent
+    sources = [lib_dir.parent / 'aclgen.py'] + sorted(lib_dir.glob('*.py'))
+    digest = hashlib.sha256()
+    for source in sources:
+      digest.update(source.name.encode())
+      try:
+        digest.update(source.read_bytes())
+      except IOError:
+        continue
+    _GENERATOR_VERSION = digest.hexdigest()
+  return _GENERATOR_VERSION
+
+
+def _QueryToken(query):
+  """Strips comments and whitespace from a token query like naming does."""
+  return query.split('#')[0].split()[0]
+
+
+class RecordingNaming:
+  """Wraps a naming.Naming object and records every token that is looked up.
+
+  Only the lookups performed by the policy parser are recorded; every other
+  attribute is passed through to the wrapped object.
+  """
+
+  def __init__(self, definitions):
+    self._definitions = definitions
+    self.networks_used = set()
+    self.services_used = set()
+
+  def GetNetAddr(self, token):
+    self.networks_used.add(_QueryToken(token))
+    return self._definitions.GetNetAddr(token)
+
+  def GetNet(self, query):
+    self.networks_used.add(_QueryToken(query))
+    return self._definitions.GetNet(query)
+
+  def GetService(self, query):
+    self.services_used.add(_QueryToken(query))
+    return self._definitions.GetService(query)
+
+  def GetServiceByProto(self, query, proto):
+    self.services_used.add(_QueryToken(query))
+    return self._definitions.GetServiceByProto(query, proto)
+
+  def __getattr__(self, name):
+    return getattr(self._definitions, name)
+
+
+class RenderCache:
+  """Content-addressed store of rendered outputs for policy files.
+
+  Attributes:
+    cache_directory: pathlib.Path where cache entries are written.
+    hits: number of successful lookups in this process.
+    misses: number of failed lookups in this process.
+  """
+
+  def __init__(self, cache_directory):
+    self.cache_directory = pathlib.Path(cache_directory)
+    self.hits = 0
+    self.misses = 0
+    self._digests = {}
+
+  def __getstate__(self):
+    # Digests are specific to the definitions loaded by a single process.
+    state = self.__dict__.copy()
+    state['_digests'] = {}
+    return state
+
+  def Key(self, policy_text, policy_name, options):
+    """Computes the content address of a policy render.
+
+    Args:
+      policy_text: the policy text with all includes already expanded.
+      policy_name: path of the policy relative to the base directory.
+      options: dict of render options which influence the output.
+
+    Returns:
+      A hex digest string.
+    """
+    key_options = dict(options)
+    # Expired terms are dropped and soon-to-expire terms are reported based
+    # on the current date, so the date becomes part of the key.
+    if 'expiration' in policy_text:
+      key_options['date'] = datetime.date.today().isoformat()
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'format': CACHE_FORMAT_VERSION,
+        'generator': GeneratorVersion(),
+        'policy': str(policy_name),
+        'options': key_options,
+    }, sort_keys=True).encode())
+    digest.update(policy_text.encode())
+    return digest.hexdigest()
+
+  def TermCache(self, task_name):
+    """Returns the TermCache of the terms rendered by a render task.
+
+    Args:
+      task_name: name of the task, the path of its policy relative to the base
+        directory and the platforms it renders, if not all.
+    """
+    name = hashlib.sha256(str(task_name).encode()).hexdigest()
+    return TermCache(self.cache_directory / 'terms' / ('%s.json' % name))
+
+  def _EntryPath(self, key):
+    return self.cache_directory / key[:2] / ('%s.json' % key)
+
+  def Lookup(self, key, definitions):
+    """Returns the cached outputs for key, if they are still valid.
+
+    Args:
+      key: content address returned by Key().
+      definitions: the naming.Naming object the policy would be rendered with.
+
+    Returns:
+      A list of (suffix, text, binary) tuples, or None on a cache miss.
+    """
+    try:
+      with open(self._EntryPath(key), 'r') as f:
+        entry = json.load(f)
+    except (IOError, ValueError):
+      self.misses += 1
+      return None
+    if entry.get('key') != key or not self._DependenciesMatch(
+        entry.get('dependencies', {}), definitions):
+      self.misses += 1
+      return None
+    self.hits += 1
+    return [(o['suffix'], o['text'], o['binary']) for o in entry['outputs']]
+
+  def Store(self, key, recorder, outputs):
+    """Writes a cache entry for a freshly rendered policy.
+
+    Args:
+      key: content address returned by Key().
+      recorder: the RecordingNaming object used while parsing the policy.
+      outputs: list of (suffix, text, binary) tuples that were rendered.
+    """
+    definitions = recorder._definitions  # pylint: disable=protected-access
+    entry = {
+        'key': key,
+        'dependencies': {
+            'networks': {
+                token: self._Digest(definitions, 'networks', token)
+                for token in sorted(recorder.networks_used)
+            },
+            'services': {
+                token: self._Digest(definitions, 'services', token)
+                for token in sorted(recorder.services_used)
+            },
+        },
+        'outputs': [{'suffix': suffix, 'text': text, 'binary': binary}
+                    for suffix, text, binary in outputs],
+    }
+    entry_path = self._EntryPath(key)
+    try:
+      entry_path.parent.mkdir(parents=True, exist_ok=True)
+      # Write to a temporary file first so concurrent renderers never see a
+      # partially written entry.
+      fd, tmp_name = tempfile.mkstemp(dir=entry_path.parent, suffix='.tmp')
+      with os.fdopen(fd, 'w') as f:
+        json.dump(entry, f)
+      os.replace(tmp_name, entry_path)
+    except (IOError, OSError) as e:
+      logging.warning('unable to write render cache entry %s: %s',
+                      entry_path, e)
+
+  def _DependenciesMatch(self, dependencies, definitions):
+    for def_type in ('networks', 'services'):
+      for token, digest in dependencies.get(def_type, {}).items():
+        if self._Digest(definitions, def_type, token) != digest:
+          return False
+    return True
+
+  def _Digest(self, definitions, def_type, token):
+    """Hashes the definition of a token and of every token nested in it.
+
+    Args:
+      definitions: naming.Naming object.
+      def_type: either 'networks' or 'services'.
+      token: the token name.
+
+    Returns:
+      A hex digest string, or None if the token is not defined.
+    """
+    cache_key = (id(definitions), def_type, token)
+    if cache_key in self._digests:
+      return self._digests[cache_key]
+    # Guard against tokens which (indirectly) contain themselves.
+    self._digests[cache_key] = None
+    group = getattr(definitions, def_type)
+    if token not in group:
+      return None
+    digest = hashlib.sha256(token.encode())
+    for item in group[token].items:
+      digest.update(b'\0' + item.encode())
+      value = item.split('#')[0].strip()
+      if value != token and value in group:
+        digest.update(b'\0' + str(
+            self._Digest(definitions, def_type, value)).encode())
+    self._digests[cache_key] = digest.hexdigest()
+    return self._digests[cache_key]
+
+
+class TermCache:
+  """Rendered terms of a task, reused for the terms whose content is unchanged.
+
+  Only the terms rendered while the cache is active, used as a context
+  manager, go through it.  Save() keeps only the terms rendered or reused by
+  this run, so removed terms do not pile up.
+
+  Rendering some terms has side effects: ipset terms collect the address sets
+  their generator prints, and several generators append the owner of a term
+  to its comments.  Reusing the text of such a term would skip them, so a
+  term whose fingerprint changes while it is rendered is recorded with a None
+  text, and rendered again by every run.
+
+  Attributes:
+    path: pathlib.Path of the file the terms are kept in.
+    hits: number of terms whose text was reused.
+    misses: number of terms rendered.
+  """
+
+  def __init__(self, path):
+    self.path = pathlib.Path(path)
+    self.hits = 0
+    self.misses = 0
+    self._previous = None
+    self._used = {}
+
+  def __enter__(self):
+    global _ACTIVE_TERMS
+    _ACTIVE_TERMS = self
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    global _ACTIVE_TERMS
+    _ACTIVE_TERMS = None
+
+  def _Load(self):
+    self._previous = {}
+    try:
+      with open(self.path, 'r') as f:
+        stored = json.load(f)
+    except (IOError, ValueError):
+      return
+    if (stored.get('format') == CACHE_FORMAT_VERSION and
+        stored.get('generator') == GeneratorVersion()):
+      self._previous = stored.get('terms', {})
+
+  def Render(self, term, method, args):
+    """Returns the result of a rendering method of a term, reusing it if cached.
+
+    Args:
+      term: the generator term.
+      method: name of the method of term rendering it.
+      args: list of the arguments of the method.
+
+    Returns:
+      The text, or list of texts, the method returns.
+    """
+    render = getattr(term, method)
+    try:
+      # The key is taken before rendering, as rendering may change the term.
+      key = policydiff.Fingerprint([method, term, args])
+    except policydiff.UnfingerprintableError as e:
+      logging.debug('term not cached: %s', e)
+      return render(*args)
+    if self._previous is None:
+      self._Load()
+    if key in self._used:
+      value = self._used[key]
+    else:
+      value = self._previous.get(key)
+    if value is not None:
+      self.hits += 1
+      self._used[key] = value
+      return value
+    self.misses += 1
+    value = render(*args)
+    try:
+      changed = policydiff.Fingerprint([method, term, args]) != key
+    except policydiff.UnfingerprintableError:
+      changed = True
+    self._used[key] = None if changed else value
+    return value
+
+  def Save(self):
+    """Writes the terms rendered or reused since the cache was created."""
+    if self._previous is None:
+      # No term was rendered through the cache, e.g. on a render cache hit.
+      return
+    try:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+      with os.fdopen(fd, 'w') as f:
+        json.dump({'format': CACHE_FORMAT_VERSION,
+                   'generator': GeneratorVersion(),
+                   'terms': self._used}, f)
+      os.replace(tmp_name, self.path)
+    except (IOError, OSError) as e:
+      logging.warning('unable to write term cache %s: %s', self.path, e)
+
+
+def RenderTerm(term, method='__str__', *args):
+  """Renders a generator term, through the active TermCache if there is one.
+
+  Args:
+    term: the generator term.
+    method: name of the method of term rendering it.
+    *args: the arguments of the method.
+
+  Returns:
+    The result of the method, which must be a string or a list of strings.
+  """
+  if _ACTIVE_TERMS is None:
+    return getattr(term, method)(*args)
+  return _ACTIVE_TERMS.Render(term, method, list(args))
@@ -0,0 +1,246 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Records where the time of an aclgen run goes, per file, platform and phase.
+
+The parser, the generators and aclgen mark their phases with Phase().  While
+no FileProfile is active in the process, which is the default, Phase() does
+nothing but check for one.  While a policy is rendered inside a FileProfile,
+every phase adds its duration, excluding the phases nested within it, to the
+profile of that file.  The time of the file not spent in any phase is
+reported as the 'other' phase.
+
+Sample usage:
+    report = Report()
+    with FileProfile('pol/sample.pol') as profile:
+      with Phase('parse'):
+        ...
+      with Phase('format', 'juniper'):
+        ...
+    report.Add(profile)
+    report.Save('/tmp/aclgen-profile.json')
+"""
+
+import contextlib
+import cProfile
+import csv
+import heapq
+import json
+import marshal
+import pathlib
+import time
+
+# The FileProfile being recorded in this process, if any.
+_ACTIVE = None
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class FileProfile:
+  """The phase durations and peak memory of rendering one policy.
+
+  Attributes:
+    name: name of the policy, or of the render task, being profiled.
+    phases: dict of phase name, with ':platform' appended for the phases of a
+      generator, to the seconds spent in it.
+    seconds: the total duration of the profile.
+    peak_memory: the peak resident memory of the process during the profile,
+      in bytes, or None where it cannot be measured.
+    profile_data: the marshaled cProfile statistics, or None.
+  """
+
+  def __init__(self, name, cprofile=False):
+    self.name = name
+    self.phases = {}
+    self.seconds = 0.0
+    self.peak_memory = None
+    self.profile_data = None
+    self._cprofile = cProfile.Profile() if cprofile else None
+    self._start = None
+    self._peak_reset = False
+    # The seconds spent in the phases nested in each active phase.
+    self._nested = []
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['_cprofile'] = None
+    return state
+
+  def __enter__(self):
+    global _ACTIVE
+    _ACTIVE = self
+    self._nested = [0.0]
+    self._peak_reset = _ResetPeakMemory()
+    self._start = time.perf_counter()
+    if self._cprofile:
+      self._cprofile.enable()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    global _ACTIVE
+    if self._cprofile:
+      self._cprofile.disable()
+      self._cprofile.create_stats()
+      self.profile_data = marshal.dumps(self._cprofile.stats)
+    self.seconds = time.perf_counter() - self._start
+    self.Add('other', self.seconds - sum(self.phases.values()))
+    _ACTIVE = None
+    if self._peak_reset:
+      self.peak_memory = _PeakMemory()
+
+  def Add(self, phase, seconds, platform=None):
+    """Adds seconds to a phase of the profile."""
+    if platform:
+      phase = '%s:%s' % (phase, platform)
+    self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+  def ToDict(self):
+    return {
+        'file': self.name,
+        'seconds': self.seconds,
+        'peak_memory': self.peak_memory,
+        'phases': dict(sorted(self.phases.items())),
+    }
+
+
+def _ResetPeakMemory():
+  """Resets the peak resident memory of the process to its current size.
+
+  The peak over the lifetime of the process, as getrusage reports it, would
+  credit a file with the memory of the files rendered before it in the same
+  renderer, so the peak is reset for every file. Only Linux allows it.
+
+  Returns:
+    Whether the peak was reset.
+  """
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+  except OSError:
+    return False
+  return True
+
+
+def _PeakMemory():
+  """Returns the peak resident memory since its reset in bytes, if known."""
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1]) * 1024
+  except OSError:
+    pass
+  return None
+
+
+@contextlib.contextmanager
+def Phase(name, platform=None):
+  """Records the time spent in a phase while a FileProfile is active.
+
+  Args:
+    name: name of the phase.
+    platform: optional platform of the generator the phase belongs to.
+
+  Yields:
+    Nothing.
+  """
+  profile = _ACTIVE
+  if profile is None:
+    yield
+    return
+  profile._nested.append(0.0)  # pylint: disable=protected-access
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    seconds = time.perf_counter() - start
+    nested = profile._nested.pop()  # pylint: disable=protected-access
+    profile._nested[-1] += seconds  # pylint: disable=protected-access
+    profile.Add(name, seconds - nested, platform)
+
+
+class Report:
+  """The profiles of every file of a run.
+
+  Attributes:
+    profiles: list of FileProfile, in the order they were added.
+  """
+
+  def __init__(self):
+    self.profiles = []
+
+  def Add(self, profile):
+    self.profiles.append(profile)
+
+  def Totals(self):
+    """Returns the seconds spent in every phase over all files."""
+    totals = {}
+    for profile in self.profiles:
+      for phase, seconds in profile.phases.items():
+        totals[phase] = totals.get(phase, 0.0) + seconds
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+  def Save(self, report_file):
+    """Writes the report, as CSV if report_file ends in .csv, else as JSON.
+
+    Args:
+      report_file: path of the report.
+    """
+    report_file = pathlib.Path(report_file)
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    profiles = sorted(self.profiles, key=lambda profile: -profile.seconds)
+    if report_file.suffix == '.csv':
+      with open(report_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'phase', 'platform', 'seconds',
+                         'peak_memory'])
+        for profile in profiles:
+          writer.writerow([profile.name, 'total', '', '%.6f' % profile.seconds,
+                           profile.peak_memory or ''])
+          for phase, seconds in sorted(profile.phases.items()):
+            phase, _, platform = phase.partition(':')
+            writer.writerow([profile.name, phase, platform, '%.6f' % seconds,
+                             ''])
+    else:
+      with open(report_file, 'w') as f:
+        json.dump({'totals': self.Totals(),
+                   'files': [profile.ToDict() for profile in profiles]},
+                  f, indent=2)
+
+  def SaveSlowest(self, directory, count):
+    """Writes the cProfile statistics of the slowest files.
+
+    Every dump can be loaded with pstats.Stats(path).
+
+    Args:
+      directory: directory in which the dumps are written.
+      count: the number of files whose statistics are written.
+
+    Returns:
+      The list of paths written.
+    """
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    profiles = [profile for profile in self.profiles if profile.profile_data]
+    for profile in heapq.nlargest(count, profiles,
+                                  key=lambda profile: profile.seconds):
+      path = directory / (
+          profile.name.replace('/', '_').replace(':', '_') + '.prof')
+      path.write_bytes(profile.profile_data)
+      paths.append(path)
+    return paths
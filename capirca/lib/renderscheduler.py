@@ -0,0 +1,301 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Orders the render tasks of aclgen by their estimated cost.
+
+Renderers take the next task whenever they finish one, so the wall-clock time
+of a run is set by the tasks which are started last.  Tasks are therefore
+started largest first, and a policy which would take longer than its share of
+the run on its own is split into one task per platform.
+
+The cost of a task is the time it took in a previous run, as recorded in a
+small JSON stats file.  Policies without a recorded time are read and
+estimated from the number of term and address lines of every target, scaled
+to seconds by the policies whose time and lines were both recorded.  Other
+policies are only read when they are large enough to be split.  Every task of
+a split policy parses the whole policy, so splitting trades that repeated
+parse for a shorter run.  Renders by a single renderer are run in the order
+of their recorded times, without reading any policy.
+
+Sample usage:
+    stats = RenderStats('/tmp/aclgen-stats.json')
+    for task in Schedule(policy_files, base_directory, max_renderers, stats):
+      ... render task.policy_file for task.platforms and time it ...
+      stats.Record(task.name, seconds)
+    stats.Save()
+"""
+
+import collections
+import json
+import os
+import pathlib
+import re
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from absl import logging
+from capirca.lib import policy
+
+# Bump whenever the layout of the stats file changes.
+STATS_FORMAT_VERSION = 1
+
+_HEADER_RE = re.compile(r'\bheader\s*{')
+_TARGET_RE = re.compile(r'\btarget\s*::\s*(\S+)')
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+class RenderTask(NamedTuple):
+  """A policy, or some of its platforms, rendered by one renderer.
+
+  Attributes:
+    name: the name of the task in the stats file.
+    policy_file: path of the policy file.
+    platforms: the platforms to render, or None for all of them.
+    cost: the estimated render time in seconds, or in lines when no render
+      time is known at all.
+  """
+  name: str
+  policy_file: pathlib.Path
+  platforms: Optional[Tuple[str, ...]]
+  cost: float
+
+
+class RenderStats:
+  """Render times of the previous runs, by task name.
+
+  Attributes:
+    stats_file: pathlib.Path of the JSON stats file, or None to keep the
+      times in memory only.
+  """
+
+  def __init__(self, stats_file=None):
+    self.stats_file = pathlib.Path(stats_file) if stats_file else None
+    self._seconds = {}
+    self._lines = {}
+    self._split_seconds = None
+    if self.stats_file and self.stats_file.exists():
+      try:
+        data = json.loads(self.stats_file.read_text())
+        if data.get('version') == STATS_FORMAT_VERSION:
+          self._seconds = {name: float(seconds)
+                           for name, seconds in data['seconds'].items()}
+          self._lines = {name: int(lines)
+                         for name, lines in data.get('lines', {}).items()}
+      except (IOError, ValueError, KeyError, AttributeError) as e:
+        logging.warning('ignoring unreadable render stats %s: %s',
+                        self.stats_file, e)
+
+  def Get(self, name):
+    """Returns the recorded render time of a task, or None."""
+    return self._seconds.get(name)
+
+  def GetPolicy(self, name):
+    """Returns the recorded render time of a policy, or None.
+
+    The time of a policy split into a task per platform is the sum of the
+    times of its tasks.
+
+    Args:
+      name: the TaskName of the policy.
+    """
+    seconds = self._seconds.get(name)
+    if seconds is not None:
+      return seconds
+    if self._split_seconds is None:
+      self._split_seconds = collections.Counter()
+      for task_name, task_seconds in self._seconds.items():
+        policy_name, split, _ = task_name.rpartition(':')
+        if split:
+          self._split_seconds[policy_name] += task_seconds
+    return self._split_seconds.get(name)
+
+  def Record(self, name, seconds):
+    self._seconds[name] = seconds
+    self._split_seconds = None
+
+  def GetLines(self, name):
+    """Returns the recorded line count of a policy, or None."""
+    return self._lines.get(name)
+
+  def RecordLines(self, name, lines):
+    self._lines[name] = lines
+
+  def Save(self):
+    """Writes the render times to the stats file, if there is one."""
+    if not self.stats_file:
+      return
+    data = json.dumps({'version': STATS_FORMAT_VERSION,
+                       'seconds': self._seconds, 'lines': self._lines},
+                      indent=1, sort_keys=True)
+    self.stats_file.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=self.stats_file.parent,
+                                     prefix='.stats.')
+    try:
+      with os.fdopen(fd, 'w') as f:
+        f.write(data)
+      os.replace(temp_name, self.stats_file)
+    except IOError as e:
+      logging.warning('unable to write render stats %s: %s',
+                      self.stats_file, e)
+      if os.path.exists(temp_name):
+        os.unlink(temp_name)
+
+
+def PlatformCosts(policy_text):
+  """Estimates the relative cost of rendering every platform of a policy.
+
+  Generators do work for every term and address of the filters they render,
+  so the cost of a platform is the number of lines of the filters which
+  target it.
+
+  Args:
+    policy_text: the policy text, preferably with its includes expanded.
+
+  Returns:
+    A dict of platform name to number of lines.
+  """
+  costs = collections.Counter()
+  platforms = set()
+  lines = 0
+  for line in policy_text.splitlines():
+    line = line.split('#')[0]
+    if not line.strip():
+      continue
+    if _HEADER_RE.search(line):
+      for platform in platforms:
+        costs[platform] += lines
+      platforms = set()
+      lines = 0
+    platforms.update(_TARGET_RE.findall(line))
+    lines += 1
+  for platform in platforms:
+    costs[platform] += lines
+  return dict(costs)
+
+
+def _ReadPolicy(policy_file, base_directory):
+  """Returns the text of a policy with its includes expanded, if possible."""
+  try:
+    text = pathlib.Path(policy_file).read_text()
+  except IOError:
+    return ''
+  try:
+    return '\n'.join(policy._Preprocess(text, base_dir=base_directory))  # pylint: disable=protected-access
+  except policy.Error:
+    return text
+
+
+def _SplitCosts(policy_file, base_directory, groups):
+  """Returns the lines of every set of platforms a policy could be split in."""
+  split = collections.Counter()
+  for platform, lines in PlatformCosts(
+      _ReadPolicy(policy_file, base_directory)).items():
+    split[groups.get(platform, (platform,))] += lines
+  return split
+
+
+def TaskName(policy_file, base_directory, platform=None):
+  """Returns the stats name of a policy, or of some platforms of a policy."""
+  name = pathlib.Path(policy_file).relative_to(base_directory).as_posix()
+  if platform:
+    name = '%s:%s' % (name, platform)
+  return name
+
+
+def Schedule(policy_files, base_directory, max_renderers, stats,
+             shared_outputs=()) -> List[RenderTask]:
+  """Returns the render tasks of the policies, largest first.
+
+  Args:
+    policy_files: paths of the policy files to render.
+    base_directory: the base directory of the policies and their includes.
+    max_renderers: the number of renderers which run the tasks.
+    stats: RenderStats of the previous runs, to which the line counts of the
+      policies read are recorded.
+    shared_outputs: groups of platforms which write the same output files, and
+      so are never rendered by separate tasks.
+
+  Returns:
+    A list of RenderTask, in the order they should be started.
+  """
+  if max_renderers <= 1:
+    # A single renderer runs every task anyway, so only the recorded times,
+    # which rank the tasks worth profiling, are looked at.
+    tasks = []
+    for policy_file in policy_files:
+      name = TaskName(policy_file, base_directory)
+      tasks.append(RenderTask(name, policy_file, None,
+                              stats.GetPolicy(name) or 0.0))
+    tasks.sort(key=lambda task: (-task.cost, task.name))
+    return tasks
+
+  groups = {}
+  for group in shared_outputs:
+    for platform in group:
+      groups[platform] = tuple(sorted(group))
+
+  policies = []
+  for policy_file in policy_files:
+    name = TaskName(policy_file, base_directory)
+    seconds = stats.GetPolicy(name)
+    # The lines of every set of platforms the policy could be split into,
+    # only read here for the policies without a recorded time.
+    split = None
+    if seconds is None:
+      split = _SplitCosts(policy_file, base_directory, groups)
+      stats.RecordLines(name, sum(split.values()))
+    policies.append((name, policy_file, split, seconds))
+
+  # Lines are converted to seconds at the rate of the policies with a known
+  # render time and line count.
+  known_lines = 0
+  known_seconds = 0
+  for name, _, _, seconds in policies:
+    lines = stats.GetLines(name)
+    if seconds is not None and lines is not None:
+      known_lines += lines
+      known_seconds += seconds
+  scale = known_seconds / known_lines if known_lines and known_seconds else 1
+
+  estimates: Dict[str, float] = {}
+  for name, _, split, seconds in policies:
+    if seconds is None:
+      seconds = max(sum(split.values()), 1) * scale
+    estimates[name] = seconds
+  share = sum(estimates.values()) / max_renderers
+
+  tasks = []
+  for name, policy_file, split, _ in policies:
+    estimate = estimates[name]
+    if estimate > share and split is None:
+      split = _SplitCosts(policy_file, base_directory, groups)
+      stats.RecordLines(name, sum(split.values()))
+    # Every task of a split policy parses all of it, which is worth it for
+    # the policies which would otherwise outlast the rest of the run.
+    if estimate > share and len(split) > 1:
+      lines = sum(split.values()) or 1
+      for platforms, platform_lines in sorted(split.items()):
+        task_name = TaskName(policy_file, base_directory, '+'.join(platforms))
+        seconds = stats.Get(task_name)
+        if seconds is None:
+          seconds = estimate * platform_lines / lines
+        tasks.append(RenderTask(task_name, policy_file, platforms, seconds))
+    else:
+      tasks.append(RenderTask(name, policy_file, None, estimate))
+  tasks.sort(key=lambda task: (-task.cost, task.name))
+  return tasks
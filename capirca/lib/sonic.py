@@ -122,10 +122,10 @@ class Term(aclgenerator.Term):
           rule_dict[icmp_type_key] = str(icmp_type)
         for saddr in saddrs:
           if saddr:
-            rule_dict[src_ip_key] = str(saddr)
+            rule_dict[src_ip_key] = aclgenerator.AddressText(saddr)
           for daddr in daddrs:
             if daddr:
-              rule_dict[dst_ip_key] = str(daddr)
+              rule_dict[dst_ip_key] = aclgenerator.AddressText(daddr)
             for start, end in sports:
               if not start == end == 0:
                 if start == end:
@@ -176,6 +176,7 @@ class Term(aclgenerator.Term):
 class Sonic(aclgenerator.ACLGenerator):
   """A SONiC config_db ACL policy object."""
   _PLATFORM = 'sonic'
+  MUTATES_ADDRESSES = False
   SUFFIX = '.sonicacl'
   _SUPPORTED_AF = frozenset(('inet', 'inet6', 'mixed'))
   _rule_counter = 0
@@ -267,4 +268,4 @@ class Sonic(aclgenerator.ACLGenerator):
   # This is what actually "renders" the policy into vendor-specific
   # representation!
   def __str__(self):
-    return json.dumps(self.sonic_policy, indent=2, separators=(',', ': '))
+    return aclgenerator.DumpJson(self.sonic_policy)
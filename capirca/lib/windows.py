@@ -219,6 +219,7 @@ class WindowsGenerator(aclgenerator.ACLGenerator):
   """Generates filters and terms from provided policy object."""
 
   _PLATFORM = 'windows'
+  MUTATES_ADDRESSES = False
   _DEFAULT_PROTOCOL = 'all'
   SUFFIX = '.bat'
   _RENDER_PREFIX = None
@@ -14,7 +14,15 @@ defaults = {
     'ignore_directories': ['DEPRECATED', 'def'],
     'max_renderers': 10,
     'shade_check': False,
-    'exp_info': 2
+    'exp_info': 2,
+    'cache_directory': None,
+    'naming_cache': None,
+    'output_manifest': False,
+    'print_changed': False,
+    'stats_file': None,
+    'profile_report': None,
+    'profile_slowest': 0,
+    'changed_includes': None
 }
 
 
@@ -42,6 +50,14 @@ def flags_to_dict(absl_flags):
       'max_renderers': absl_flags.max_renderers,
       'shade_check': absl_flags.shade_check,
       'exp_info': absl_flags.exp_info,
+      'cache_directory': absl_flags.cache_directory,
+      'naming_cache': absl_flags.naming_cache,
+      'output_manifest': absl_flags.output_manifest,
+      'print_changed': absl_flags.print_changed,
+      'stats_file': absl_flags.stats_file,
+      'profile_report': absl_flags.profile_report,
+      'profile_slowest': absl_flags.profile_slowest,
+      'changed_includes': absl_flags.changed_includes,
   }
 
   return {
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
 import multiprocessing
 import os
 import pathlib
@@ -24,6 +25,10 @@ from absl import app
 from absl import flags
 from absl.testing import absltest
 from capirca import aclgen
+from capirca.lib import junipersrx
+from capirca.lib import naming
+from capirca.lib import policy
+from capirca.lib import renderscheduler
 
 FLAGS = flags.FLAGS
 aclgen.SetupFlags()  # Ensure flags are set up only once
@@ -120,6 +125,111 @@ class TestAclGenDemo(absltest.TestCase):
     mock_writer.assert_called_with(
         pathlib.Path(self.test_subdirectory, 'sample_cisco_lab.acl'), mock.ANY)
 
+  def test_files_written_as_policies_render(self):
+    output_directory = pathlib.Path(self.test_subdirectory, 'out')
+    stale = output_directory / 'sample_cisco_lab.acl'
+    output_directory.mkdir()
+    stale.write_text('stale')
+    stats_file = pathlib.Path(self.test_subdirectory, 'stats.json')
+    with mock.patch.object(
+        aclgen, 'WriteFiles', wraps=aclgen.WriteFiles) as mock_write:
+      aclgen.Run(
+          self.pol_dir,
+          self.def_dir,
+          None,
+          str(output_directory),
+          self.exp_info,
+          2,
+          self.ignore_directories,
+          None,
+          None,
+          self.context,
+          stats_file=str(stats_file),
+      )
+    # Each policy's changed files are written once it is rendered.
+    self.assertGreater(mock_write.call_count, 1)
+    self.assertNotEqual('stale', stale.read_text())
+    self.assertTrue((output_directory / 'sample_k8s.yml').is_file())
+    self.assertEqual([], list(output_directory.rglob('.*.tmp')))
+    # The render times are kept for the next run.
+    stats = renderscheduler.RenderStats(stats_file)
+    self.assertIsNotNone(stats.Get('pol/sample_k8s.pol'))
+
+  def test_failed_write_leaves_no_temp_file(self):
+    output_directory = pathlib.Path(self.test_subdirectory, 'out')
+    # A directory can not be replaced by the written file.
+    (output_directory / 'sample.acl').mkdir(parents=True)
+    with self.assertRaises(OSError):
+      aclgen.WriteFiles([(output_directory / 'sample.acl', 'acl')])
+    self.assertEqual([output_directory / 'sample.acl'],
+                     list(output_directory.iterdir()))
+
+  def test_interrupted_run_leaves_no_staged_files(self):
+    output_directory = pathlib.Path(self.test_subdirectory, 'out')
+    with mock.patch.object(aclgen, '_Write', side_effect=KeyboardInterrupt):
+      with self.assertRaises(KeyboardInterrupt):
+        aclgen.Run(self.pol_dir, self.def_dir, None, str(output_directory),
+                   self.exp_info, 2, self.ignore_directories, None, None,
+                   self.context)
+    self.assertEqual([], list(output_directory.iterdir()))
+
+  def test_output_manifest(self):
+    output_directory = pathlib.Path(self.test_subdirectory, 'out')
+    policy_file = os.path.join(self.pol_dir, 'pol', 'sample_cisco_lab.pol')
+    output_file = output_directory / 'sample_cisco_lab.acl'
+
+    def _Run():
+      with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+        aclgen.Run(self.pol_dir, self.def_dir, policy_file,
+                   str(output_directory), self.exp_info, 1,
+                   self.ignore_directories, None, None, self.context,
+                   output_manifest=True, print_changed=True)
+      return stdout.getvalue()
+
+    self.assertEqual('%s\n' % output_file, _Run())
+    self.assertTrue((output_directory / '.capirca-manifest.json').is_file())
+    # Unchanged outputs listed in the manifest are not read back.
+    with mock.patch.object(aclgen, 'FilesUpdated') as files_updated:
+      self.assertEqual('', _Run())
+    files_updated.assert_not_called()
+    # An output modified since it was recorded is read back.
+    output_file.write_text('changed')
+    self.assertEqual('%s\n' % output_file, _Run())
+
+  def test_streamed_output(self):
+    output_directory = pathlib.Path(self.test_subdirectory, 'out')
+    policy_file = pathlib.Path(self.pol_dir, 'pol', 'sample_srx.pol')
+    definitions = naming.Naming(self.def_dir)
+
+    def _Render():
+      write_files = []
+      aclgen.RenderFile(self.pol_dir, policy_file, output_directory,
+                        definitions, self.exp_info, False, False, write_files)
+      return write_files
+
+    write_files = _Render()
+    self.assertLen(write_files, 1)
+    output_file, staged = write_files[0]
+    self.assertIsInstance(staged, aclgen.StagedOutput)
+    aclgen.WriteFiles(write_files)
+    pol = policy.ParsePolicy(policy_file.read_text(), definitions,
+                             base_dir=self.pol_dir)
+    self.assertEqual(str(junipersrx.JuniperSRX(pol, self.exp_info)),
+                     output_file.read_text())
+    # An unchanged output is not kept.
+    self.assertEqual([], _Render())
+    self.assertEqual([output_file], list(output_directory.iterdir()))
+
+  def test_affected_policies(self):
+    include = os.path.join(self.pol_dir, 'includes',
+                           'untrusted-networks-blocking.inc')
+    affected = aclgen.AffectedPolicies(self.pol_dir, self.ignore_directories,
+                                       [include])
+    self.assertEqual(
+        [pathlib.Path(self.pol_dir, 'pol', f)
+         for f in ('sample_msmpc.pol', 'sample_multitarget.pol')],
+        affected)
+
   # Test to ensure existence of the entry point function for installed script.
   @mock.patch.object(aclgen, 'SetupFlags', autospec=True)
   @mock.patch.object(app, 'run', autospec=True)
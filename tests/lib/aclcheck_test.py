@@ -14,6 +14,8 @@
 
 """Unit tests for AclCheck."""
 
+import itertools
+
 from absl.testing import absltest
 
 from capirca.lib import aclcheck
@@ -57,6 +59,33 @@ term term-5 {
 }
 """
 
+MIXED_POLICYTEXT = """
+header {
+  target:: juniper first-filter
+}
+term v6-only {
+  source-address:: NET6
+  action:: accept
+}
+term split-networks {
+  destination-address:: NET10_SPLIT
+  protocol:: tcp udp
+  destination-port:: HIGH
+  action:: deny
+}
+term except-icmp {
+  protocol-except:: icmp
+  source-address:: NET172 NET10
+  action:: accept
+}
+header {
+  target:: juniper second-filter
+}
+term catch-all {
+  action:: reject
+}
+"""
+
 
 class AclCheckTest(absltest.TestCase):
 
@@ -147,6 +176,41 @@ class AclCheckTest(absltest.TestCase):
                       proto,
                       )
 
+  def testCompiledMatchesAclCheck(self):
+    self.defs.ParseServiceList(['HIGH = 1024-65535/tcp'])
+    self.defs.ParseNetworkList(['NET6 = 2001:db8::/32',
+                                'NET10_SPLIT = 10.0.0.0/10 10.192.0.0/10'])
+    for pol in (self.pol, policy.ParsePolicy(MIXED_POLICYTEXT, self.defs)):
+      compiled = aclcheck.CompiledPolicy(pol)
+      for flow in itertools.product(
+          ('any', '172.16.1.1', '10.2.2.10', '192.168.1.1', '2001:db8::1',
+           '10.0.0.0/8', '10.0.0.0/9', '172.16.0.0/16'),
+          ('any', '10.2.2.10', '10.200.0.1', '10.100.0.1', '10.0.0.0/8',
+           '10.0.0.0/10', '172.16.0.0/24'),
+          ('any', '1025'),
+          ('any', '22', '1024', '80'),
+          ('any', 'tcp', 'udp', 'icmp')):
+        expected = aclcheck.AclCheck(pol, *flow)
+        check = compiled.Check(*flow)
+        self.assertEqual(str(expected), str(check), flow)
+        self.assertEqual([str(match) for match in expected.ExactMatches()],
+                         [str(match) for match in check.ExactMatches()], flow)
+
+  def testCheckMany(self):
+    compiled = aclcheck.CompiledPolicy(self.pol)
+    checks = compiled.CheckMany([
+        {'src': '172.16.1.1', 'dst': '10.1.1.1', 'dport': '22',
+         'proto': 'tcp'},
+        ('10.1.1.1', '10.1.1.1', '1025', '53', 'udp'),
+        ('172.16.1.1', '10.1.1.1', 'any', '22', 'tcp'),
+    ])
+    self.assertEqual([['term-3'], ['term-4'], ['term-3']],
+                     [[match.term for match in check.ExactMatches()]
+                      for check in checks])
+    self.assertIs(checks[0], checks[2])
+    self.assertRaises(aclcheck.AddressError, compiled.CheckMany,
+                      [{'src': '300.400.500.600'}])
+
 
 if __name__ == '__main__':
   absltest.main()
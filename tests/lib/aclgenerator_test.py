@@ -14,11 +14,14 @@
 
 """Unittest for ACL rendering module."""
 
+import json
+
 from absl.testing import absltest
 from absl.testing import parameterized
 from unittest import mock
 
 from capirca.lib import aclgenerator
+from capirca.lib import nacaddr
 from capirca.lib import naming
 from capirca.lib import policy
 
@@ -217,6 +220,42 @@ class ACLGeneratorTest(parameterized.TestCase):
 
     self.assertListEqual(expected_protocol_list, retprotocol_list)
 
+  def testIterJoinedLines(self):
+    for lines in ([], [''], ['a'], ['a', ''], ['a', 'b\nc', '', 'd']):
+      self.assertEqual('\n'.join(lines),
+                       ''.join(aclgenerator.IterJoinedLines(lines)))
+    self.assertEqual(['a\n', 'b'],
+                     list(aclgenerator.IterJoinedLines(iter(['a', 'b']))))
+
+  def testAddressText(self):
+    addresses = [nacaddr.IP('10.0.0.0/8'), nacaddr.IP('2001:db8::/32'),
+                 nacaddr.IP('2001:db8:0:0::1/128'), nacaddr.IP('::/0')]
+    self.assertEqual([str(address) for address in addresses],
+                     aclgenerator.AddressTexts(addresses))
+    self.assertEqual([str(address) for address in addresses],
+                     aclgenerator.AddressTexts(addresses))
+    self.assertEqual('10.0.0.0/8',
+                     aclgenerator.AddressText(nacaddr.IP('10.0.0.0/8')))
+
+  @parameterized.named_parameters(
+      ('scalars', [1, 2.5, True, False, None, 'a', '\u00e9"\n']),
+      ('empty', {'a': [], 'b': {}, 'c': (), 'd': ''}),
+      ('nested', [{'b': ['x', 'y'], 'a': [{'c': 1}, ['z', 2]]}, {}]))
+  def testDumpJson(self, obj):
+    for sort_keys in (False, True):
+      self.assertEqual(
+          json.dumps(obj, indent=2, sort_keys=sort_keys,
+                     separators=(',', ': ')),
+          aclgenerator.DumpJson(obj, sort_keys=sort_keys))
+    self.assertEqual(json.dumps(obj, indent=4, separators=(', ', ': ')),
+                     aclgenerator.DumpJson(obj, indent=4,
+                                           separators=(', ', ': ')))
+
+  def testDumpJsonNonStringKeys(self):
+    obj = {1: 'a', 'b': {2: ['c'], None: True}}
+    self.assertEqual(json.dumps(obj, indent=2, separators=(',', ': ')),
+                     aclgenerator.DumpJson(obj))
+
   def testAddRepositoryTags(self):
     # Format print the '$' into the RCS tags in order prevent the tags from
     # being interpolated here.
@@ -0,0 +1,63 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the benchmark tool."""
+
+import random
+
+from absl.testing import absltest
+
+from capirca.lib import generators
+from tools import benchmark
+
+_TINY = benchmark.Scale(1, 4, 2, 2, 2)
+
+
+class BenchmarkTest(absltest.TestCase):
+
+  def testSyntheticInputIsReproducible(self):
+    first = benchmark.BuildDefinitions(_TINY, random.Random(1))
+    second = benchmark.BuildDefinitions(_TINY, random.Random(1))
+    self.assertEqual(first, second)
+    self.assertTrue(all(token.startswith('GROUP1_')
+                        for token in first.sources))
+    self.assertTrue(all(token.startswith('NET_')
+                        for token in first.destinations))
+
+  def testTargetsCoverEveryGenerator(self):
+    self.assertEqual(sorted(generators.BUILTIN_PLATFORMS),
+                     sorted(benchmark._TARGETS))
+
+  def testRunScale(self):
+    results = benchmark.RunScale('tiny', _TINY, repeat=1,
+                                 selected='parse|collapse|generator:juniper$')
+    self.assertEqual(
+        ['tiny/collapse_addr_list', 'tiny/generator:juniper',
+         'tiny/parse_policy', 'tiny/parse_policy_optimized'],
+        sorted(results))
+    for times in results.values():
+      self.assertLessEqual(times['min'], times['median'])
+
+  def testCompare(self):
+    baseline = {'results': {'a': {'min': 1.0}, 'b': {'min': 1.0},
+                            'c': {'error': 'failed'}}}
+    results = {'results': {'a': {'min': 1.05}, 'b': {'min': 1.5},
+                           'c': {'min': 1.0}, 'd': {'min': 1.0}}}
+    self.assertEqual(
+        [('a', 1.0, 1.05, 1.05, False), ('b', 1.0, 1.5, 1.5, True)],
+        benchmark.Compare(baseline, results, 0.1))
+
+
+if __name__ == '__main__':
+  absltest.main()
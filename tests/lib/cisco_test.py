@@ -703,6 +703,43 @@ class CiscoTest(absltest.TestCase):
     )
     self.naming.GetServiceByProto.assert_called_once_with('HTTP', 'tcp')
 
+  def testObjectGroupsDefinedOncePerPolicy(self):
+    self.naming.GetNetAddr.return_value = [
+        nacaddr.IP('10.0.0.0/8', token='SOME_HOST')
+    ]
+    self.naming.GetServiceByProto.return_value = ['80']
+
+    pol = policy.ParsePolicy(
+        GOOD_OBJGRP_HEADER_1 + GOOD_TERM_2 +
+        GOOD_OBJGRP_HEADER_1.replace('objgroupheader', 'objgroupheader2') +
+        GOOD_TERM_2, self.naming)
+    acl = str(cisco.Cisco(pol, EXP_INFO))
+    self.assertEqual(1, acl.count('object-group network ipv4 SOME_HOST\n'))
+    self.assertEqual(1, acl.count('object-group port 80-80\n'))
+    self.assertEqual(2, acl.count('net-group SOME_HOST port-group'))
+
+  def testObjectGroupRegistry(self):
+    registry = cisco.ObjectGroupRegistry()
+    host = [nacaddr.IP('10.0.0.0/8', token='SOME_HOST')]
+    self.assertEqual(
+        ('SOME_HOST',
+         ['object-group network ipv4 SOME_HOST', ' 10.0.0.0/8', 'exit\n']),
+        registry.Network('SOME_HOST', 4, host))
+    self.assertEqual(('SOME_HOST', None),
+                     registry.Network('SOME_HOST', 4, host))
+    # The name is taken by other addresses.
+    handle, lines = registry.Network(
+        'SOME_HOST', 4, [nacaddr.IP('10.1.0.0/16', token='SOME_HOST')])
+    self.assertRegex(handle, r'^SOME_HOST-[0-9a-f]{8}$')
+    self.assertEqual('object-group network ipv4 %s' % handle, lines[0])
+    # Identical addresses are only shared when interned.
+    self.assertEqual(('SOME_HOST', None),
+                     registry.Network('OTHER_HOST', 4, host, intern=True))
+    self.assertEqual('OTHER_HOST', registry.Network('OTHER_HOST', 4, host)[0])
+    self.assertEqual(['object-group port 80-80', ' eq 80', 'exit\n'],
+                     registry.Port((80, 80)))
+    self.assertIsNone(registry.Port((80, 80)))
+
   @mock.patch.object(cisco.logging, 'debug')
   def testObjectGroupIcmpv6InetMismatch(self, mock_debug):
     acl = cisco.Cisco(
@@ -0,0 +1,126 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for flowreplay.py module."""
+
+import io
+import json
+import multiprocessing
+import pathlib
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca.lib import flowreplay
+
+POLICY = """
+header {
+  target:: juniper test-filter
+}
+term allow-ssh {
+  destination-address:: NET10
+  destination-port:: SSH
+  protocol:: tcp
+  action:: accept
+}
+term allow-established {
+  option:: tcp-established
+  protocol:: tcp
+  action:: accept
+}
+term deny-all {
+  action:: deny
+}
+"""
+
+FLOWS = [
+    ('10.0.0.1', '10.1.1.1', '1025', '22', 'tcp'),
+    ('10.0.0.1', '10.1.1.1', '1025', '22', 'tcp'),
+    ('10.0.0.1', '192.168.1.1', 'any', '443', 'tcp'),
+    ('10.0.0.1', '192.168.1.1', 'any', '53', 'udp'),
+    ('not-an-address', 'any', 'any', 'any', 'any'),
+]
+
+
+class FlowReplayTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.def_dir = pathlib.Path(temp_dir.name)
+    (self.def_dir / 'NETWORK.net').write_text('NET10 = 10.0.0.0/8\n')
+    (self.def_dir / 'SERVICES.svc').write_text('SSH = 22/tcp\n')
+
+  def testReadFlows(self):
+    csv_flows = io.StringIO('src,dst,dport,proto\n10.0.0.1,10.1.1.1,22,tcp\n')
+    self.assertEqual([('10.0.0.1', '10.1.1.1', 'any', '22', 'tcp')],
+                     list(flowreplay.ReadFlows(csv_flows)))
+    jsonl_flows = io.StringIO('{"src": "10.0.0.1", "dport": 22}\n\n'
+                              '{"proto": "udp"}\n')
+    self.assertEqual([('10.0.0.1', 'any', 'any', '22', 'any'),
+                      ('any', 'any', 'any', 'any', 'udp')],
+                     list(flowreplay.ReadFlows(jsonl_flows)))
+    with self.assertRaises(flowreplay.FlowFormatError):
+      list(flowreplay.ReadFlows(io.StringIO('{"src": \n')))
+
+  def testCheckFlows(self):
+    _, compiled = flowreplay.Compile(str(self.def_dir), POLICY)
+    lines, hits = flowreplay.CheckFlows(compiled, FLOWS)
+    verdicts = [json.loads(line) for line in lines]
+    self.assertEqual(
+        [('allow-ssh', True)],
+        [(m['term'], m['exact']) for m in verdicts[0]['matches']])
+    self.assertEqual(verdicts[0], verdicts[1])
+    self.assertEqual(
+        [('allow-established', ['tcp-est'], False), ('deny-all', [], True)],
+        [(m['term'], m['possibles'], m['exact'])
+         for m in verdicts[2]['matches']])
+    self.assertIn('error', verdicts[4])
+    self.assertEqual((5, 1), (hits.flows, hits.errors))
+    self.assertEqual(
+        {('test-filter', 'allow-ssh', 'accept'): [2, 2, 0],
+         ('test-filter', 'allow-established', 'accept'): [1, 0, 1],
+         ('test-filter', 'deny-all', 'deny'): [2, 2, 0]},
+        hits.terms)
+
+  def testReplayAcrossProcesses(self):
+    results = {}
+    # Forked workers inherit the compiled policy, spawned ones load the
+    # definitions from a naming snapshot.
+    for processes, start_method in ((1, None), (2, 'fork'), (2, 'spawn')):
+      lines = []
+      hits = flowreplay.HitCounts()
+      with mock.patch.object(
+          flowreplay.multiprocessing, 'get_context',
+          return_value=multiprocessing.get_context(start_method)):
+        for chunk_lines, chunk_hits in flowreplay.Replay(
+            str(self.def_dir), POLICY, iter(FLOWS), processes=processes,
+            chunk_size=2):
+          lines.extend(chunk_lines)
+          hits.Merge(chunk_hits)
+      out = io.StringIO()
+      hits.Save(out)
+      results[start_method] = (lines, out.getvalue())
+    self.assertEqual(results[None], results['fork'])
+    self.assertEqual(results[None], results['spawn'])
+    self.assertIsNone(flowreplay._COMPILED)
+    self.assertLen(results[None][0], len(FLOWS))
+    self.assertEqual('filter,term,action,matches,exact,possible',
+                     results[None][1].splitlines()[0])
+
+
+if __name__ == '__main__':
+  absltest.main()
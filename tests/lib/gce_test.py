@@ -60,6 +60,13 @@ header {
 }
 """
 
+GOOD_HEADER_PACK = """
+header {
+  comment:: "The general policy comment."
+  target:: gce INGRESS global/networks/default pack
+}
+"""
+
 GOOD_HEADER_INET = """
 header {
   comment:: "The general policy comment."
@@ -1692,6 +1699,35 @@ class GCETest(parameterized.TestCase):
     acl = gce.GCE(pol, EXP_INFO)
     self.assertIsNotNone(str(acl))
 
+  def testPackRules(self):
+    self.naming.GetNetAddr.side_effect = [
+        [nacaddr.IP('10.2.3.4/32')], [nacaddr.IP('10.2.3.9/32')],
+        [nacaddr.IP('10.2.3.4/32'), nacaddr.IP('10.2.3.9/32')],
+        [nacaddr.IP('10.2.3.6/32')]]
+    self.naming.GetServiceByProto.side_effect = [['53'], ['53'], ['22'],
+                                                 ['53']]
+    terms = (GOOD_TERM.replace('udp tcp', 'tcp') +
+             GOOD_TERM.replace('udp tcp', 'tcp').replace('-1 {', '-2 {') +
+             GOOD_TERM.replace('udp tcp', 'tcp').replace('-1 {', '-3 {') +
+             GOOD_TERM.replace('udp tcp', 'tcp').replace('-1 {', '-4 {')
+             .replace('accept', 'deny'))
+    acl = gce.GCE(policy.ParsePolicy(GOOD_HEADER_PACK + terms, self.naming),
+                  EXP_INFO)
+
+    # The addresses of the first two terms are merged, then the ports of the
+    # third term, which has the same addresses.
+    self.assertEqual(
+        [{'name': 'default-good-term-1',
+          'sourceRanges': ['10.2.3.4/32', '10.2.3.9/32'],
+          'allowed': [{'IPProtocol': 'tcp', 'ports': ['53']},
+                      {'IPProtocol': 'tcp', 'ports': ['22']}]},
+         {'name': 'default-good-term-4',
+          'sourceRanges': ['10.2.3.6/32'],
+          'denied': [{'IPProtocol': 'tcp', 'ports': ['53']}]}],
+        [{key: rule[key] for key in
+          ('name', 'sourceRanges', 'allowed', 'denied') if key in rule}
+         for rule in acl.gce_policies])
+
   @parameterized.named_parameters(('1 ip, 2 ports', {
       'sourceRanges': ['10.128.0.0/10'],
       'allowed': [{
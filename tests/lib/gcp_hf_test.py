@@ -25,6 +25,13 @@ header {
 }
 """
 
+HEADER_OPTION_PACK = """
+header {
+  comment:: "The general policy comment."
+  target:: gcp_hf displayname pack 1000
+}
+"""
+
 HEADER_OPTION_EGRESS = """
 header {
   comment:: "The general policy comment."
@@ -3425,6 +3432,41 @@ class GcpHfTest(parameterized.TestCase):
     expected = json.loads(EXPECTED_EGRESS_CHUNKED_BETA)
     self.assertEqual(expected, json.loads(self._StripAclHeaders(str(acl))))
 
+  def testPackRules(self):
+    """Test that the pack option merges rules into fewer, cheaper rules."""
+    self.naming.GetNetAddr.side_effect = [
+        MANY_IPS, [nacaddr.IP('10.0.2.1')], TEST_IP, [nacaddr.IP('10.0.3.1')]]
+    self.naming.GetServiceByProto.side_effect = [['80'], ['80'], ['80'],
+                                                 ['80']]
+    term_deny = """
+term deny-traffic-to-port {
+  comment:: "Generic description"
+  source-address:: PUBLIC_NAT
+  protocol:: tcp
+  destination-port:: PORT
+  action:: deny
+}
+"""
+    pol = policy.ParsePolicy(
+        HEADER_OPTION_PACK + TERM_ALLOW_PORT +
+        TERM_ALLOW_PORT.replace('port {', 'port-2 {') + term_deny +
+        TERM_ALLOW_PORT.replace('port {', 'port-3 {'), self.naming)
+    rules = gcp_hf.HierarchicalFirewall(pol, EXP_INFO).policies[0]['rules']
+
+    # The 259 addresses of the first two terms take two rules instead of three,
+    # while the deny keeps the last term apart.
+    self.assertEqual([1, 2, 3, 4], [rule['priority'] for rule in rules])
+    self.assertEqual(['goto_next', 'goto_next', 'deny', 'goto_next'],
+                     [rule['action'] for rule in rules])
+    self.assertLen(rules[0]['match']['srcIpRanges'], 256)
+    self.assertEqual(
+        sorted(str(ip) for ip in MANY_IPS + [nacaddr.IP('10.0.2.1')]),
+        sorted(rules[0]['match']['srcIpRanges'] +
+               rules[1]['match']['srcIpRanges']))
+    self.assertEqual(['10.0.3.1/32'], rules[3]['match']['srcIpRanges'])
+    self.assertEqual(
+        269, sum(gcp_hf.GetRuleTupleCount(rule, 'ga') for rule in rules))
+
   @parameterized.named_parameters(
       ('1 ip, 2 protocols',
        {'match': {
@@ -7,6 +7,7 @@ from absl.testing import absltest
 from absl.testing import parameterized
 
 from capirca.lib import gcp
+from capirca.lib import nacaddr
 
 
 class HelperFunctionsTest(parameterized.TestCase):
@@ -57,6 +58,10 @@ class HelperFunctionsTest(parameterized.TestCase):
       ('ipv6_wildcard', ['::/0'], ['::/0']))
   def testFilterIPv4InIPv6FormatAddrs(self, addrs, expected):
     self.assertEqual(expected, gcp.FilterIPv4InIPv6FormatAddrs(addrs))
+    self.assertEqual(
+        expected,
+        [str(addr) for addr in gcp.FilterIPv4InIPv6FormatAddrs(
+            [nacaddr.IP(addr) for addr in addrs])])
     with self.assertRaises(ValueError):
       gcp.FilterIPv4InIPv6FormatAddrs(['dshjgsjfhgsd'])
 
@@ -0,0 +1,96 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for generators.py module."""
+
+import subprocess
+import sys
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca.lib import aclgenerator
+from capirca.lib import generators
+from capirca.lib import juniper
+
+
+class FakeEntryPoint:
+
+  def __init__(self, name, value):
+    self.name = name
+    self.value = value
+
+
+class GeneratorsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    patcher = mock.patch.object(generators, '_entry_points_loaded', False)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def testBuiltinPlugins(self):
+    for plugin in generators.ForPlatforms(generators.BUILTIN_PLATFORMS):
+      generator = plugin.Load()
+      self.assertTrue(issubclass(generator, aclgenerator.ACLGenerator))
+      if plugin.platform != 'sonic':
+        for suffix in plugin.Suffixes():
+          self.assertTrue(suffix.endswith(generator.SUFFIX), plugin)
+
+  def testForPlatformsKeepsRenderOrder(self):
+    self.assertEqual(
+        ['juniper', 'cisco', 'pcap'],
+        [plugin.platform for plugin in
+         generators.ForPlatforms(['pcap', 'unknown', 'cisco', 'juniper'])])
+
+  def testEntryPoints(self):
+    entry_points = [
+        FakeEntryPoint('fakejuniper', 'capirca.lib.juniper:Juniper'),
+        FakeEntryPoint('cisco', 'somewhere.else:Cisco'),
+        FakeEntryPoint('broken', 'capirca.lib.juniper:Missing'),
+    ]
+    for entry_point in entry_points[::2]:
+      self.addCleanup(generators.Unregister, entry_point.name)
+    with mock.patch.object(generators, '_EntryPoints',
+                           return_value=entry_points) as read:
+      self.assertEqual('capirca.lib.cisco:Cisco',
+                       generators.Get('cisco').target)
+      read.assert_not_called()
+      self.assertIs(juniper.Juniper, generators.Get('fakejuniper').Load())
+      self.assertRaises(generators.PluginLoadError,
+                        generators.Get('broken').Load)
+      self.assertRaises(generators.UnknownPlatformError, generators.Get,
+                        'unknown')
+      read.assert_called_once()
+
+  def testRegister(self):
+    self.addCleanup(generators.Unregister, 'extra')
+    generators.Register('extra', 'capirca.lib.juniper:Juniper',
+                        (generators.Output('.extra'),))
+    self.assertEqual(['.extra'], generators.Get('extra').Suffixes())
+    self.assertRaises(generators.Error, generators.Register, 'extra',
+                      'capirca.lib.cisco:Cisco')
+    self.assertRaises(generators.Error, generators.Unregister, 'juniper')
+
+  def testAclgenImportsNoGenerator(self):
+    modules = subprocess.run(
+        [sys.executable, '-c',
+         'import sys; from capirca import aclgen; print(sorted(sys.modules))'],
+        check=True, capture_output=True, text=True).stdout
+    self.assertNotIn('capirca.lib.juniper', modules)
+    self.assertNotIn('capirca.lib.cisco', modules)
+
+
+if __name__ == '__main__':
+  absltest.main()
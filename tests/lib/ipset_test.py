@@ -324,6 +324,14 @@ class IpsetTest(absltest.TestCase):
     self.assertIn('create -exist', str(acl))
     self.assertIn('add -exist', str(acl))
 
+  def testIterLines(self):
+    self.naming.GetNetAddr.return_value = [nacaddr.IPv4('10.0.0.0/8')]
+    pol = policy.ParsePolicy(GOOD_HEADER_1 + GOOD_TERM_1, self.naming)
+    acl = ipset.Ipset(pol, EXP_INFO)
+    lines = list(acl.IterLines())
+    self.assertEqual(ipset.Ipset._MARKER_BEGIN + '\n', lines[0])
+    self.assertEqual(str(ipset.Ipset(pol, EXP_INFO)), ''.join(lines))
+
 
 if __name__ == '__main__':
   absltest.main()
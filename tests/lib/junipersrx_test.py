@@ -1966,6 +1966,24 @@ class JuniperSRXTest(absltest.TestCase):
     pattern = re.compile(r'delete: applications;')
     self.assertTrue(pattern.search(str(''.join(output))), ''.join(output))
 
+  def testAddressBook(self):
+    book = junipersrx.AddressBook()
+    for ip in ['10.0.1.0/24', '10.0.2.0/24', '2001:db8::/48', '10.0.1.0/25',
+               '10.0.0.0/16', '10.0.1.0/24', '192.168.0.0/24', '10.0.0.0/8',
+               '2001:db8::/32']:
+      address = nacaddr.IP(ip)
+      address.parent_token = 'NET'
+      book.Add(address)
+    # 10.0.0.0/16 replaces the first address it contains, and 10.0.0.0/8
+    # the copies of 10.0.0.0/16.
+    self.assertEqual(
+        ['10.0.0.0/8', '10.0.2.0/24', '2001:db8::/32', '192.168.0.0/24'],
+        [str(ip) for ip in book['NET']])
+    self.assertEqual(
+        ['10.0.0.0/8', '192.168.0.0/24', '2001:db8::/32'],
+        [str(ip) for ip in book.Collapsed('NET')])
+    self.assertEqual(['NET'], list(book))
+
 
 if __name__ == '__main__':
   absltest.main()
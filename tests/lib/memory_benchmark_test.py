@@ -0,0 +1,79 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unit tests for the memory benchmark tool."""
+
+import io
+import json
+import pathlib
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from tools import memory_benchmark
+
+POLICY = """
+header {
+  target:: juniper test-filter
+}
+term allow-ssh {
+  source-address:: NET10
+  destination-address:: NET10 NET192
+  destination-port:: SSH
+  protocol:: tcp
+  action:: accept
+}
+term deny-all {
+  action:: deny
+}
+"""
+
+
+class MemoryBenchmarkTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.base_dir = pathlib.Path(temp_dir.name, 'policies')
+    self.def_dir = pathlib.Path(temp_dir.name, 'def')
+    (self.base_dir / 'pol').mkdir(parents=True)
+    self.def_dir.mkdir()
+    (self.def_dir / 'NETWORK.net').write_text(
+        'NET10 = 10.0.0.0/8\nNET192 = 192.168.0.0/16\n')
+    (self.def_dir / 'SERVICES.svc').write_text('SSH = 22/tcp\n')
+    (self.base_dir / 'pol' / 'good.pol').write_text(POLICY)
+    (self.base_dir / 'pol' / 'bad.pol').write_text(
+        POLICY.replace('NET10', 'UNDEFINED'))
+
+  def testMeasure(self):
+    report = memory_benchmark.Measure(str(self.base_dir), str(self.def_dir))
+    # The policy which fails to parse is skipped.
+    self.assertEqual(1, report['policies'])
+    self.assertEqual(2, report['terms'])
+    self.assertEqual(3, report['addresses'])
+    for key in ('policy_bytes', 'bytes_per_term', 'bytes_per_address'):
+      self.assertGreater(report[key], 0)
+
+  def testMainJson(self):
+    with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+      memory_benchmark.main([
+          'memory_benchmark.py', '--base_directory', str(self.base_dir),
+          '--definitions_directory', str(self.def_dir), '--json'])
+    self.assertEqual(1, json.loads(stdout.getvalue())['policies'])
+
+
+if __name__ == '__main__':
+  absltest.main()
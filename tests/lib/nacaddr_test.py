@@ -14,6 +14,8 @@
 
 """Unittest for nacaddr.py module."""
 
+import ipaddress
+
 from absl.testing import absltest
 
 from capirca.lib import nacaddr
@@ -274,6 +276,78 @@ class NacaddrUnitTest(absltest.TestCase):
       self.assertEqual(nacaddr.CollapseAddrList(addresses,
                                                 complement_addresses), result)
 
+  def testCollapseAddrListKeepsInputComments(self):
+    supernet = nacaddr.IPv4('10.0.0.0/8', comment='super')
+    subnet = nacaddr.IPv4('10.1.0.0/16', comment='sub')
+    collapsed = nacaddr.CollapseAddrList([supernet, subnet])
+    self.assertEqual(['super, sub'], [x.text for x in collapsed])
+    self.assertEqual('super', supernet.text)
+    self.assertEqual('sub', subnet.text)
+
+  def testCollapseMixedVersionsWithComplements(self):
+    addresses = [nacaddr.IPv4('10.0.0.0/8'), nacaddr.IPv6('2001:db8::/32')]
+    self.assertEqual(
+        addresses,
+        nacaddr.CollapseAddrList(addresses, [nacaddr.IPv6('2001:db8::/33')]))
+
+  def testCollapseMergedComments(self):
+    collapsed = nacaddr.CollapseAddrList([
+        nacaddr.IPv4('10.0.0.0/25', comment='low', token='LOW'),
+        nacaddr.IPv4('10.0.0.128/25', comment='high', token='HIGH'),
+        nacaddr.IPv4('10.0.0.64/26', comment='inner')])
+    self.assertEqual([nacaddr.IPv4('10.0.0.0/24')], collapsed)
+    self.assertEqual('low, inner, high', collapsed[0].text)
+    self.assertEqual(('LOW', 'LOW'),
+                     (collapsed[0].token, collapsed[0].parent_token))
+
+  def testCollapseAddrListPreserveTokensDropsContainedGroups(self):
+    addr_list = [nacaddr.IPv4('172.16.0.0/24', token='A'),
+                 nacaddr.IPv4('10.0.0.0/25', token='B'),
+                 nacaddr.IPv4('10.0.1.0/24', token='B'),
+                 nacaddr.IPv4('10.0.0.0/16', token='C'),
+                 nacaddr.IPv4('192.168.0.0/24', token='D')]
+    self.assertEqual([nacaddr.IPv4('172.16.0.0/24'),
+                      nacaddr.IPv4('10.0.0.0/16'),
+                      nacaddr.IPv4('192.168.0.0/24')],
+                     nacaddr.CollapseAddrListPreserveTokens(addr_list))
+
+  def testAddressSet(self):
+    addresses = nacaddr.AddressSet([nacaddr.IPv4('10.0.0.0/25'),
+                                    nacaddr.IPv4('10.0.0.128/25'),
+                                    nacaddr.IPv4('10.0.2.0/24'),
+                                    nacaddr.IPv6('::/1')])
+    self.assertIn(nacaddr.IPv4('10.0.0.0/24'), addresses)
+    self.assertNotIn(nacaddr.IPv4('10.0.0.0/22'), addresses)
+    self.assertNotIn(nacaddr.IPv6('8000::/1'), addresses)
+    self.assertTrue(addresses.Overlaps(nacaddr.IPv4('10.0.0.0/22')))
+    self.assertFalse(addresses.Overlaps(nacaddr.IPv4('10.0.1.0/24')))
+    self.assertEqual([nacaddr.IPv4('10.0.0.0/24'),
+                      nacaddr.IPv4('10.0.2.0/24'),
+                      nacaddr.IPv6('::/1')], addresses.Addresses())
+    self.assertEqual(
+        nacaddr.AddressSet([nacaddr.IPv4('10.0.0.0/24')]),
+        nacaddr.AddressSet([nacaddr.IPv4('10.0.0.0/25'),
+                            nacaddr.IPv4('10.0.0.128/25')]))
+
+  def testAddressSetSubtract(self):
+    excluded = nacaddr.AddressSet([nacaddr.IPv4('10.0.0.0/26'),
+                                   nacaddr.IPv4('10.0.0.128/26')])
+    supernet = nacaddr.IPv4('10.0.0.0/24', comment='kept')
+    self.assertEqual([nacaddr.IPv4('10.0.0.64/26'),
+                      nacaddr.IPv4('10.0.0.192/26')],
+                     excluded.Subtract(supernet))
+    other = nacaddr.IPv4('10.0.1.0/24', comment='kept')
+    self.assertIs(other, excluded.Subtract(other)[0])
+    self.assertEqual([], excluded.Subtract(nacaddr.IPv4('10.0.0.0/27')))
+
+  def testBroadcastAddressAndHostmask(self):
+    for addr in (nacaddr.IPv4('10.0.0.0/22'), nacaddr.IPv6('2001:db8::/33')):
+      network = ipaddress.ip_network(str(addr))
+      self.assertEqual(network.broadcast_address, addr.broadcast_address)
+      self.assertEqual(network.hostmask, addr.hostmask)
+      # Cached in a slot instead of an instance dictionary.
+      self.assertNotIn('broadcast_address', addr.__dict__)
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -14,12 +14,24 @@
 
 """Unittest for naming.py module."""
 
+import multiprocessing
+import pathlib
+import tempfile
+from unittest import mock
+
 from absl.testing import absltest
 
 from capirca.lib import nacaddr
 from capirca.lib import naming
 
 
+def _ParseInWorker(def_dir):
+  """Returns the services of a directory, as parsed in a pool worker."""
+  with mock.patch.object(naming, '_PARALLEL_PARSE_BYTES', 0):
+    defs = naming.Naming(def_dir, processes=4)
+  return [(token, unit.items) for token, unit in defs.services.items()]
+
+
 class NamingUnitTest(absltest.TestCase):
   """Unit Test for naming.py.
 
@@ -145,6 +157,22 @@ class NamingUnitTest(absltest.TestCase):
     self.assertListEqual(self.defs.GetIpParents('10.11.12.13/32'),
                          ['BING', 'NET1', 'NET2'])
 
+  def testGetIpParentsByToken(self):
+    self.assertListEqual(self.defs.GetIpParents('NET1'), ['BING', 'NET2'])
+    self.assertListEqual(
+        self.defs.GetIpParents(nacaddr.IPv4('10.1.2.0/24')),
+        ['BING', 'NET1', 'NET2'])
+    self.assertListEqual(self.defs.GetIpParents('192.168.0.1'), [])
+
+  def testParentIndexInvalidation(self):
+    self.assertListEqual(self.defs.GetIpParents('192.168.0.1'), [])
+    self.assertListEqual(self.defs.GetServiceParents('SVC6'), [])
+    self.defs.ParseNetworkList(['NET3 = 192.168.0.0/16', 'NET4 = NET3'])
+    self.defs.ParseServiceList(['SVC7 = SVC6'])
+    self.assertListEqual(self.defs.GetIpParents('192.168.0.1'),
+                         ['NET3', 'NET4'])
+    self.assertListEqual(self.defs.GetServiceParents('SVC6'), ['SVC7'])
+
   def testUndefinedTokenNesting(self):
     bad_servicedata = ['FOO = 7/tcp BAR']
     bad_networkdata = ['NETGROUP = 10.0.0.0/8 FOOBAR']
@@ -190,6 +218,89 @@ class NamingUnitTest(absltest.TestCase):
   def testGetNetChildrenNoChild(self):
     self.assertEqual([], self.defs.GetNetChildren('NET1'))
 
+  def testGetNetReturnsCopies(self):
+    first = self.defs.GetNet('NET2')
+    first[0].text = 'changed'
+    first[1].parent_token = 'changed'
+    second = self.defs.GetNet('NET2')
+    self.assertEqual('network2.0', second[0].text)
+    self.assertEqual('NET2', second[1].parent_token)
+    self.assertEqual('NET1', self.defs.GetNet('NET1')[0].parent_token)
+
+  def testExpansionCacheInvalidation(self):
+    self.defs.ParseServiceList(['SVC7 = 91/tcp'])
+    self.assertEqual(['91/tcp'], self.defs.GetService('SVC7'))
+    # Continuation lines extend the most recently defined token.
+    self.defs.ParseServiceList(['        92/tcp'])
+    self.assertEqual(['91/tcp', '92/tcp'], self.defs.GetService('SVC7'))
+    self.defs.ParseNetworkList(['NET9 = NET1'])
+    self.assertLen(self.defs.GetNet('NET9'), 1)
+    self.defs.ParseNetworkList(['       192.168.0.0/16'])
+    self.assertLen(self.defs.GetNet('NET9'), 2)
+
+  @mock.patch.object(naming, '_PARALLEL_PARSE_BYTES', 0)
+  def testParallelParse(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    def_dir = pathlib.Path(temp_dir.name)
+    (def_dir / 'A.svc').write_text('SVC1 = 80/tcp\nSVC2 = SVC1 SVC3\n')
+    (def_dir / 'B.svc').write_text('         81/tcp\nSVC3 = 82/tcp\n')
+    (def_dir / 'A.net').write_text('NET1 = 10.0.0.0/8\n')
+    (def_dir / 'B.net').write_text('NET2 = NET1 # comment\n')
+
+    def _Parse(processes):
+      try:
+        defs = naming.Naming(str(def_dir), processes=processes)
+      except naming.Error as e:
+        return type(e), str(e)
+      return ([(token, unit.items) for token, unit in defs.services.items()],
+              [(token, unit.items) for token, unit in defs.networks.items()])
+
+    sequential = _Parse(1)
+    self.assertLen(sequential[0], 3)
+    self.assertEqual(sequential, _Parse(4))
+    (def_dir / 'B.net').write_text('NET2 = NET1\nNET1 = 10.0.0.0/8\n')
+    self.assertEqual(naming.NamespaceCollisionError, _Parse(1)[0])
+    self.assertEqual(_Parse(1), _Parse(4))
+    (def_dir / 'B.net').write_text('NET2 = NET3\n')
+    self.assertEqual(naming.UndefinedAddressError, _Parse(1)[0])
+    self.assertEqual(_Parse(1), _Parse(4))
+
+  @mock.patch.object(naming, '_PARALLEL_PARSE_BYTES', 0)
+  def testParallelParseOnlyWhenAsked(self):
+    with mock.patch.object(naming.multiprocessing, 'get_context') as context:
+      defs = naming.Naming(self._WriteDefinitions())
+    context.assert_not_called()
+    self.assertEqual(['NET1', 'NET2'], sorted(defs.networks))
+
+  @mock.patch.object(naming, '_PARALLEL_PARSE_BYTES', 0)
+  def testParallelParseWithoutParentProcess(self):
+    # Python before 3.8 has no multiprocessing.parent_process().
+    parent_process = multiprocessing.parent_process
+    del multiprocessing.parent_process
+    self.addCleanup(setattr, multiprocessing, 'parent_process', parent_process)
+    defs = naming.Naming(self._WriteDefinitions(), processes=4)
+    self.assertEqual(['NET1', 'NET2'], sorted(defs.networks))
+
+  def _WriteDefinitions(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    def_dir = pathlib.Path(temp_dir.name)
+    (def_dir / 'A.svc').write_text('SVC1 = 80/tcp\n')
+    (def_dir / 'B.svc').write_text('SVC2 = 81/tcp\n')
+    (def_dir / 'A.net').write_text('NET1 = 10.0.0.0/8\n')
+    (def_dir / 'B.net').write_text('NET2 = NET1\n')
+    return str(def_dir)
+
+  def testParallelParseInPoolWorker(self):
+    # Daemonic pool workers can not start a pool of their own, so they parse
+    # the files one after the other.
+    with multiprocessing.get_context().Pool(processes=1) as pool:
+      services = pool.apply_async(_ParseInWorker,
+                                  (self._WriteDefinitions(),)).get(60)
+    self.assertEqual([('SVC1', ['80/tcp']), ('SVC2', ['81/tcp'])],
+                     sorted(services))
+
 
 if __name__ == '__main__':
   absltest.main()
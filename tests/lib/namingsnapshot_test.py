@@ -0,0 +1,136 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for namingsnapshot.py module."""
+
+import os
+import pickle
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca.lib import naming
+from capirca.lib import namingsnapshot
+from tests.lib import testutil
+
+
+class NamingSnapshotTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.defs = naming.Naming(None)
+    self.defs.ParseServiceList([
+        'SVC1 = 80/tcp 81/udp 82/tcp',
+        'SVC2 = SVC1 443/tcp',
+        'BAD_SVC = SVC1 UNDEFINED_SVC',
+    ])
+    self.defs.ParseNetworkList([
+        'NET1 = 10.0.0.0/8 # a comment',
+        '       2001:db8::/32',
+        'NET2 = NET1',
+        '       192.168.1.1/24 # host bits',
+        'BAD_NET = NET1 UNDEFINED_NET',
+    ])
+    self.path = os.path.join(testutil.TempDir(self), 'snapshot')
+    self.snapshot = namingsnapshot.Compile(self.defs, self.path)
+
+  def _AssertSameAddresses(self, expected, actual):
+    self.assertEqual(expected, actual)
+    for want, got in zip(expected, actual):
+      self.assertEqual(type(want), type(got))
+      self.assertEqual((want.text, want.token, want.parent_token),
+                       (got.text, got.token, got.parent_token))
+
+  def testNetworks(self):
+    for token in ('NET1', 'NET2', 'NET2 # with a comment'):
+      self._AssertSameAddresses(self.defs.GetNetAddr(token),
+                                self.snapshot.GetNetAddr(token))
+
+  def testServices(self):
+    for token in ('SVC1', 'SVC2'):
+      self.assertEqual(self.defs.GetService(token),
+                       self.snapshot.GetService(token))
+      self.assertEqual(self.defs.GetServiceByProto(token, 'tcp'),
+                       self.snapshot.GetServiceByProto(token, 'tcp'))
+    self.assertEqual(sorted(self.defs.GetServiceNames()),
+                     sorted(self.snapshot.GetServiceNames()))
+
+  def testUndefinedTokens(self):
+    self.assertRaises(naming.UndefinedAddressError,
+                      self.snapshot.GetNet, 'NOPE')
+    self.assertRaises(naming.UndefinedAddressError,
+                      self.snapshot.GetNet, 'BAD_NET')
+    self.assertRaises(naming.UndefinedServiceError,
+                      self.snapshot.GetService, 'NOPE')
+    self.assertRaises(naming.UndefinedServiceError,
+                      self.snapshot.GetServiceByProto, 'BAD_SVC', 'tcp')
+
+  def testReturnsNewObjects(self):
+    first = self.snapshot.GetNet('NET1')
+    first[0].text = 'changed'
+    self.assertEqual('a comment', self.snapshot.GetNet('NET1')[0].text)
+
+  def testPickleOnlyContainsPath(self):
+    data = pickle.dumps(self.snapshot)
+    self.assertLess(len(data), 200)
+    restored = pickle.loads(data)
+    self._AssertSameAddresses(self.defs.GetNet('NET2'),
+                              restored.GetNet('NET2'))
+    self.assertEqual(self.defs.networks['NET2'].items,
+                     restored.networks['NET2'].items)
+
+  def testBadFile(self):
+    with open(self.path + '.bad', 'wb') as f:
+      f.write(b'not a snapshot at all')
+    snapshot = namingsnapshot.NamingSnapshot(self.path + '.bad')
+    self.assertRaises(namingsnapshot.SnapshotFormatError,
+                      snapshot.GetNet, 'NET1')
+
+  def testLoadNaming(self):
+    def_dir = testutil.TempDir(self)
+    cache_file = os.path.join(testutil.TempDir(self), 'naming.cache')
+    with open(os.path.join(def_dir, 'SERVICES.svc'), 'w') as f:
+      f.write('SVC1 = 80/tcp\nSVC2 = SVC1 443/tcp\n')
+    net_file = os.path.join(def_dir, 'NETWORK.net')
+    with open(net_file, 'w') as f:
+      f.write('NET1 = 10.0.0.0/8 # a comment\nNET2 = NET1\n')
+
+    def _Items(definitions):
+      return [[(token, unit.items) for token, unit in group.items()]
+              for group in (definitions.services, definitions.networks)]
+
+    parsed = naming.Naming(def_dir)
+    defs, snapshot = namingsnapshot.LoadNaming(def_dir, cache_file)
+    self.assertEqual(_Items(parsed), _Items(defs))
+    self.assertEqual(parsed.GetNet('NET2'), snapshot.GetNet('NET2'))
+
+    with mock.patch.object(naming, 'Naming', wraps=naming.Naming) as parse:
+      defs, _ = namingsnapshot.LoadNaming(def_dir, cache_file)
+      self.assertEqual(_Items(parsed), _Items(defs))
+      self.assertEqual(['SVC1', 'SVC2'], defs.GetServiceParents('80/tcp'))
+      # Touching a file without changing it keeps the cache.
+      os.utime(net_file, ns=(0, 0))
+      namingsnapshot.LoadNaming(def_dir, cache_file)
+      self.assertNotIn(mock.call(def_dir, processes=1), parse.call_args_list)
+
+      with open(net_file, 'a') as f:
+        f.write('NET3 = 192.168.0.0/16\n')
+      defs, snapshot = namingsnapshot.LoadNaming(def_dir, cache_file)
+      parse.assert_called_with(def_dir, processes=1)
+    self.assertIn('NET3', defs.networks)
+    self.assertEqual(defs.GetNet('NET3'), snapshot.GetNet('NET3'))
+
+
+if __name__ == '__main__':
+  absltest.main()
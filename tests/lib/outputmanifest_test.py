@@ -0,0 +1,86 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for outputmanifest.py module."""
+
+import os
+import pathlib
+import pickle
+import tempfile
+
+from absl.testing import absltest
+
+from capirca.lib import outputmanifest
+
+TEXT = 'line one\n! $Id:$\n! $Date: 2026/01/01 $\nline two\n'
+
+
+class OutputManifestTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self.directory = pathlib.Path(temp_dir.name)
+    self.output_file = self.directory / 'sub' / 'filter.acl'
+    self.output_file.parent.mkdir()
+    self.output_file.write_text(TEXT)
+
+  def testDigestIgnoresKeywordLines(self):
+    self.assertEqual(outputmanifest.Digest(TEXT),
+                     outputmanifest.Digest('line one\nline two\n'))
+    self.assertNotEqual(outputmanifest.Digest(TEXT),
+                        outputmanifest.Digest('line one\n'))
+
+  def testChanged(self):
+    manifest = outputmanifest.Manifest(self.directory)
+    digest = outputmanifest.Digest(TEXT)
+    self.assertIsNone(manifest.Changed(self.output_file, digest))
+    self.assertTrue(manifest.Changed(self.directory / 'missing', digest))
+    manifest.Record(self.output_file, digest)
+    manifest.Save()
+
+    # Other processes read the saved manifest.
+    restored = pickle.loads(pickle.dumps(manifest))
+    self.assertFalse(restored.Changed(self.output_file, digest))
+    self.assertTrue(restored.Changed(self.output_file,
+                                     outputmanifest.Digest('other')))
+    # A file changed since it was recorded has to be read back.
+    self.output_file.write_text(TEXT + 'more\n')
+    self.assertIsNone(restored.Changed(self.output_file, digest))
+
+  def testBadManifestIsIgnored(self):
+    (self.directory / outputmanifest.MANIFEST_NAME).write_text('{bad')
+    manifest = outputmanifest.Manifest(self.directory)
+    self.assertIsNone(manifest.Changed(self.output_file,
+                                       outputmanifest.Digest(TEXT)))
+    manifest.Save()
+    self.assertEqual(
+        '{bad', (self.directory / outputmanifest.MANIFEST_NAME).read_text())
+    self.assertEqual([outputmanifest.MANIFEST_NAME, 'sub'],
+                     sorted(os.listdir(self.directory)))
+
+
+  def testFailedSaveLeavesNoTempFile(self):
+    # A directory in place of the manifest can not be replaced.
+    (self.directory / outputmanifest.MANIFEST_NAME).mkdir()
+    manifest = outputmanifest.Manifest(self.directory)
+    manifest.Record(self.output_file, outputmanifest.Digest(TEXT))
+    manifest.Save()
+    self.assertEqual([outputmanifest.MANIFEST_NAME, 'sub'],
+                     sorted(os.listdir(self.directory)))
+
+
+if __name__ == '__main__':
+  absltest.main()
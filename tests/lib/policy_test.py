@@ -14,6 +14,11 @@
 
 """Unit tests for policy.py library."""
 
+import os
+import sys
+import tempfile
+import threading
+
 from absl.testing import absltest
 from unittest import mock
 
@@ -666,6 +671,74 @@ class PolicyTest(absltest.TestCase):
         [mock.call('includes/y.inc'), mock.call('includes/z.inc')]
     )
 
+  def _WriteIncludes(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    files = {
+        'includes/y.inc': INCLUDED_Y_FILE,
+        'includes/z.inc': GOOD_TERM_5,
+        'pol/a.pol': HEADER + INCLUDE_STATEMENT,
+        'pol/b.pol': HEADER + GOOD_TERM_1,
+    }
+    for name, content in files.items():
+      path = os.path.join(temp_dir.name, name)
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      with open(path, 'w') as f:
+        f.write(content)
+    return temp_dir.name
+
+  def testIncludeCache(self):
+    base_dir = self._WriteIncludes()
+    pol = HEADER + INCLUDE_STATEMENT + GOOD_TERM_1
+    with mock.patch.object(
+        policy, '_ReadFile', wraps=policy._ReadFile) as mock_file:
+      for _ in range(3):
+        p = policy.ParsePolicy(pol, self.naming, base_dir=base_dir)
+        self.assertLen(p.filters[0][1], 3)
+      self.assertEqual(2, mock_file.call_count)
+      # A changed include file is read again.
+      z_file = os.path.join(base_dir, 'includes/z.inc')
+      with open(z_file, 'w') as f:
+        f.write(GOOD_TERM_5 + GOOD_TERM_1)
+      os.utime(z_file, ns=(0, 0))
+      p = policy.ParsePolicy(pol, self.naming, base_dir=base_dir)
+      self.assertLen(p.filters[0][1], 4)
+      self.assertEqual(3, mock_file.call_count)
+
+  @mock.patch.object(policy, '_INCLUDE_CACHE_LIMIT', 10)
+  @mock.patch.object(policy, '_INCLUDE_CACHE', {})
+  def testIncludeCacheEvictsLeastRecentlyUsed(self):
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    paths = []
+    for name, content in (('a', '1234'), ('b', '1234'), ('c', '1234'),
+                          ('large', '12345678901')):
+      paths.append(os.path.join(temp_dir.name, name + '.inc'))
+      with open(paths[-1], 'w') as f:
+        f.write(content)
+    a, b, c, large = paths
+    policy._ReadInclude(a)
+    policy._ReadInclude(b)
+    policy._ReadInclude(a)
+    policy._ReadInclude(c)
+    self.assertEqual([a, c], list(policy._INCLUDE_CACHE))
+    # A file larger than the whole cache is not kept.
+    self.assertEqual('12345678901', policy._ReadInclude(large))
+    self.assertEqual([a, c], list(policy._INCLUDE_CACHE))
+
+  def testIncludeGraph(self):
+    base_dir = self._WriteIncludes()
+    y_file = os.path.join(base_dir, 'includes/y.inc')
+    z_file = os.path.join(base_dir, 'includes/z.inc')
+    self.assertEqual([y_file, z_file],
+                     policy.GetIncludes(INCLUDE_STATEMENT, base_dir=base_dir))
+    pol_a = os.path.join(base_dir, 'pol/a.pol')
+    pol_b = os.path.join(base_dir, 'pol/b.pol')
+    graph = policy.IncludeGraph([pol_a, pol_b], base_dir=base_dir)
+    self.assertEqual({pol_a: [y_file, z_file], pol_b: []}, graph)
+    self.assertEqual([pol_a], policy.PoliciesUsingIncludes(graph, [z_file]))
+    self.assertEqual([], policy.PoliciesUsingIncludes(graph, [pol_b]))
+
   @mock.patch.object(policy, '_ReadFile')
   def testBadIncludes(self, mock_file):
     """Ensure nested includes error handling works."""
@@ -1282,6 +1355,59 @@ class PolicyTest(absltest.TestCase):
     )
     self.naming.GetServiceByProto.assert_called_once_with('SMTP', 'tcp')
 
+  def testShadingDetectionErrorOrder(self):
+    addresses = {
+        'WIDE': [nacaddr.IPv4('10.0.0.0/8')],
+        'NARROW': [nacaddr.IPv4('10.1.0.0/16'), nacaddr.IPv4('10.2.0.0/16')],
+        'OTHER': [nacaddr.IPv4('192.168.0.0/16')],
+    }
+    self.naming.GetNetAddr.side_effect = lambda token: list(addresses[token])
+    pol = HEADER + """
+term wide-tcp {
+  source-address:: WIDE
+  protocol:: tcp
+  action:: accept
+}
+term wide-next {
+  source-address:: WIDE
+  action:: next
+}
+term any-udp {
+  protocol:: udp
+  action:: deny
+}
+term narrow-tcp {
+  source-address:: NARROW
+  protocol:: tcp
+  action:: accept
+}
+term narrow-udp {
+  source-address:: NARROW
+  destination-address:: OTHER
+  protocol:: udp
+  action:: accept
+}
+term other-tcp {
+  source-address:: OTHER
+  protocol:: tcp
+  action:: accept
+}
+term narrow-any {
+  source-address:: NARROW
+  protocol:: tcp udp
+  action:: accept
+}
+"""
+    with self.assertRaises(policy.ShadingError) as e:
+      policy.ParsePolicy(pol, self.naming, shade_check=True)
+    self.assertEqual(
+        '  narrow-tcp is shaded by wide-tcp.\n'
+        '  narrow-udp is shaded by any-udp.\n'
+        '  narrow-any is shaded by wide-tcp.\n'
+        '  narrow-any is shaded by any-udp.\n'
+        '  narrow-any is shaded by narrow-tcp.',
+        str(e.exception))
+
   def testVpnConfigWithoutPairPolicy(self):
     pol = policy.ParsePolicy(HEADER_4 + GOOD_TERM_30, self.naming)
     self.assertEqual(len(pol.filters), 1)
@@ -1941,6 +2067,119 @@ class PolicyTest(absltest.TestCase):
     ]
     self.assertListEqual(expected_target_resources, terms[0].target_resources)
 
+  def testPolicyParserOptionsPerInstance(self):
+    unoptimized_addr = [
+        nacaddr.IPv4('10.16.128.6/32'),
+        nacaddr.IPv4('10.16.128.7/32'),
+    ]
+    self.naming.GetNetAddr.return_value = unoptimized_addr
+    self.naming.GetServiceByProto.return_value = ['25']
+    optimizing = policy.PolicyParser(self.naming)
+    unoptimizing = policy.PolicyParser(self.naming, optimize=False)
+    pol = HEADER + GOOD_TERM_2
+    for _ in range(2):
+      ret = unoptimizing.Parse(pol)
+      self.assertEqual(unoptimized_addr, ret.filters[0][1][0].source_address)
+      ret = optimizing.Parse(pol)
+      self.assertEqual(nacaddr.CollapseAddrList(unoptimized_addr),
+                       ret.filters[0][1][0].source_address)
+    self.assertRaises(policy.ShadingError,
+                      policy.PolicyParser(self.naming, shade_check=True).Parse,
+                      HEADER + TERM_SUPER_3 + TERM_SUB_2)
+
+  def testPolicyParserConcurrentParses(self):
+    results = {}
+
+    def _Parse(net):
+      defs = naming.Naming(None)
+      defs.ParseNetworkList(['PROD_NETWRK = %s' % net])
+      parser = policy.PolicyParser(defs)
+      results[net] = [
+          parser.Parse(HEADER + GOOD_TERM_2).filters[0][1][0].source_address
+          for _ in range(20)
+      ]
+
+    nets = ['10.%d.0.0/16' % i for i in range(8)]
+    threads = [threading.Thread(target=_Parse, args=(net,)) for net in nets]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    for net in nets:
+      self.assertEqual([[nacaddr.IPv4(net)]] * 20, results[net])
+
+  def testParsePolicyUsesItsOwnDefinitions(self):
+    defs = naming.Naming(None)
+    defs.ParseNetworkList(['PROD_NETWRK = 10.0.0.0/16'])
+    other_defs = naming.Naming(None)
+    other_defs.ParseNetworkList(['PROD_NETWRK = 10.1.0.0/16'])
+
+    def _Trace(frame, event, unused_arg):
+      if frame.f_code is not policy.ParsePolicy.__code__:
+        return None
+      if event == 'line':
+        # Another thread mirrors its own definitions before every line.
+        policy.DEFINITIONS = other_defs
+      return _Trace
+
+    self.addCleanup(sys.settrace, sys.gettrace())
+    sys.settrace(_Trace)
+    ret = policy.ParsePolicy(HEADER + GOOD_TERM_2, defs)
+    sys.settrace(None)
+    self.assertEqual([nacaddr.IPv4('10.0.0.0/16')],
+                     ret.filters[0][1][0].source_address)
+    # The definitions are still mirrored for legacy readers.
+    policy.ParsePolicy(HEADER + GOOD_TERM_2, defs)
+    self.assertIs(defs, policy.DEFINITIONS)
+
+  def testPolicyParserError(self):
+    parser = policy.PolicyParser(self.naming)
+    with self.assertRaisesRegex(policy.ParseError, 'line 8, Next EOF'):
+      parser.Parse(HEADER + 'term bad-term {\n  } }')
+    # Line numbers start over for every policy.
+    with self.assertRaisesRegex(policy.ParseError, 'line 9, Next EOF'):
+      parser.Parse(HEADER + '\nterm bad-term {\n  } }')
+
+  def testPolicyCopy(self):
+    self.naming.GetNetAddr.return_value = [nacaddr.IPv4('10.0.0.0/8')]
+    pol = policy.ParsePolicy(HEADER + GOOD_TERM_2, self.naming)
+    pol_copy = pol.Copy()
+    header, terms = pol_copy.filters[0]
+    header.FilterOptions('juniper').append('inet6')
+    terms[0].name = 'renamed'
+    terms[0].protocol.remove('tcp')
+    self.assertEqual(['test-filter'], pol.headers[0].FilterOptions('juniper'))
+    self.assertEqual('good-term-2', pol.filters[0][1][0].name)
+    self.assertEqual(['tcp'], pol.filters[0][1][0].protocol)
+    # Addresses are shared unless they are copied explicitly.
+    self.assertIs(pol.filters[0][1][0].source_address[0],
+                  terms[0].source_address[0])
+    self.assertIsNot(pol.filters[0][1][0].source_address[0],
+                     pol.Copy(True).filters[0][1][0].source_address[0])
+
+  def testTermCopyKeepsSharedLists(self):
+    self.naming.GetNetAddr.return_value = [nacaddr.IPv4('10.0.0.0/8')]
+    pol = policy.ParsePolicy(HEADER + GOOD_TERM_2, self.naming)
+    term = pol.filters[0][1][0]
+    term.flattened_saddr = term.source_address
+    term_copy = term.Copy()
+    self.assertIsNot(term.source_address, term_copy.source_address)
+    self.assertIs(term_copy.source_address, term_copy.flattened_saddr)
+
+  def testTermListsAllocatedWhenUsed(self):
+    self.naming.GetNetAddr.return_value = [nacaddr.IPv4('10.0.0.0/8')]
+    pol = policy.ParsePolicy(HEADER + GOOD_TERM_2, self.naming)
+    term = pol.filters[0][1][0]
+    names = [name for name, _ in term.AttributeItems()]
+    self.assertIn('protocol', names)
+    self.assertNotIn('source_tag', names)
+    self.assertEqual([], term.source_tag)
+    term.source_tag.append('web')
+    self.assertEqual(['web'], term.source_tag)
+    self.assertIn(('source_tag', ['web']), term.AttributeItems())
+    self.assertRaises(AttributeError, getattr, term, 'no_such_keyword')
+    self.assertEqual(['web'], term.Copy().source_tag)
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -0,0 +1,154 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for policydiff.py module."""
+
+from absl.testing import absltest
+
+from capirca.lib import juniper
+from capirca.lib import naming
+from capirca.lib import policy
+from capirca.lib import policydiff
+
+OLD_POLICY = """
+header {
+  comment:: "old comment"
+  target:: juniper edge
+}
+term allow-web {
+  destination-address:: WEB
+  protocol:: tcp
+  destination-port:: HTTP
+  action:: accept
+}
+term allow-dns {
+  protocol:: udp
+  destination-port:: DNS
+  action:: accept
+}
+term deny-all {
+  action:: deny
+}
+header {
+  target:: juniper removed
+}
+term removed-term {
+  action:: accept
+}
+"""
+
+NEW_POLICY = """
+header {
+  comment:: "new comment"
+  target:: juniper edge
+}
+term allow-dns {
+  protocol:: udp
+  destination-port:: DNS
+  action:: accept
+}
+term allow-web {
+  destination-address:: WEB_NEW
+  protocol:: tcp
+  destination-port:: HTTP HTTPS
+  action:: accept
+}
+term allow-ssh {
+  protocol:: tcp
+  destination-port:: SSH
+  action:: accept
+}
+header {
+  target:: juniper added
+}
+term added-term {
+  action:: accept
+}
+"""
+
+
+class PolicyDiffTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.defs = naming.Naming(None)
+    self.defs.ParseServiceList(['HTTP = 80/tcp', 'HTTPS = 443/tcp',
+                                'DNS = 53/udp', 'SSH = 22/tcp'])
+    self.defs.ParseNetworkList(['WEB = 10.0.0.0/24 10.0.4.0/24',
+                                'WEB_NEW = 10.0.0.0/24 10.0.8.0/24',
+                                'RENAMED = 10.0.0.0/24 10.0.4.0/24'])
+    self.old = policy.ParsePolicy(OLD_POLICY, self.defs)
+    self.new = policy.ParsePolicy(NEW_POLICY, self.defs)
+
+  def testEqualPolicies(self):
+    self.assertFalse(policydiff.Diff(self.old, self.old))
+
+  def testDiff(self):
+    diff = policydiff.Diff(self.old, self.new)
+    self.assertEqual(['removed'], [header.target[0].options[0]
+                                   for header, _ in diff.removed_filters])
+    self.assertEqual(['added'], [header.target[0].options[0]
+                                 for header, _ in diff.added_filters])
+    self.assertLen(diff.modified_filters, 1)
+    edge = diff.modified_filters[0]
+    self.assertEqual(((('juniper', 'edge'),), 0), edge.key)
+    self.assertEqual(
+        [policydiff.AttributeDelta('comment', ['old comment'],
+                                   ['new comment'])],
+        edge.header_deltas)
+    self.assertEqual(['allow-ssh'], [term.name for term in edge.added_terms])
+    self.assertEqual(['deny-all'], [term.name for term in edge.removed_terms])
+    self.assertTrue(edge.reordered)
+    self.assertEqual(['allow-web'],
+                     [term.name for term in edge.modified_terms])
+    self.assertEqual(
+        [policydiff.AttributeDelta('destination_address', ['10.0.4.0/24'],
+                                   ['10.0.8.0/24']),
+         policydiff.AttributeDelta('destination_port', [], ['443'])],
+        edge.modified_terms[0].deltas)
+    self.assertIn('      destination_address: -10.0.4.0/24 +10.0.8.0/24',
+                  str(diff).splitlines())
+
+  def testRenamedTokenIsNotAChange(self):
+    renamed = policy.ParsePolicy(OLD_POLICY.replace('WEB', 'RENAMED'),
+                                 self.defs)
+    self.assertFalse(policydiff.Diff(self.old, renamed))
+    # The token names are rendered, so the fingerprints differ.
+    self.assertNotEqual(
+        policydiff.Fingerprint(self.old.filters[0][1][0]),
+        policydiff.Fingerprint(renamed.filters[0][1][0]))
+
+  def testFingerprint(self):
+    again = policy.ParsePolicy(OLD_POLICY, self.defs)
+    self.assertEqual(policydiff.Fingerprint(self.old.filters[0][1][0]),
+                     policydiff.Fingerprint(again.filters[0][1][0]))
+    term = juniper.Term(self.old.filters[0][1][0], 'inet', False, False)
+    self.assertNotEqual(
+        policydiff.Fingerprint(term),
+        policydiff.Fingerprint(
+            juniper.Term(self.old.filters[0][1][0], 'inet6', False, False)))
+    with self.assertRaises(policydiff.UnfingerprintableError):
+      policydiff.Fingerprint([len])
+
+  def testFingerprintIgnoresUnusedLists(self):
+    term = self.old.filters[0][1][0]
+    fingerprint = policydiff.Fingerprint(term)
+    self.assertEqual([], term.dscp_match)
+    self.assertEqual(fingerprint, policydiff.Fingerprint(term))
+    term.dscp_match.append('af41')
+    self.assertNotEqual(fingerprint, policydiff.Fingerprint(term))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,200 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for rendercache.py module."""
+
+import pathlib
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca import aclgen
+from capirca.lib import cisco
+from capirca.lib import ipset
+from capirca.lib import juniper
+from capirca.lib import naming
+from capirca.lib import policy
+from capirca.lib import rendercache
+from tests.lib import testutil
+
+POLICY = """
+header {
+  target:: juniper test-filter
+}
+term good-term {
+  source-address:: NET1
+  protocol:: tcp
+  destination-port:: SVC1
+  action:: accept
+}
+"""
+
+TWO_TERM_POLICY = """
+header {
+  target:: %s test-filter
+}
+term first-term {
+  source-address:: NET1
+  protocol:: tcp
+  destination-port:: SVC1
+  action:: accept
+}
+term second-term {
+  source-address:: NET2
+  protocol:: tcp
+  destination-port:: %s
+  action:: accept
+}
+"""
+
+
+SIDE_EFFECT_POLICY = """
+header {
+  target:: %s
+}
+term to-networks {
+  owner:: someone@example.com
+  destination-address:: NET1 NET2
+  protocol:: tcp
+  action:: accept
+}
+term any-address {
+  owner:: someone@example.com
+  protocol:: tcp
+  destination-port:: SVC1
+  action:: accept
+}
+"""
+
+
+class RenderCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.cache_dir = testutil.TempDir(self)
+    self.defs = self._Definitions('10.0.0.0/8')
+    self.cache = rendercache.RenderCache(self.cache_dir)
+
+  def _Definitions(self, net1, net2='192.168.0.0/16'):
+    defs = naming.Naming(None)
+    defs.ParseServiceList(['SVC1 = 80/tcp', 'SVC2 = 443/tcp'])
+    defs.ParseNetworkList(['NET1 = NESTED', 'NESTED = %s' % net1,
+                           'NET2 = %s' % net2])
+    return defs
+
+  def _Store(self, key):
+    recorder = rendercache.RecordingNaming(self.defs)
+    policy.ParsePolicy(POLICY, recorder)
+    self.cache.Store(key, recorder, [('.jcl', 'rendered', False)])
+    return recorder
+
+  def testRecordsReferencedTokens(self):
+    recorder = self._Store('a' * 64)
+    self.assertEqual({'NET1'}, recorder.networks_used)
+    self.assertEqual({'SVC1'}, recorder.services_used)
+
+  def testLookupHit(self):
+    key = self.cache.Key(POLICY, 'pol/test.pol', {'optimize': True})
+    self._Store(key)
+    self.assertEqual([('.jcl', 'rendered', False)],
+                     self.cache.Lookup(key, self.defs))
+    self.assertEqual(1, self.cache.hits)
+
+  def testLookupMiss(self):
+    key = self.cache.Key(POLICY, 'pol/test.pol', {'optimize': True})
+    self.assertIsNone(self.cache.Lookup(key, self.defs))
+    self.assertEqual(1, self.cache.misses)
+
+  def testNestedTokenChangeInvalidates(self):
+    key = self.cache.Key(POLICY, 'pol/test.pol', {})
+    self._Store(key)
+    cache = rendercache.RenderCache(self.cache_dir)
+    self.assertIsNone(cache.Lookup(key, self._Definitions('11.0.0.0/8')))
+
+  def testUnreferencedTokenChangeKeepsEntry(self):
+    key = self.cache.Key(POLICY, 'pol/test.pol', {})
+    self._Store(key)
+    cache = rendercache.RenderCache(self.cache_dir)
+    self.assertIsNotNone(
+        cache.Lookup(key, self._Definitions('10.0.0.0/8', '172.16.0.0/12')))
+
+  def testKeyDependsOnTextAndOptions(self):
+    key = self.cache.Key(POLICY, 'pol/test.pol', {'optimize': True})
+    self.assertNotEqual(
+        key, self.cache.Key(POLICY + '\n', 'pol/test.pol', {'optimize': True}))
+    self.assertNotEqual(
+        key, self.cache.Key(POLICY, 'pol/test.pol', {'optimize': False}))
+    self.assertNotEqual(
+        key, self.cache.Key(POLICY, 'pol/other.pol', {'optimize': True}))
+
+  def testRenderFileUsesCache(self):
+    base_dir = pathlib.Path(testutil.TempDir(self))
+    pol_file = base_dir / 'pol' / 'test.pol'
+    pol_file.parent.mkdir()
+    pol_file.write_text(POLICY)
+    out_dir = pathlib.Path(testutil.TempDir(self))
+
+    first = []
+    aclgen.RenderFile(str(base_dir), pol_file, out_dir, self.defs, 2, True,
+                      False, first, self.cache)
+    second = []
+    with mock.patch.object(policy, 'ParsePolicy') as mock_parse:
+      aclgen.RenderFile(str(base_dir), pol_file, out_dir, self.defs, 2, True,
+                        False, second, self.cache)
+      mock_parse.assert_not_called()
+    self.assertEqual(first, second)
+    self.assertEqual(1, self.cache.hits)
+
+  def testTermCacheRendersChangedTermsOnly(self):
+    for generator in (juniper.Juniper, cisco.Cisco):
+      platform = generator._PLATFORM
+      results = []
+      for other_port in ('SVC1', 'SVC1', 'SVC2'):
+        pol = policy.ParsePolicy(
+            TWO_TERM_POLICY % (platform, other_port), self.defs)
+        term_cache = self.cache.TermCache('pol/%s.pol' % platform)
+        with term_cache:
+          output = str(generator(pol, 2))
+        term_cache.Save()
+        self.assertEqual(str(generator(pol, 2)), output)
+        results.append((term_cache.hits, term_cache.misses))
+      self.assertEqual([(0, 2), (2, 0), (1, 1)], results)
+
+  def testTermCacheKeepsRenderSideEffects(self):
+    # Ipset terms collect the address sets printed by their generator, and
+    # the terms of mixed filters get the owner appended to their comments
+    # once per address family.
+    for generator, target in ((ipset.Ipset, 'ipset INPUT ACCEPT'),
+                              (juniper.Juniper, 'juniper test-filter mixed'),
+                              (cisco.Cisco, 'cisco test-filter mixed')):
+      pol_text = SIDE_EFFECT_POLICY % target
+      expected = str(generator(policy.ParsePolicy(pol_text, self.defs), 2))
+      for _ in range(2):
+        term_cache = self.cache.TermCache('pol/%s.pol' % generator._PLATFORM)
+        with term_cache:
+          output = str(generator(policy.ParsePolicy(pol_text, self.defs), 2))
+        term_cache.Save()
+        self.assertEqual(expected, output)
+      self.assertEqual(0, term_cache.hits)
+
+  def testTermCacheUnusedWithoutRender(self):
+    term_cache = self.cache.TermCache('pol/test.pol')
+    with term_cache:
+      pass
+    term_cache.Save()
+    self.assertFalse(term_cache.path.exists())
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,124 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for renderprofile.py module."""
+
+import csv
+import json
+import pathlib
+import pstats
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca import aclgen
+from capirca.lib import naming
+from capirca.lib import renderprofile
+from tests.lib import testutil
+
+POLICY = """
+header {
+  target:: juniper test-filter
+}
+term good-term {
+  source-address:: NET1
+  protocol:: tcp
+  action:: accept
+}
+"""
+
+
+class RenderProfileTest(absltest.TestCase):
+
+  def testPhasesExcludeNestedPhases(self):
+    # Enter the profile at 0, parse from 1 to 10 with a copy from 2 to 5, and
+    # leave the profile at 12.
+    times = iter([0.0, 1.0, 2.0, 5.0, 10.0, 12.0])
+    with mock.patch.object(renderprofile.time, 'perf_counter',
+                           side_effect=lambda: next(times)):
+      with renderprofile.FileProfile('pol/test.pol') as profile:
+        with renderprofile.Phase('parse'):
+          with renderprofile.Phase('copy'):
+            pass
+    self.assertEqual(12.0, profile.seconds)
+    self.assertEqual({'parse': 6.0, 'copy': 3.0, 'other': 3.0},
+                     profile.phases)
+
+  def testPhaseWithoutProfile(self):
+    with renderprofile.Phase('parse'):
+      pass
+    self.assertIsNone(renderprofile._ACTIVE)
+
+  def testRenderFilePhases(self):
+    base_dir = pathlib.Path(testutil.TempDir(self))
+    pol_file = base_dir / 'pol' / 'test.pol'
+    pol_file.parent.mkdir()
+    pol_file.write_text(POLICY)
+    defs = naming.Naming(None)
+    defs.ParseNetworkList(['NET1 = 10.0.0.0/8'])
+    with renderprofile.FileProfile('pol/test.pol') as profile:
+      aclgen.RenderFile(str(base_dir), pol_file,
+                        pathlib.Path(testutil.TempDir(self)), defs, 2, True,
+                        False, [])
+    for phase in ('read', 'preprocess', 'parse', 'translate_terms', 'copy',
+                  'translate_policy:juniper', 'format:juniper', 'other'):
+      self.assertIn(phase, profile.phases)
+    self.assertAlmostEqual(profile.seconds, sum(profile.phases.values()))
+
+  @absltest.skipUnless(
+      pathlib.Path('/proc/self/clear_refs').exists(), 'needs Linux')
+  def testPeakMemoryPerFile(self):
+    large = renderprofile.FileProfile('pol/large.pol')
+    with large:
+      data = bytearray(256 * 1024 * 1024)
+      data[::4096] = b'x' * len(data[::4096])
+      del data
+    small = renderprofile.FileProfile('pol/small.pol')
+    with small:
+      pass
+    # The peak of a file is not carried over to the next one.
+    self.assertGreater(large.peak_memory, 256 * 1024 * 1024)
+    self.assertLess(small.peak_memory, large.peak_memory - 128 * 1024 * 1024)
+
+  def testReports(self):
+    report = renderprofile.Report()
+    for name, seconds in (('pol/fast.pol', 1.0), ('pol/slow.pol', 3.0)):
+      profile = renderprofile.FileProfile(name, cprofile=True)
+      with profile:
+        pass
+      profile.phases = {'parse': seconds, 'format:juniper': seconds}
+      profile.seconds = 2 * seconds
+      report.Add(profile)
+    out_dir = pathlib.Path(testutil.TempDir(self))
+
+    report.Save(out_dir / 'report.json')
+    data = json.loads((out_dir / 'report.json').read_text())
+    self.assertEqual({'parse': 4.0, 'format:juniper': 4.0}, data['totals'])
+    self.assertEqual(['pol/slow.pol', 'pol/fast.pol'],
+                     [f['file'] for f in data['files']])
+
+    report.Save(out_dir / 'report.csv')
+    with open(out_dir / 'report.csv') as f:
+      rows = list(csv.DictReader(f))
+    self.assertEqual(
+        [('total', ''), ('format', 'juniper'), ('parse', '')],
+        [(row['phase'], row['platform']) for row in rows[:3]])
+
+    paths = report.SaveSlowest(out_dir, 1)
+    self.assertEqual([out_dir / 'pol_slow.pol.prof'], paths)
+    pstats.Stats(str(paths[0]))
+
+
+if __name__ == '__main__':
+  absltest.main()
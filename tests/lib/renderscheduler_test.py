@@ -0,0 +1,178 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Unittest for renderscheduler.py module."""
+
+import pathlib
+from unittest import mock
+
+from absl.testing import absltest
+
+from capirca import aclgen
+from capirca.lib import naming
+from capirca.lib import renderscheduler
+from tests.lib import testutil
+
+SMALL_POLICY = """
+header {
+  target:: juniper small
+}
+term accept-all {
+  action:: accept
+}
+"""
+
+LARGE_POLICY = """
+header {
+  # target:: arista is commented out
+  target:: juniper large
+  target:: cisco large
+}
+term one {
+  source-address:: NET1
+  action:: accept
+}
+term two {
+  action:: accept
+}
+header {
+  target:: iptables INPUT
+}
+term three {
+  action:: accept
+}
+"""
+
+
+class RenderSchedulerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.base_dir = pathlib.Path(testutil.TempDir(self))
+    (self.base_dir / 'pol').mkdir()
+    self.small = self.base_dir / 'pol' / 'small.pol'
+    self.small.write_text(SMALL_POLICY)
+    self.large = self.base_dir / 'pol' / 'large.pol'
+    self.large.write_text(LARGE_POLICY)
+
+  def testPlatformCosts(self):
+    self.assertEqual({'juniper': 11, 'cisco': 11, 'iptables': 6},
+                     renderscheduler.PlatformCosts(LARGE_POLICY))
+
+  def testLargestFirst(self):
+    stats = renderscheduler.RenderStats()
+    tasks = renderscheduler.Schedule([self.small, self.large],
+                                     str(self.base_dir), 2, stats,
+                                     [['cisco', 'iptables', 'juniper']])
+    self.assertEqual(['pol/large.pol', 'pol/small.pol'],
+                     [task.name for task in tasks])
+    self.assertEqual([None, None], [task.platforms for task in tasks])
+    self.assertEqual(28, stats.GetLines('pol/large.pol'))
+
+  def testSequentialReadsNoPolicy(self):
+    stats = renderscheduler.RenderStats()
+    stats.Record('pol/large.pol:juniper', 2.0)
+    with mock.patch.object(renderscheduler, '_ReadPolicy') as read:
+      tasks = renderscheduler.Schedule([self.small, self.large],
+                                       str(self.base_dir), 1, stats)
+    read.assert_not_called()
+    self.assertEqual([('pol/large.pol', None, 2.0),
+                      ('pol/small.pol', None, 0.0)],
+                     [(task.name, task.platforms, task.cost)
+                      for task in tasks])
+
+  def testRecordedPoliciesNotRead(self):
+    stats = renderscheduler.RenderStats()
+    stats.Record('pol/large.pol', 1.0)
+    stats.Record('pol/small.pol', 1.0)
+    with mock.patch.object(renderscheduler, '_ReadPolicy') as read:
+      tasks = renderscheduler.Schedule([self.small, self.large],
+                                       str(self.base_dir), 2, stats)
+    read.assert_not_called()
+    self.assertEqual([None, None], [task.platforms for task in tasks])
+
+  def testRecordedTimesOverrideEstimates(self):
+    stats = renderscheduler.RenderStats()
+    stats.Record('pol/small.pol', 5.0)
+    stats.Record('pol/large.pol', 1.0)
+    tasks = renderscheduler.Schedule([self.small, self.large],
+                                     str(self.base_dir), 1, stats)
+    self.assertEqual([('pol/small.pol', 5.0), ('pol/large.pol', 1.0)],
+                     [(task.name, task.cost) for task in tasks])
+
+  def testUnknownPoliciesScaledToSeconds(self):
+    stats = renderscheduler.RenderStats()
+    # 28 lines took 56 seconds, so the 6 lines of the small policy take 12.
+    stats.Record('pol/large.pol', 56.0)
+    stats.RecordLines('pol/large.pol', 28)
+    tasks = renderscheduler.Schedule([self.small, self.large],
+                                     str(self.base_dir), 2, stats,
+                                     [['cisco', 'iptables', 'juniper']])
+    self.assertEqual(12.0, tasks[1].cost)
+
+  def testStragglerSplitByPlatform(self):
+    stats = renderscheduler.RenderStats()
+    # The large policy was split before and took 16 seconds.
+    stats.Record('pol/large.pol:juniper', 1.0)
+    stats.Record('pol/large.pol:cisco', 10.0)
+    stats.Record('pol/large.pol:iptables', 5.0)
+    tasks = renderscheduler.Schedule([self.small, self.large],
+                                     str(self.base_dir), 2, stats)
+    self.assertEqual(
+        [('pol/large.pol:cisco', ('cisco',)),
+         ('pol/small.pol', None),
+         ('pol/large.pol:iptables', ('iptables',)),
+         ('pol/large.pol:juniper', ('juniper',))],
+        [(task.name, task.platforms) for task in tasks])
+
+  def testSharedOutputsRenderedTogether(self):
+    stats = renderscheduler.RenderStats()
+    tasks = renderscheduler.Schedule([self.small, self.large],
+                                     str(self.base_dir), 2, stats,
+                                     [['iptables', 'juniper']])
+    self.assertEqual(
+        [('pol/large.pol:iptables+juniper', ('iptables', 'juniper')),
+         ('pol/large.pol:cisco', ('cisco',)),
+         ('pol/small.pol', None)],
+        [(task.name, task.platforms) for task in tasks])
+
+  def testStatsFile(self):
+    stats_file = pathlib.Path(testutil.TempDir(self), 'stats.json')
+    stats = renderscheduler.RenderStats(stats_file)
+    stats.Record('pol/small.pol', 1.5)
+    stats.RecordLines('pol/small.pol', 6)
+    stats.Save()
+    self.assertEqual(1.5,
+                     renderscheduler.RenderStats(stats_file).Get(
+                         'pol/small.pol'))
+    self.assertEqual(6,
+                     renderscheduler.RenderStats(stats_file).GetLines(
+                         'pol/small.pol'))
+    stats_file.write_text('not json')
+    self.assertIsNone(
+        renderscheduler.RenderStats(stats_file).Get('pol/small.pol'))
+
+  def testRenderFilePlatforms(self):
+    defs = naming.Naming(None)
+    defs.ParseNetworkList(['NET1 = 10.0.0.0/8'])
+    write_files = []
+    aclgen.RenderFile(str(self.base_dir), self.large,
+                      pathlib.Path(testutil.TempDir(self)), defs, 2, False,
+                      False, write_files, render_platforms=('cisco',))
+    self.assertEqual(['large.acl'],
+                     [output_file.name for output_file, _ in write_files])
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,34 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Helpers shared by the unit tests."""
+
+import tempfile
+
+
+def TempDir(test_case):
+  """Returns a temporary directory removed when the test case is cleaned up.
+
+  absltest's create_tempdir() needs parsed flags, which it does not have when
+  the tests are run by pytest.
+
+  Args:
+    test_case: the unittest.TestCase using the directory.
+
+  Returns:
+    The path of the directory.
+  """
+  temp_dir = tempfile.TemporaryDirectory()
+  test_case.addCleanup(temp_dir.cleanup)
+  return temp_dir.name
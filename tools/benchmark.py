@@ -0,0 +1,383 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Times the parse, optimize and render pipeline on synthetic policies.
+
+Definitions and policies are generated from a fixed seed at several scales,
+so every run times the same input. Each benchmark is run --repeat times and
+its minimum and median times are reported. The results can be saved as JSON
+and compared with a saved baseline; benchmarks whose minimum time grew by
+more than --threshold are reported as regressions and make the tool exit
+with status 1.
+
+Example:
+  $ python tools/benchmark.py --scales=small,medium --output=base.json
+  ... change the code ...
+  $ python tools/benchmark.py --scales=small,medium --baseline=base.json
+"""
+
+import argparse
+import collections
+import json
+import pathlib
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+from absl import logging
+from capirca.lib import generators
+from capirca.lib import nacaddr
+from capirca.lib import naming
+from capirca.lib import policy
+
+# Bump whenever the layout of the results changes.
+RESULTS_FORMAT_VERSION = 1
+
+Scale = collections.namedtuple('Scale', [
+    'filters', 'terms_per_filter', 'addresses_per_token', 'nesting_depth',
+    'platforms_per_header'
+])
+
+# Synthetic definitions, with the network tokens terms use as sources (those
+# of the last level of nesting) and as destinations (leaf tokens).
+Synthetic = collections.namedtuple('Synthetic', [
+    'network_lines', 'service_lines', 'sources', 'destinations', 'services'
+])
+
+SCALES = {
+    'small': Scale(2, 20, 8, 1, 2),
+    'medium': Scale(4, 50, 16, 2, 3),
+    'large': Scale(8, 200, 32, 3, 4),
+}
+
+# Terms match on source addresses, and on what else the generator supports:
+# destination addresses, ports and protocols, and deny actions.
+_FULL = ('destination', 'ports', 'deny')
+
+# The header options of every platform and the features of its terms.
+_TARGETS = {
+    'arista': ('bench extended', _FULL),
+    'arista_tp': ('bench', _FULL),
+    'aruba': ('bench', _FULL),
+    'brocade': ('bench extended', _FULL),
+    'cisco': ('bench extended', _FULL),
+    'ciscoasa': ('bench', _FULL),
+    'cisconx': ('bench extended', _FULL),
+    'ciscoxr': ('bench', _FULL),
+    'cloudarmor': ('inet', ('deny',)),
+    'fortigate': ('', _FULL),
+    'fortigatelocalin': ('', _FULL),
+    'gce': ('bench INGRESS', ('ports', 'deny')),
+    'gce_vpc_tf': ('bench INGRESS', ('ports', 'deny')),
+    'gcp_hf': ('bench INGRESS inet ga 65536', _FULL),
+    'ipset': ('INPUT ACCEPT', _FULL),
+    'iptables': ('INPUT ACCEPT', _FULL),
+    'juniper': ('bench inet', _FULL),
+    'juniperevo': ('bench inet', _FULL),
+    'k8s': ('', ('ports',)),
+    'msmpc': ('bench inet', _FULL),
+    'nftables': ('inet input', _FULL),
+    'nsxt': ('bench inet', _FULL),
+    'nsxv': ('bench inet', _FULL),
+    'openconfig': ('bench inet', _FULL),
+    'packetfilter': ('bench', _FULL),
+    'paloalto': ('from-zone trust to-zone untrust', _FULL),
+    'pcap': ('bench', _FULL),
+    'sonic': ('bench inet', ('deny',)),
+    'speedway': ('INPUT ACCEPT', _FULL),
+    'srx': ('from-zone trust to-zone untrust', _FULL),
+    'srxlo': ('bench inet', _FULL),
+    'windows_advfirewall': ('in inet', _FULL),
+}
+
+
+class Error(Exception):
+  """Base error class."""
+
+
+def _RandomNetwork(rng):
+  """Returns a random network of 10.0.0.0/8, or of 2001:db8::/32."""
+  if rng.random() < 0.125:
+    host_bits = 128 - rng.randint(48, 128)
+    address = 0x20010db8 << 96 | rng.getrandbits(96)
+    return nacaddr.IPv6((address >> host_bits << host_bits, 128 - host_bits))
+  host_bits = 32 - rng.randint(16, 32)
+  address = 10 << 24 | rng.getrandbits(24)
+  return nacaddr.IPv4((address >> host_bits << host_bits, 32 - host_bits))
+
+
+def BuildDefinitions(scale, rng):
+  """Returns the lines of synthetic network and service definitions.
+
+  Leaf network tokens hold addresses_per_token networks. Every further level
+  of nesting holds tokens which each reference four tokens of the level
+  below.
+
+  Args:
+    scale: a Scale.
+    rng: random.Random used to pick the networks.
+
+  Returns:
+    A Synthetic.
+  """
+  network_lines = []
+  tokens = []
+  for i in range(max(scale.terms_per_filter, 8)):
+    token = 'NET_%d' % i
+    tokens.append(token)
+    networks = [_RandomNetwork(rng) for _ in range(scale.addresses_per_token)]
+    network_lines.append('%s = %s' % (token, networks[0]))
+    network_lines.extend('    %s' % network for network in networks[1:])
+  leaves = tokens
+  for depth in range(1, scale.nesting_depth):
+    groups = []
+    for i in range(max(len(tokens) // 2, 4)):
+      group = 'GROUP%d_%d' % (depth, i)
+      groups.append(group)
+      network_lines.append('%s = %s' % (group, ' '.join(rng.sample(tokens,
+                                                                    4))))
+    tokens = groups
+
+  service_lines = []
+  services = []
+  for i in range(max(scale.terms_per_filter // 4, 4)):
+    service = 'SVC_%d' % i
+    services.append(service)
+    ports = sorted(rng.sample(range(1, 65536), 3))
+    service_lines.append('%s = %d/tcp %d/udp %d-%d/tcp' % (
+        service, ports[0], ports[1], ports[2], min(ports[2] + 10, 65535)))
+  return Synthetic(network_lines, service_lines, tokens, leaves, services)
+
+
+def BuildTerms(count, features, synthetic, rng):
+  """Returns the text of count synthetic terms using features of _TARGETS."""
+  terms = []
+  for i in range(count):
+    lines = ['term bench-term-%d {' % i,
+             '  source-address:: %s' % ' '.join(
+                 rng.sample(synthetic.sources, 2))]
+    if 'destination' in features:
+      lines.append('  destination-address:: %s' %
+                   rng.choice(synthetic.destinations))
+    if 'ports' in features:
+      lines.append('  protocol:: tcp udp')
+      lines.append('  destination-port:: %s' %
+                   rng.choice(synthetic.services))
+    deny = 'deny' in features and i % 5 == 4
+    lines.append('  action:: %s' % ('deny' if deny else 'accept'))
+    lines.append('}')
+    terms.append('\n'.join(lines))
+  return '\n'.join(terms)
+
+
+def BuildPolicy(scale, synthetic, rng):
+  """Returns a synthetic policy with several targets per header."""
+  platforms = [p for p, (_, features) in sorted(_TARGETS.items())
+               if features == _FULL]
+  filters = []
+  for i in range(scale.filters):
+    targets = ['  target:: %s %s' % (p, _TARGETS[p][0]) for p in rng.sample(
+        platforms, min(scale.platforms_per_header, len(platforms)))]
+    filters.append('header {\n%s\n}\n%s' % (
+        '\n'.join(targets),
+        BuildTerms(scale.terms_per_filter, _FULL, synthetic, rng)))
+  return '\n'.join(filters)
+
+
+def _Time(func, repeat):
+  """Returns the minimum and median seconds of repeat calls of func."""
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    times.append(time.perf_counter() - start)
+  return {'min': min(times), 'median': statistics.median(times)}
+
+
+def RunScale(name, scale, repeat=3, seed=0, selected=None):
+  """Runs every benchmark of a scale.
+
+  Args:
+    name: name of the scale, which prefixes the benchmark names.
+    scale: a Scale.
+    repeat: the number of times every benchmark is run.
+    seed: seed of the synthetic input.
+    selected: optional regular expression the benchmark names must match.
+
+  Returns:
+    A dict of benchmark name to its times, or to the error it raised.
+  """
+  rng = random.Random(seed)
+  synthetic = BuildDefinitions(scale, rng)
+  results = {}
+
+  def Bench(bench_name, func):
+    bench_name = '%s/%s' % (name, bench_name)
+    if selected and not re.search(selected, bench_name):
+      return
+    try:
+      results[bench_name] = _Time(func, repeat)
+    except Exception as e:  # pylint: disable=broad-except
+      results[bench_name] = {'error': '%s: %s' % (type(e).__name__, e)}
+
+  with tempfile.TemporaryDirectory() as def_dir:
+    pathlib.Path(def_dir, 'bench.net').write_text(
+        '\n'.join(synthetic.network_lines) + '\n')
+    pathlib.Path(def_dir, 'bench.svc').write_text(
+        '\n'.join(synthetic.service_lines) + '\n')
+    Bench('naming_load', lambda: naming.Naming(def_dir))
+    definitions = naming.Naming(def_dir)
+
+  policy_text = BuildPolicy(scale, synthetic, rng)
+  Bench('parse_policy', lambda: policy.ParsePolicy(
+      policy_text, definitions, optimize=False))
+  Bench('parse_policy_optimized', lambda: policy.ParsePolicy(
+      policy_text, definitions, optimize=True))
+
+  def ShadeCheck():
+    try:
+      policy.ParsePolicy(policy_text, definitions, optimize=True,
+                         shade_check=True)
+    except policy.ShadingError:
+      pass
+  Bench('shading_detection', ShadeCheck)
+
+  addresses = [addr for token in synthetic.sources
+               for addr in definitions.GetNetAddr(token)]
+  Bench('collapse_addr_list', lambda: nacaddr.CollapseAddrList(addresses))
+
+  for platform_name in sorted(generators.BUILTIN_PLATFORMS):
+    generator = generators.Get(platform_name).Load()
+    options, features = _TARGETS[platform_name]
+    text = 'header {\n  target:: %s %s\n}\n%s' % (
+        platform_name, options,
+        BuildTerms(scale.terms_per_filter, features, synthetic, rng))
+    try:
+      pol = policy.ParsePolicy(text, definitions, optimize=True)
+    except (policy.Error, naming.Error) as e:
+      results['%s/generator:%s' % (name, platform_name)] = {
+          'error': '%s: %s' % (type(e).__name__, e)}
+      continue
+    Bench('generator:%s' % platform_name,
+          lambda pol=pol, generator=generator: str(generator(
+              pol.Copy(generator.MUTATES_ADDRESSES), 2)))
+  return results
+
+
+def Compare(baseline, results, threshold):
+  """Compares results with a baseline.
+
+  Args:
+    baseline: results of an earlier run, as returned by Run.
+    results: results of this run, as returned by Run.
+    threshold: the fraction by which a minimum time may grow before it is
+      reported as a regression.
+
+  Returns:
+    A list of (benchmark name, baseline seconds, seconds, ratio, regressed)
+    tuples of the benchmarks timed in both runs.
+  """
+  comparison = []
+  for name, times in sorted(results['results'].items()):
+    base_times = baseline['results'].get(name)
+    if not base_times or 'min' not in base_times or 'min' not in times:
+      continue
+    ratio = times['min'] / base_times['min'] if base_times['min'] else 1.0
+    comparison.append((name, base_times['min'], times['min'], ratio,
+                       ratio > 1 + threshold))
+  return comparison
+
+
+def Run(scales, repeat=3, seed=0, selected=None):
+  """Runs the benchmarks of several scales.
+
+  Args:
+    scales: names of the scales of SCALES to run.
+    repeat: the number of times every benchmark is run.
+    seed: seed of the synthetic input.
+    selected: optional regular expression the benchmark names must match.
+
+  Returns:
+    A dict of the run settings and the 'results' of every benchmark.
+  """
+  results = {}
+  for name in scales:
+    results.update(RunScale(name, SCALES[name], repeat, seed, selected))
+  return {
+      'version': RESULTS_FORMAT_VERSION,
+      'python': platform.python_version(),
+      'repeat': repeat,
+      'seed': seed,
+      'scales': {name: SCALES[name]._asdict() for name in scales},
+      'results': results,
+  }
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--scales', default='small,medium',
+                      help='Comma separated scales to run, of %s.' %
+                      ', '.join(SCALES))
+  parser.add_argument('--filter', default=None,
+                      help='Only run the benchmarks matching this regular '
+                      'expression.')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='The number of times every benchmark is run.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the synthetic definitions and policies.')
+  parser.add_argument('--output', default=None,
+                      help='Write the results as JSON to this file.')
+  parser.add_argument('--baseline', default=None,
+                      help='Compare the results with the JSON results of an '
+                      'earlier run.')
+  parser.add_argument('--threshold', type=float, default=0.1,
+                      help='Report benchmarks more than this fraction slower '
+                      'than the baseline as regressions.')
+  args = parser.parse_args(argv[1:])
+  logging.set_verbosity(logging.ERROR)
+
+  scales = args.scales.split(',')
+  for name in scales:
+    if name not in SCALES:
+      parser.error('unknown scale: %s' % name)
+  results = Run(scales, args.repeat, args.seed, args.filter)
+  if args.output:
+    pathlib.Path(args.output).write_text(
+        json.dumps(results, indent=2, sort_keys=True))
+
+  if not args.baseline:
+    for name, times in sorted(results['results'].items()):
+      if 'error' in times:
+        print('%-40s %s' % (name, times['error']))
+      else:
+        print('%-40s %10.4fs %10.4fs' % (name, times['min'], times['median']))
+    return 0
+
+  baseline = json.loads(pathlib.Path(args.baseline).read_text())
+  regressions = 0
+  for name, base_seconds, seconds, ratio, regressed in Compare(
+      baseline, results, args.threshold):
+    regressions += regressed
+    print('%-40s %10.4fs %10.4fs %6.2fx%s' % (
+        name, base_seconds, seconds, ratio, '  REGRESSION' if regressed else ''))
+  return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
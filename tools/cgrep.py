@@ -39,6 +39,7 @@ Examples:
 """
 
 import argparse
+import os
 import pprint
 import sys
 
@@ -46,6 +47,7 @@ from absl import app
 from absl import logging
 from capirca.lib import nacaddr
 from capirca.lib import naming
+from capirca.lib import namingsnapshot
 
 
 def is_valid_ip(arg):
@@ -85,6 +87,10 @@ def cli_options():
                       help='Network Definitions directory location. \n',
                       default='./def')
 
+  parser.add_argument('--naming-cache', dest='naming_cache',
+                      help='File caching the parsed definitions, used while '
+                      'no definition file changed.\n')
+
   # -i and -t can be used together, but not with any other option.
   ip_group = parser.add_argument_group()
   # take 1 or more IPs
@@ -131,7 +137,11 @@ def main(argv):
   del argv  # Unused.
   parser = cli_options()
   options = parser.parse_args()
-  db = naming.Naming(options.defs)
+  if options.naming_cache:
+    db, _ = namingsnapshot.LoadNaming(options.defs, options.naming_cache,
+                                      processes=os.cpu_count() or 1)
+  else:
+    db = naming.Naming(options.defs, processes=os.cpu_count() or 1)
   p = pprint.PrettyPrinter(indent=1, depth=4, width=1).pprint
 
   # if -i and any other option:
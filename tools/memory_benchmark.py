@@ -0,0 +1,135 @@
+# Copyright 2026 The Capirca Project Authors All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Reports the memory held by parsed policies, per term and per address.
+
+Every policy below the base directory is parsed and kept alive while
+tracemalloc measures the memory they hold. Terms are measured by copying the
+policies, which copies every term and its lists but not its addresses.
+Addresses are measured by copying the unique nacaddr objects the terms
+reference, before and after generators would have used them.
+
+Example:
+  $ python tools/memory_benchmark.py --base_directory=policies \
+      --definitions_directory=def
+"""
+
+import argparse
+import gc
+import json
+import pathlib
+import sys
+import tracemalloc
+
+from capirca.lib import nacaddr
+from capirca.lib import naming
+from capirca.lib import policy
+
+_ADDRESS_ATTRIBUTES = ('address', 'address_exclude', 'source_address',
+                       'source_address_exclude', 'destination_address',
+                       'destination_address_exclude')
+
+
+def _Traced():
+  gc.collect()
+  return tracemalloc.get_traced_memory()[0]
+
+
+def Measure(base_directory, definitions_directory, optimize=True):
+  """Parses every policy and measures the memory they hold.
+
+  Args:
+    base_directory: directory holding the policy files and their includes.
+    definitions_directory: directory holding the naming definitions.
+    optimize: whether the policies are parsed with address optimization.
+
+  Returns:
+    A dict of the counts and the measured sizes in bytes.
+  """
+  definitions = naming.Naming(definitions_directory)
+  policy_files = sorted(pathlib.Path(base_directory).rglob('*.pol'))
+  texts = [policy_file.read_text() for policy_file in policy_files]
+
+  tracemalloc.start()
+  try:
+    start = _Traced()
+    policies = []
+    for policy_file, text in zip(policy_files, texts):
+      try:
+        policies.append(policy.ParsePolicy(
+            text, definitions, optimize=optimize, base_dir=base_directory,
+            filename=str(policy_file)))
+      except (policy.Error, naming.Error):
+        continue
+    policy_bytes = _Traced() - start
+
+    terms = [term for pol in policies for _, filter_terms in pol.filters
+             for term in filter_terms]
+    addresses = {}
+    for term in terms:
+      for attribute in _ADDRESS_ATTRIBUTES:
+        for addr in getattr(term, attribute):
+          addresses[id(addr)] = addr
+    # Copies of the policies hold new terms and lists, but share addresses.
+    start = _Traced()
+    policy_copies = [pol.Copy() for pol in policies]
+    term_bytes = _Traced() - start
+    del policy_copies
+    start = _Traced()
+    address_copies = [nacaddr.IP(addr, addr.text, addr.token)
+                      for addr in addresses.values()]
+    address_bytes = _Traced() - start
+    # Generators use broadcast_address, which is cached once computed.
+    for addr in address_copies:
+      _ = addr.broadcast_address
+    used_address_bytes = _Traced() - start
+  finally:
+    tracemalloc.stop()
+
+  return {
+      'policies': len(policies),
+      'terms': len(terms),
+      'addresses': len(addresses),
+      'policy_bytes': policy_bytes,
+      'bytes_per_term': round(term_bytes / max(len(terms), 1), 1),
+      'bytes_per_address': round(address_bytes / max(len(addresses), 1), 1),
+      'bytes_per_used_address': round(
+          used_address_bytes / max(len(addresses), 1), 1),
+  }
+
+
+def main(argv):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--base_directory', default='./policies',
+                      help='The base directory to look for policies.')
+  parser.add_argument('--definitions_directory', default='./def',
+                      help='Directory where the definitions can be found.')
+  parser.add_argument('--nooptimize', dest='optimize', action='store_false',
+                      help='Parse the policies without optimization.')
+  parser.add_argument('--json', action='store_true',
+                      help='Print the report as JSON.')
+  args = parser.parse_args(argv[1:])
+
+  report = Measure(args.base_directory, args.definitions_directory,
+                   args.optimize)
+  if args.json:
+    print(json.dumps(report, indent=2, sort_keys=True))
+  else:
+    for key, value in report.items():
+      print('%-24s %s' % (key, value))
+
+
+if __name__ == '__main__':
+  main(sys.argv)